@@ -1,10 +1,39 @@
 import streamlit as st
 import pandas as pd
-import pickle
 import numpy as np
-from predictor import StudentDropoutPredictor
-from utils import validate_csv_columns, format_prediction_result
-import os
+import hashlib
+import importlib.util
+import io
+from predictor import iter_data_chunks
+from utils import validate_csv_columns, format_prediction_result, get_summary_statistics
+from exporters import EXPORT_MIME_TYPES, export_to_bytes, iter_source_scored_chunks
+from compact import CompactBatch, iter_compact_scored_chunks
+from topk import TOP_K_GROUPS, top_k_scored_chunks
+from summary import DEFAULT_SUMMARY_GROUPS
+from validation import CURRICULAR_GRADE_RANGE, RANGE_RULES, ValidationReport
+from registry import ModelHandle
+from jobs import (STATUS_CANCELLED, STATUS_COMPLETED, STATUS_FAILED, STATUS_QUEUED, STATUS_RUNNING, JobQueue,
+                  start_workers)
+from drift import DRIFT_MODERATE, DRIFT_SIGNIFICANT, DRIFT_STABLE
+
+# Filas por bloque al puntuar archivos subidos
+BATCH_CHUNKSIZE = 5_000
+
+# Filas por bloque (y por punto de control) de los trabajos en segundo plano
+BACKGROUND_CHUNKSIZE = 50_000
+
+# Etiquetas de los estados de los trabajos en segundo plano
+JOB_STATUS_LABELS = {STATUS_QUEUED: "🕓 En cola", STATUS_RUNNING: "⚙️ En ejecución",
+                     STATUS_COMPLETED: "✅ Completado", STATUS_FAILED: "❌ Fallido", STATUS_CANCELLED: "⛔ Cancelado"}
+
+# Encabezados de la tabla de factores de una predicción
+DRIVER_COLUMN_LABELS = {'field': 'Variable', 'value': 'Valor', 'contribution': 'Contribución (log-odds)',
+                        'effect': 'Efecto'}
+
+
+def input_bounds(limits, cast=int):
+    """min_value y max_value de un campo del formulario, tomados de los rangos del esquema de validación"""
+    return {'min_value': cast(limits[0]), 'max_value': cast(limits[1])}
 
 # Configuración de la página
 st.set_page_config(
@@ -18,19 +47,95 @@ st.set_page_config(
 st.title("🎓 Sistema de Predicción de Deserción Estudiantil")
 st.markdown("---")
 
+def streamlit_event_handler(level: str, message: str):
+    """Muestra los eventos del predictor como widgets de Streamlit"""
+    {'success': st.success, 'warning': st.warning, 'error': st.error}.get(level, st.info)(message)
+
 # Inicializar el predictor
 @st.cache_resource
-def load_predictor():
-    """Carga el modelo y las columnas esperadas"""
+def load_model_handle():
+    """Carga la versión activa del registro de modelos y vigila los cambios de versión"""
     try:
-        predictor = StudentDropoutPredictor()
-        predictor.load_model()
-        return predictor
+        handle = ModelHandle.load(event_handler=streamlit_event_handler, metrics_enabled=True)
+        handle.watch()
+        return handle
     except Exception as e:
         st.error(f"Error al cargar el modelo: {str(e)}")
         st.stop()
 
-predictor = load_predictor()
+model_handle = load_model_handle()
+# Cada ejecución del script usa el modelo activo al empezar; un cambio de versión aplica en la siguiente
+predictor = model_handle.current
+
+@st.cache_resource
+def load_form_encoder(model_version: str):
+    """Codificador del formulario, construido una sola vez por versión del modelo"""
+    return predictor.create_form_encoder()
+
+form_encoder = load_form_encoder(predictor.model_version)
+
+@st.cache_resource
+def load_job_queue():
+    """Cola de trabajos en segundo plano, compartida por todas las sesiones"""
+    return JobQueue()
+
+@st.cache_resource
+def start_job_worker():
+    """
+    Lanza un proceso trabajador para la cola (una sola vez por servidor)
+    
+    Los trabajos siguen ejecutándose aunque se cierre el navegador; si el
+    servidor se reinicia, el nuevo trabajador los reanuda desde su último bloque.
+    """
+    # Sin rutas explícitas el trabajador sigue la versión activa del registro, igual que la app
+    return start_workers(1, job_queue.jobs_dir)
+
+job_queue = load_job_queue()
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def score_uploaded_csv(content_hash: str, model_version: str, _content: bytes, _progress=None):
+    """
+    Puntúa por bloques un CSV subido
+    
+    La caché se indexa por el hash del contenido y la versión del modelo (los
+    argumentos con guion bajo no forman parte de la clave), de modo que los
+    reruns y las interacciones con widgets no vuelven a puntuar el archivo.
+    Las explicaciones no se calculan aquí (ver explain_uploaded_csv).
+    """
+    # Estimación de filas para la barra de progreso (una línea por estudiante)
+    total_rows = max(_content.count(b'\n') - 1, 1)
+    # Cada bloque se guarda compactado (bits, int16 y float64): es lo que queda en la caché
+    batches, parts, reports, done = [], [], [], 0
+    for chunk in iter_data_chunks(io.BytesIO(_content), BATCH_CHUNKSIZE, file_format='csv'):
+        # Un solo preprocesamiento por bloque: la matriz de predict_batch se reutiliza para
+        # compactar y validar (el encabezado ya se validó antes de puntuar)
+        predictions = predictor.predict_batch(chunk, return_matrix=True, check_columns=False)
+        matrix, missing = predictions.pop('matrix'), predictions.pop('missing')
+        batches.append(predictor.compact_batch(chunk, matrix))
+        parts.append(predictions)
+        reports.append(predictor.validate_data(chunk, matrix, missing))
+        done += len(chunk)
+        if _progress is not None:
+            _progress.progress(min(done / total_rows, 1.0), text=f"Puntuando estudiantes... {done:,}")
+    
+    if not batches:
+        return None, None, []
+    
+    batch = CompactBatch.concat(batches)
+    predictions = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+    warnings = ValidationReport.concat(reports).warnings()
+    return batch, predictions, warnings
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def explain_uploaded_csv(content_hash: str, model_version: str, _batch: CompactBatch):
+    """
+    Explicaciones de un CSV ya puntuado, calculadas solo al abrir la vista de factores
+    
+    TreeSHAP exacto cuesta unos segundos por cada mil filas frente a milisegundos
+    para puntuarlas, así que no se paga al subir el archivo. Se indexa igual que
+    score_uploaded_csv: hash del contenido y versión del modelo.
+    """
+    return predictor.explain_compact(_batch)
 
 # Sidebar con información del modelo
 with st.sidebar:
@@ -47,9 +152,77 @@ with st.sidebar:
     - **Datos personales**: Edad, género, becas, situación financiera
     - **Datos institucionales**: Orden de aplicación, modalidad, desplazamiento
     """)
+    
+    with st.expander("🎚️ Política de riesgo"):
+        st.caption(f"Política activa: {predictor.risk_policy.key}")
+        st.dataframe(predictor.risk_policy.describe()[['icon', 'level', 'from', 'to']]
+                     .rename(columns={'icon': '', 'level': 'Nivel', 'from': 'Desde', 'to': 'Hasta'}),
+                     hide_index=True)
+        if predictor.risk_policy.course_thresholds:
+            st.markdown("**Cortes por carrera**")
+            st.dataframe(pd.DataFrame.from_dict(predictor.risk_policy.course_thresholds, orient='index'))
+    
+    with st.expander("🗂️ Versiones del modelo"):
+        st.caption(f"Versión activa: {predictor.model_version}")
+        versions = model_handle.registry.list_versions() if model_handle.registry is not None else []
+        if versions:
+            st.dataframe(pd.DataFrame(versions)[['version', 'created_at', 'description']]
+                         .rename(columns={'version': 'Versión', 'created_at': 'Registrada', 'description': 'Descripción'}),
+                         hide_index=True)
+        else:
+            st.caption("El registro de modelos está vacío; se usan los artefactos por defecto.")
+        shadow_report = model_handle.shadow_report()
+        if shadow_report is not None:
+            st.markdown(f"**En sombra:** {shadow_report['candidate_version']} "
+                        f"({shadow_report['sample_rate']:.0%} del tráfico, {shadow_report['rows']:,} filas)")
+            col1, col2 = st.columns(2)
+            col1.metric("Δ prob. media |abs|", f"{shadow_report['mean_abs_delta']:.3f}")
+            col2.metric("Cambios de nivel", f"{shadow_report['risk_change_rate']:.1%}")
+            col1.metric("Decisiones distintas", f"{shadow_report['decision_flip_rate']:.1%}")
+            col2.metric("Latencia candidata", f"{shadow_report['latency_ratio']:.2f}×")
+
+    with st.expander("📉 Deriva de datos"):
+        if predictor.drift is None:
+            st.caption("Sin perfil de referencia. Genéralo con "
+                       "`python drift.py build-reference cohorte_entrenamiento.csv`.")
+        else:
+            drift_summary = predictor.drift.summary()
+            st.caption(f"Referencia: {predictor.drift.reference.description or predictor.drift.reference.created_at} "
+                       f"({drift_summary['reference_rows']:,} filas) · Observadas: {drift_summary['rows']:,} filas")
+            if drift_summary['rows']:
+                status_icons = {DRIFT_STABLE: '🟢', DRIFT_MODERATE: '🟡', DRIFT_SIGNIFICANT: '🔴'}
+                drift_report = predictor.drift.report()
+                drift_report['status'] = drift_report['status'].map(lambda status: f"{status_icons[status]} {status}")
+                st.dataframe(drift_report[['feature', 'psi', 'status', 'missing_rate']]
+                             .rename(columns={'feature': 'Variable', 'psi': 'PSI', 'status': 'Estado',
+                                              'missing_rate': 'Sin valor'}),
+                             hide_index=True)
+            else:
+                st.caption("Aún no hay predicciones registradas.")
+            if st.button("Reiniciar conteos", key="drift_reset"):
+                predictor.drift.reset()
+                st.rerun()
+
+    with st.expander("⏱️ Métricas de rendimiento"):
+        metrics_snapshot = predictor.get_model_info().get('metrics', {})
+        stage_rows = [
+            {
+                'Etapa': name,
+                'Llamadas': entry['count'],
+                'Filas': entry['rows'],
+                'Media (ms)': round(entry['mean_seconds'] * 1000, 3),
+            }
+            for name, entry in {**metrics_snapshot.get('calls', {}), **metrics_snapshot.get('stages', {})}.items()
+        ]
+        if stage_rows:
+            st.dataframe(pd.DataFrame(stage_rows), hide_index=True)
+        else:
+            st.caption("Aún no hay predicciones registradas.")
+        st.download_button("Descargar métricas (Prometheus)", predictor.metrics_text(),
+                           file_name="metrics.prom", mime="text/plain")
 
 # Pestañas principales
-tab1, tab2 = st.tabs(["👤 Predicción Individual", "📖 Guía de Uso"])
+tab1, tab_batch, tab2 = st.tabs(["👤 Predicción Individual", "📂 Predicción por Lotes", "📖 Guía de Uso"])
 
 with tab1:
     st.header("👤 Predicción Individual")
@@ -68,16 +241,16 @@ with tab1:
         # Datos académicos principales
         with col1:
             st.markdown("**📚 Datos Académicos**")
-            form_data['Application order'] = st.number_input("Orden de aplicación", min_value=1, max_value=20, value=1)
-            form_data['Admission grade'] = st.number_input("Calificación de admisión (0-200)", min_value=0.0, max_value=200.0, value=120.0, step=0.1)
-            form_data['Previous qualification (grade)'] = st.number_input("Calificación previa (0-200)", min_value=0.0, max_value=200.0, value=150.0, step=0.1)
-            form_data['Curricular units 2nd sem (grade)'] = st.number_input("Calificación 2do semestre (0-20)", min_value=0.0, max_value=20.0, value=12.0, step=0.1)
+            form_data['Application order'] = st.number_input("Orden de aplicación (0 = primera opción)", **input_bounds(RANGE_RULES['Application order']), value=1)
+            form_data['Admission grade'] = st.number_input("Calificación de admisión (0-200)", **input_bounds(RANGE_RULES['Admission grade'], float), value=120.0, step=0.1)
+            form_data['Previous qualification (grade)'] = st.number_input("Calificación previa (0-200)", **input_bounds(RANGE_RULES['Previous qualification (grade)'], float), value=150.0, step=0.1)
+            form_data['Curricular units 2nd sem (grade)'] = st.number_input("Calificación 2do semestre (0-20)", **input_bounds(CURRICULAR_GRADE_RANGE, float), value=12.0, step=0.1)
             form_data['Curricular units 1st sem (evaluations)'] = st.number_input("Evaluaciones 1er semestre", min_value=0, max_value=20, value=6)
             form_data['Curricular units 2nd sem (evaluations)'] = st.number_input("Evaluaciones 2do semestre", min_value=0, max_value=20, value=6)
             
         with col2:
             st.markdown("**👤 Datos Personales**")
-            form_data['Age at enrollment'] = st.number_input("Edad al inscribirse", min_value=16, max_value=70, value=20)
+            form_data['Age at enrollment'] = st.number_input("Edad al inscribirse", **input_bounds(RANGE_RULES['Age at enrollment']), value=20)
             form_data['Gender'] = st.selectbox("Género", [0, 1], format_func=lambda x: "Masculino" if x == 1 else "Femenino")
             form_data['Daytime/evening attendance'] = st.selectbox("Asistencia", [0, 1], format_func=lambda x: "Nocturna" if x == 0 else "Diurna")
             form_data['Scholarship holder'] = st.selectbox("Becario", [0, 1], format_func=lambda x: "No" if x == 0 else "Sí")
@@ -90,32 +263,26 @@ with tab1:
             
             # Estado civil
             marital_options = ['Single', 'Divorced', 'FactoUnion', 'Separated']
-            marital_status = st.selectbox("Estado civil", marital_options)
-            for status in marital_options:
-                form_data[f'Marital status_{status}'] = 1 if status == marital_status else 0
+            form_data['Marital status'] = st.selectbox("Estado civil", marital_options)
             
             # Educación de la madre
             mother_qual_options = ['Basic_or_Secondary', 'Technical_Education', 'Other_or_Unknown', 'Postgraduate']
-            mother_qual = st.selectbox("Educación de la madre", mother_qual_options, 
+            form_data["Mother's qualification"] = st.selectbox("Educación de la madre", mother_qual_options, 
                                      format_func=lambda x: {
                                          'Basic_or_Secondary': 'Básica o Secundaria',
                                          'Technical_Education': 'Educación Técnica', 
                                          'Other_or_Unknown': 'Otra o Desconocida',
                                          'Postgraduate': 'Postgrado'
                                      }[x])
-            for qual in mother_qual_options:
-                form_data[f"Mother's qualification_{qual}"] = 1 if qual == mother_qual else 0
             
             # Educación del padre (incluye todas las categorías)
             father_qual_options = ['Basic_or_Secondary', 'Other_or_Unknown', 'Postgraduate']
-            father_qual = st.selectbox("Educación del padre", father_qual_options,
+            form_data["Father's qualification"] = st.selectbox("Educación del padre", father_qual_options,
                                      format_func=lambda x: {
                                          'Basic_or_Secondary': 'Básica o Secundaria',
                                          'Other_or_Unknown': 'Otra o Desconocida', 
                                          'Postgraduate': 'Postgrado'
                                      }[x])
-            for qual in father_qual_options:
-                form_data[f"Father's qualification_{qual}"] = 1 if qual == father_qual else 0
 
         # Segunda fila de columnas para más variables principales
         st.markdown("---")
@@ -127,7 +294,7 @@ with tab1:
             # Ocupación de la madre
             mother_occ_options = ['Administrative/Clerical', 'Skilled Manual Workers', 'Special Cases', 
                                 'Technicians/Associate Professionals', 'Unskilled Workers']
-            mother_occ = st.selectbox("Ocupación de la madre", mother_occ_options,
+            form_data["Mother's occupation"] = st.selectbox("Ocupación de la madre", mother_occ_options,
                                     format_func=lambda x: {
                                         'Administrative/Clerical': 'Administrativa/Oficina',
                                         'Skilled Manual Workers': 'Trabajadora Manual Calificada',
@@ -135,13 +302,11 @@ with tab1:
                                         'Technicians/Associate Professionals': 'Técnica/Profesional Asociada',
                                         'Unskilled Workers': 'Trabajadora No Calificada'
                                     }[x])
-            for occ in mother_occ_options:
-                form_data[f"Mother's occupation_{occ}"] = 1 if occ == mother_occ else 0
             
             # Ocupación del padre
             father_occ_options = ['Administrative/Clerical', 'Professionals', 'Skilled Manual Workers', 
                                 'Special Cases', 'Technicians/Associate Professionals']
-            father_occ = st.selectbox("Ocupación del padre", father_occ_options,
+            form_data["Father's occupation"] = st.selectbox("Ocupación del padre", father_occ_options,
                                     format_func=lambda x: {
                                         'Administrative/Clerical': 'Administrativa/Oficina',
                                         'Professionals': 'Profesional',
@@ -149,15 +314,14 @@ with tab1:
                                         'Special Cases': 'Casos Especiales',
                                         'Technicians/Associate Professionals': 'Técnico/Profesional Asociado'
                                     }[x])
-            for occ in father_occ_options:
-                form_data[f"Father's occupation_{occ}"] = 1 if occ == father_occ else 0
         
         with col5:
             st.markdown("**🌍 Datos Institucionales**")
             
             # Nacionalidad
             nationality_options = ['Portuguese', 'Colombian', 'German', 'Italian', 'English', 'Other']
-            nationality = st.selectbox("Nacionalidad", nationality_options,
+            # Las nacionalidades sin columna propia ('Other') dejan el grupo en cero
+            form_data['Nacionality'] = st.selectbox("Nacionalidad", nationality_options,
                                      format_func=lambda x: {
                                          'Portuguese': 'Portuguesa',
                                          'Colombian': 'Colombiana', 
@@ -166,28 +330,20 @@ with tab1:
                                          'English': 'Inglesa',
                                          'Other': 'Otra'
                                      }[x])
-            main_nationalities = ['Colombian', 'German', 'Italian', 'English', 'Portuguese']
-            for nat in main_nationalities:
-                form_data[f'Nacionality_{nat}'] = 1 if nat == nationality else 0
             
             # Modalidad de Admisión
             admission_options = ['Admisión Regular', 'Admisión Especial', 'Cambios/Transferencias', 'Mayores de 23 años']
-            admission_mode = st.selectbox("Modalidad de admisión", admission_options)
-            for mode in admission_options:
-                form_data[f'Application mode_{mode}'] = 1 if mode == admission_mode else 0
+            form_data['Application mode'] = st.selectbox("Modalidad de admisión", admission_options)
                 
             # Calificación previa (tipo)
             prev_qual_options = ['Secondary Education', 'Higher Education', 'Technical Education', 'Other']
-            prev_qual_type = st.selectbox("Tipo de calificación previa", prev_qual_options,
+            form_data['Previous qualification'] = st.selectbox("Tipo de calificación previa", prev_qual_options,
                                         format_func=lambda x: {
                                             'Secondary Education': 'Educación Secundaria',
                                             'Higher Education': 'Educación Superior',
                                             'Technical Education': 'Educación Técnica',
                                             'Other': 'Otra'
                                         }[x])
-            prev_qual_types = ['Higher Education', 'Other', 'Secondary Education', 'Technical Education']
-            for ptype in prev_qual_types:
-                form_data[f'Previous qualification_{ptype}'] = 1 if ptype == prev_qual_type else 0
                 
         with col6:
             st.markdown("**💼 Área de Estudio**")
@@ -195,7 +351,7 @@ with tab1:
             course_options = ['Engineering & Technology', 'Business & Management', 'Health Sciences', 
                             'Social Sciences', 'Education', 'Arts & Design', 'Agricultural & Environmental Sciences',
                             'Communication & Media']
-            course = st.selectbox("Área de estudio", course_options,
+            form_data['Course'] = st.selectbox("Área de estudio", course_options,
                                 format_func=lambda x: {
                                     'Engineering & Technology': 'Ingeniería y Tecnología',
                                     'Business & Management': 'Negocios y Administración',
@@ -206,12 +362,6 @@ with tab1:
                                     'Agricultural & Environmental Sciences': 'Ciencias Agrícolas y Ambientales',
                                     'Communication & Media': 'Comunicación y Medios'
                                 }[x])
-            
-            course_list = ['Agricultural & Environmental Sciences', 'Arts & Design', 'Business & Management',
-                          'Communication & Media', 'Education', 'Engineering & Technology', 
-                          'Health Sciences', 'Social Sciences']
-            for course_name in course_list:
-                form_data[f'Course_{course_name}'] = 1 if course_name == course else 0
         
         # Sección adicional solo para indicadores económicos
         with st.expander("📈 Indicadores Económicos (Opcional)"):
@@ -229,16 +379,13 @@ with tab1:
         
         if submitted:
             try:
-                # Crear un DataFrame con valores por defecto para las columnas faltantes
-                student_data = predictor.create_default_student_data()
-                
-                # Actualizar con los valores del formulario
-                for key, value in form_data.items():
-                    if key in student_data.columns:
-                        student_data[key] = value
+                # Escribir los valores del formulario sobre la plantilla de valores por defecto
+                student_vector = form_encoder.encode(form_data)
                 
                 # Realizar predicción
-                prediction = predictor.predict_single(student_data)
+                prediction = predictor.predict_single(student_vector)
+                # El análisis qué-pasaría-si se muestra fuera del formulario y sobrevive a los reruns
+                st.session_state['whatif_vector'] = student_vector
                 
                 # Mostrar resultados
                 st.success("✅ Predicción completada")
@@ -247,7 +394,8 @@ with tab1:
                 result_text, color = format_prediction_result(
                     prediction['probability'], 
                     prediction['prediction'], 
-                    prediction['risk_level']
+                    prediction['risk_level'],
+                    predictor.risk_policy
                 )
                 
                 st.markdown(f"### {result_text}")
@@ -276,37 +424,209 @@ with tab1:
                         delta=None
                     )
                 
-                # Recomendaciones basadas en el riesgo
-                if prediction['risk_level'] == 'Alto':
-                    st.warning("""
-                    **⚠️ Recomendaciones para Riesgo Alto:**
-                    - Implementar seguimiento académico personalizado
-                    - Considerar apoyo psicopedagógico
-                    - Revisar situación financiera del estudiante
-                    - Establecer tutorías académicas
-                    """)
-                elif prediction['risk_level'] == 'Medio':
-                    st.info("""
-                    **💡 Recomendaciones para Riesgo Medio:**
-                    - Monitoreo regular del rendimiento académico
-                    - Facilitar acceso a recursos de apoyo
-                    - Fomentar participación en actividades estudiantiles
-                    """)
-                else:
-                    st.success("""
-                    **✅ Estudiante con Bajo Riesgo:**
-                    - Continuar con el seguimiento regular
-                    - Mantener canales de comunicación abiertos
-                    - Reconocer el buen desempeño académico
-                    """)
+                # Recomendaciones del nivel de riesgo según la política activa
+                band = predictor.risk_policy.band(prediction['risk_level'])
+                if band is not None and band.advice:
+                    getattr(st, band.alert, st.info)(band.advice)
+                
+                # Factores que más pesan en la predicción de este estudiante
+                st.markdown("**🧭 Principales factores de la predicción**")
+                drivers = predictor.explain_single(student_vector).top_drivers(k=5)
+                st.dataframe(drivers.rename(columns=DRIVER_COLUMN_LABELS), hide_index=True)
                     
             except Exception as e:
                 st.error(f"❌ Error en la predicción: {str(e)}")
+    
+    # Análisis qué-pasaría-si del último estudiante evaluado
+    if 'whatif_vector' in st.session_state:
+        st.markdown("---")
+        st.subheader("🔍 ¿Qué pasaría si...?")
+        whatif = predictor.what_if(st.session_state['whatif_vector'])
+        st.markdown(f"Probabilidad actual: **{whatif.base_probability:.1%}** "
+                    f"(riesgo {whatif.base_risk_level}); umbral analizado: **{whatif.threshold:.0%}**")
+        
+        if whatif.minimal_changes.empty:
+            st.info("Ningún cambio individual analizado cruza el umbral de riesgo.")
+        else:
+            st.markdown("**Cambios mínimos que cruzan el umbral**")
+            st.dataframe(whatif.minimal_changes[['feature', 'current', 'value', 'probability', 'risk_level']]
+                         .rename(columns={'feature': 'Variable', 'current': 'Actual', 'value': 'Nuevo valor',
+                                          'probability': 'Probabilidad', 'risk_level': 'Nivel de riesgo'}),
+                         hide_index=True)
+        
+        feature = st.selectbox("Variable a explorar", list(whatif.curves))
+        curve = whatif.curves[feature]
+        if curve['value'].map(lambda v: isinstance(v, str)).any():
+            st.bar_chart(curve.set_index('value')['probability'])
+        else:
+            st.line_chart(curve.set_index('value')['probability'])
+
+with tab_batch:
+    st.header("📂 Predicción por Lotes")
+    st.markdown("Sube un archivo CSV con una fila por estudiante para puntuar toda una cohorte.")
+    
+    uploaded_file = st.file_uploader("Archivo CSV de estudiantes", type=["csv"])
+    run_in_background = st.checkbox(
+        "⏳ Procesar en segundo plano",
+        help="Para archivos grandes: el archivo se puntúa en un proceso aparte, con puntos de control por bloque, "
+             "y el resultado se descarga desde la lista de trabajos aunque se haya cerrado la página.")
+    
+    if uploaded_file is not None and run_in_background:
+        if st.button("📤 Enviar trabajo"):
+            start_job_worker()
+            job_id = job_queue.submit(uploaded_file.getvalue(), 'csv', chunksize=BACKGROUND_CHUNKSIZE)
+            st.success(f"Trabajo {job_id} en cola")
+    elif uploaded_file is not None:
+        try:
+            content = uploaded_file.getvalue()
+            content_hash = hashlib.sha256(content).hexdigest()
+            
+            # Validar el encabezado antes de puntuar
+            header = pd.read_csv(io.BytesIO(content), nrows=0)
+            column_check = validate_csv_columns(header, predictor.expected_columns)
+            if not column_check['is_valid']:
+                st.warning(f"Faltan {len(column_check['missing_columns'])} columnas; se usarán valores por defecto: "
+                           f"{', '.join(column_check['missing_columns'][:10])}"
+                           f"{'...' if len(column_check['missing_columns']) > 10 else ''}")
+            
+            progress = st.progress(0.0, text="Puntuando estudiantes...")
+            batch, predictions, range_warnings = score_uploaded_csv(
+                content_hash, predictor.model_version, content, progress)
+            
+            if batch is None:
+                progress.empty()
+                st.warning("El archivo no contiene estudiantes.")
+            else:
+                # Los niveles de riesgo se recalculan con la política activa sin volver a puntuar
+                predictions = predictor.rebucket(predictions, batch)
+                summary = get_summary_statistics(batch.to_frame(columns=batch.group_columns(DEFAULT_SUMMARY_GROUPS)),
+                                                 predictions, policy=predictor.risk_policy,
+                                                 expected_columns=predictor.expected_columns)
+                progress.progress(1.0, text=f"✅ {summary['total_students']:,} estudiantes puntuados")
+                
+                if range_warnings:
+                    with st.expander(f"⚠️ {len(range_warnings)} advertencias de validación"):
+                        for warning in range_warnings:
+                            st.markdown(f"- {warning}")
+                
+                # Resumen de la cohorte
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric("Estudiantes", f"{summary['total_students']:,}")
+                col2.metric("Deserciones previstas", f"{summary['predicted_dropouts']:,}")
+                col3.metric("Tasa de deserción", f"{summary['dropout_rate']:.1%}")
+                col4.metric("Probabilidad media", f"{summary['avg_dropout_probability']:.1%}")
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.markdown("**Distribución por nivel de riesgo**")
+                    st.bar_chart(pd.Series(summary['risk_distribution'], name="Estudiantes"))
+                with col2:
+                    st.markdown("**Cuantiles de probabilidad**")
+                    st.dataframe(pd.Series(summary['probability_quantiles'], name="Probabilidad")
+                                 .map(lambda p: f"{p:.1%}"))
+                
+                if summary['groups']:
+                    group = st.selectbox("Desglose por", list(summary['groups']))
+                    group_df = pd.DataFrame.from_dict(summary['groups'][group], orient='index')
+                    group_df = group_df[group_df['total_students'] > 0]
+                    st.bar_chart(group_df['dropout_rate'].rename("Tasa de deserción"))
+                    st.dataframe(group_df)
+                
+                # Factores de riesgo: se calculan al abrir la vista y quedan en caché para este archivo
+                explanations = None
+                if st.checkbox("🔍 Mostrar factores de riesgo", value=False):
+                    with st.spinner("Calculando factores de riesgo..."):
+                        explanations = explain_uploaded_csv(content_hash, predictor.model_version, batch)
+                    st.markdown("**Factores con mayor influencia en la cohorte**")
+                    st.bar_chart(explanations.mean_abs().head(10).rename("Contribución media |log-odds|"))
+                    student_row = st.number_input("Fila del estudiante a explicar", min_value=0,
+                                                  max_value=len(batch) - 1, value=0, step=1)
+                    st.dataframe(explanations.top_drivers(int(student_row), k=5)
+                                 .rename(columns=DRIVER_COLUMN_LABELS), hide_index=True)
+                
+                st.markdown("**Vista previa**")
+                preview = batch.to_frame(0, 100).assign(
+                    Probabilidad_Desercion=predictions['probabilities'][:100],
+                    Nivel_Riesgo=predictions['risk_levels'][:100],
+                )
+                if explanations is not None:
+                    preview['Factor_Principal'] = \
+                        explanations.slice(slice(0, 100)).top_drivers_frame(1)['driver_1'].to_numpy()
+                st.dataframe(preview)
+                
+                # Ranking de mayor riesgo: heap acotado por grupo, sin ordenar la cohorte completa
+                st.markdown("**Estudiantes con mayor riesgo**")
+                col1, col2 = st.columns(2)
+                top_k = col1.number_input("Estudiantes por grupo", min_value=1, max_value=5_000, value=50, step=10)
+                top_group = col2.selectbox("Agrupar por", ["Todos"] + [group for group in TOP_K_GROUPS
+                                                                      if batch.group_columns([group])])
+                group_by = None if top_group == "Todos" else top_group
+                ranking_columns = batch.extra_columns + (batch.group_columns([group_by]) if group_by else [])
+                ranking = top_k_scored_chunks(
+                    iter_compact_scored_chunks(batch, predictions, columns=ranking_columns),
+                    int(top_k), group_by, columns=batch.extra_columns)
+                st.dataframe(ranking, hide_index=True)
+                
+                # Descarga: el archivo se genera bloque a bloque solo al pulsar el botón. Se relee el
+                # CSV subido para exportar sus valores originales, no los reconstruidos del lote compacto
+                formats = ['csv'] + (['parquet'] if importlib.util.find_spec('pyarrow') else [])
+                export_format = st.radio("Formato de descarga", formats, horizontal=True)
+                extra_columns = batch.extra_columns
+                selected_columns = st.multiselect(
+                    "Columnas de entrada a incluir (vacío = todas)", batch.source_columns,
+                    default=extra_columns)
+                st.download_button(
+                    "📥 Descargar predicciones",
+                    data=lambda: export_to_bytes(
+                        iter_source_scored_chunks(iter_data_chunks(io.BytesIO(content), BATCH_CHUNKSIZE, 'csv'),
+                                                  predictions),
+                        export_format, selected_columns or None),
+                    file_name=f"predicciones.{export_format}",
+                    mime=EXPORT_MIME_TYPES[export_format],
+                )
+        except Exception as e:
+            st.error(f"❌ Error al procesar el archivo: {str(e)}")
+    
+    # Trabajos en segundo plano: el estado se lee de la cola en cada rerun
+    recent_jobs = job_queue.list_jobs(limit=10)
+    if recent_jobs:
+        st.markdown("### ⏳ Trabajos en segundo plano")
+        if any(job.status in (STATUS_QUEUED, STATUS_RUNNING) for job in recent_jobs):
+            # Trabajos pendientes de una ejecución anterior del servidor
+            start_job_worker()
+        st.button("🔄 Actualizar estado")
+        for job in recent_jobs:
+            col1, col2, col3 = st.columns([2, 3, 2])
+            col1.markdown(f"**{job.job_id}**  \n{JOB_STATUS_LABELS.get(job.status, job.status)}")
+            total = f"{job.total_rows:,}" if job.total_rows is not None else "?"
+            col2.progress(job.progress, text=f"{job.rows_done:,} / {total} estudiantes")
+            if job.error:
+                col2.caption(f"Error: {job.error}")
+            if job.status in (STATUS_QUEUED, STATUS_RUNNING):
+                if col3.button("Cancelar", key=f"cancel-{job.job_id}"):
+                    job_queue.cancel(job.job_id)
+                    st.rerun()
+            elif job.status == STATUS_COMPLETED:
+                col3.download_button(
+                    "📥 Descargar",
+                    data=lambda job_id=job.job_id: export_to_bytes(job_queue.iter_results(job_id), 'csv',
+                                                                   policy=predictor.risk_policy),
+                    file_name=f"predicciones-{job.job_id}.csv",
+                    mime=EXPORT_MIME_TYPES['csv'],
+                    key=f"download-{job.job_id}",
+                )
 
 with tab2:
     st.header("📖 Guía de Uso")
     
-    st.markdown("""
+    # Los niveles de la guía se leen de la política activa
+    risk_bands = predictor.risk_policy.describe()
+    risk_band_lines = "\n".join(
+        f"    - **{icon} {level} ({low:.0%}-{high:.0%})**: {predictor.risk_policy.band(level).description}"
+        for level, low, high, icon in risk_bands[['level', 'from', 'to', 'icon']].iloc[::-1].itertuples(
+            index=False, name=None))
+    
+    st.markdown(f"""
     ## 🎯 Propósito del Sistema
     
     Este sistema de predicción de deserción estudiantil utiliza técnicas de machine learning para identificar estudiantes en riesgo de abandonar sus estudios, permitiendo intervenciones tempranas y personalizadas.
@@ -318,6 +638,15 @@ with tab2:
     3. **Analiza los resultados** y las recomendaciones
     4. **Implementa las acciones** sugeridas según el nivel de riesgo
     
+    ## 📂 Cómo usar la Predicción por Lotes
+    
+    1. **Sube un CSV** con una fila por estudiante y las columnas del modelo
+    2. **Espera a que termine la puntuación** (el archivo se procesa por bloques)
+    3. **Revisa el resumen** por nivel de riesgo y el desglose por grupo
+    4. **Descarga las predicciones** en CSV (o Parquet), con las columnas de entrada que elijas
+    
+    Volver a subir el mismo archivo no lo puntúa de nuevo: los resultados se reutilizan.
+    
     ## 📋 Variables Principales del Modelo
     
     ### Datos Académicos
@@ -340,9 +669,13 @@ with tab2:
     ## 🎯 Interpretación de Resultados
     
     ### Niveles de Riesgo
-    - **🔴 Alto (≥70%)**: Requiere intervención inmediata
-    - **🟡 Medio (30-70%)**: Necesita monitoreo cercano
-    - **🟢 Bajo (<30%)**: Seguimiento regular
+{risk_band_lines}
+    
+    ### Principales Factores
+    Cada predicción muestra las variables que más la empujan hacia arriba o hacia abajo.
+    Las contribuciones están en escala log-odds: sumadas a la base del modelo dan su
+    puntuación, y las categorías de un mismo grupo (p. ej. Course) se muestran juntas.
+    En archivos grandes se usa una aproximación mucho más rápida del mismo cálculo.
     
     ### Acciones Recomendadas
     
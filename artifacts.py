@@ -0,0 +1,401 @@
+import copy
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+# Nombres de los artefactos originales del modelo
+MODEL_FILENAME = "pipeline_final_desercion.pkl"
+COLUMNS_FILENAME = "columnas_esperadas.pkl"
+
+# Directorios donde se buscan los artefactos si no se indica una ruta explícita
+ARTIFACT_SEARCH_DIRS = ("attached_assets", os.path.dirname(os.path.abspath(__file__)))
+
+# Directorio de la caché de artefactos (configurable con la variable de entorno);
+# una ruta relativa se resuelve junto al modelo (ver resolve_cache_dir)
+DEFAULT_CACHE_DIR = os.environ.get("DESERCION_MODEL_CACHE", ".model_cache")
+
+# Versión del formato de la caché; cambiarla invalida todas las entradas existentes
+CACHE_FORMAT_VERSION = 2
+
+# Pipeline sin el booster ni los arreglos de los transformadores (pickle de pocos KB)
+CACHED_MODEL_FILE = "pipeline.pkl"
+# Booster de XGBoost en su formato nativo (UBJSON)
+CACHED_BOOSTER_FILE = "booster.ubj"
+CACHED_COLUMNS_FILE = "columns.json"
+MANIFEST_FILE = "manifest.json"
+# Índice de las fuentes ya vistas: (tamaño, fecha) -> versión, para no recalcular sus hashes
+SOURCE_INDEX_FILE = "sources.json"
+
+
+class ArtifactIntegrityError(Exception):
+    """La suma de verificación de un artefacto en caché no coincide con su manifiesto"""
+
+
+def resolve_artifact_path(filename: str) -> str:
+    """Busca un artefacto en los directorios conocidos y retorna la primera ruta existente"""
+    for directory in ARTIFACT_SEARCH_DIRS:
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            return path
+    return os.path.join(ARTIFACT_SEARCH_DIRS[0], filename)
+
+
+def resolve_cache_dir(cache_dir: str, model_path: str) -> str:
+    """Ruta de la caché: las rutas relativas se toman junto al modelo y no en el directorio de trabajo"""
+    if os.path.isabs(cache_dir):
+        return cache_dir
+    return os.path.join(os.path.dirname(os.path.abspath(model_path)), cache_dir)
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """Calcula el SHA-256 de un archivo leyéndolo por bloques"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_pickle_artifact(path: str) -> Any:
+    """Carga un pickle probando el protocolo actual, encoding latin-1 y, por último, joblib"""
+    try:
+        # Intentar cargar con protocolo actual
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (pickle.UnpicklingError, TypeError, AttributeError) as e:
+        # Si falla, intentar con encoding latin-1 para compatibilidad con versiones anteriores
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f, encoding='latin-1')
+        except Exception as e2:
+            # Como último recurso, usar joblib si está disponible
+            try:
+                import joblib
+                return joblib.load(path)
+            except Exception as e3:
+                raise Exception(f"No se pudo cargar el modelo con ningún método: pickle error: {e}, latin-1 error: {e2}, joblib error: {e3}")
+
+
+# Librerías cuyas clases contiene el pipeline (el pickle solo es fiable con sus mismas versiones)
+PIPELINE_LIBRARIES = ('sklearn', 'xgboost', 'numpy')
+
+
+def _library_versions() -> Dict[str, str]:
+    # Se importan de todos modos para deserializar el modelo
+    versions = {}
+    for name in PIPELINE_LIBRARIES:
+        try:
+            module = __import__(name)
+            versions[name] = getattr(module, '__version__', 'unknown')
+        except ImportError:
+            continue
+    return versions
+
+
+def _file_stat(path: str) -> Dict[str, int]:
+    """Tamaño y fecha de modificación (ns) de un archivo"""
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def _fitted_arrays(estimator: Any) -> List[Tuple[str, Any]]:
+    """Atributos ajustados de un estimador que son arreglos numéricos (scale_, min_, ...)"""
+    import numpy as np
+
+    return [(attr, value) for attr, value in vars(estimator).items()
+            if attr.endswith('_') and isinstance(value, np.ndarray) and value.dtype.kind in 'biuf']
+
+
+def split_model(model: Any) -> Tuple[Any, Optional[bytes], Dict[str, Tuple[int, str, str, Any]]]:
+    """
+    Separa un pipeline en esqueleto, booster nativo y arreglos de los transformadores
+
+    Args:
+        model: Pipeline cargado de los artefactos originales (no se modifica)
+
+    Returns:
+        Tupla con (esqueleto sin booster ni arreglos, booster en UBJSON o None,
+        nombre de archivo -> (paso, transformador, atributo, arreglo)). Un modelo
+        que no es un Pipeline se devuelve entero como esqueleto.
+    """
+    steps = getattr(model, 'steps', None)
+    if not isinstance(steps, list):
+        return model, None, {}
+
+    skeleton = copy.copy(model)
+    skeleton.steps = list(steps)
+    arrays: Dict[str, Tuple[int, str, str, Any]] = {}
+
+    def strip(estimator: Any, step: int, name: str) -> Any:
+        fitted = _fitted_arrays(estimator)
+        if not fitted:
+            return estimator
+        estimator = copy.copy(estimator)
+        for attr, value in fitted:
+            arrays[f"array_{len(arrays)}.npy"] = (step, name, attr, value)
+            delattr(estimator, attr)
+        return estimator
+
+    for step, (step_name, estimator) in enumerate(steps):
+        if hasattr(estimator, 'transformers_'):
+            estimator = copy.copy(estimator)
+            estimator.transformers_ = [
+                (name, trans if isinstance(trans, str) else strip(trans, step, name), cols)
+                for name, trans, cols in estimator.transformers_
+            ]
+            skeleton.steps[step] = (step_name, estimator)
+        elif step < len(steps) - 1:
+            skeleton.steps[step] = (step_name, strip(estimator, step, ''))
+
+    booster = None
+    step_name, classifier = steps[-1]
+    if hasattr(classifier, 'get_booster') and '_Booster' in vars(classifier):
+        booster = bytes(classifier.get_booster().save_raw(raw_format='ubj'))
+        classifier = copy.copy(classifier)
+        del classifier._Booster
+        skeleton.steps[-1] = (step_name, classifier)
+    return skeleton, booster, arrays
+
+
+def join_model(skeleton: Any, booster: Optional[bytes], arrays: Dict[str, Tuple[int, str, str, Any]]) -> Any:
+    """Rearma el pipeline separado con split_model"""
+    for step, name, attr, value in arrays.values():
+        estimator = skeleton.steps[step][1]
+        if name:
+            estimator = next(trans for trans_name, trans, _ in estimator.transformers_ if trans_name == name)
+        setattr(estimator, attr, value)
+    if booster is not None:
+        import xgboost as xgb
+
+        native = xgb.Booster()
+        native.load_model(bytearray(booster))
+        skeleton.steps[-1][1]._Booster = native
+    return skeleton
+
+
+class ArtifactCache:
+    """
+    Caché versionada y verificada de los artefactos del modelo.
+
+    Convierte una única vez el pipeline y las columnas esperadas a un formato de
+    trabajo en `cache_dir/<versión>/`, donde la versión es el hash de los archivos
+    de origen: el booster en el formato nativo de XGBoost (UBJSON), los arreglos
+    de los transformadores en .npy y el resto del pipeline en un pickle de pocos
+    KB. Así la carga no deserializa el pickle del booster ni repite el aviso de
+    XGBoost sobre modelos serializados con otra versión. Las fuentes y los
+    archivos de la entrada se comprueban por tamaño y fecha de modificación; las
+    sumas SHA-256 se calculan al construir la entrada, cuando cambian las fuentes
+    y con verify().
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def source_version(model_path: str, columns_path: str) -> str:
+        """Versión de los artefactos de origen: hash combinado de ambos archivos"""
+        digest = hashlib.sha256()
+        digest.update(file_sha256(model_path).encode())
+        digest.update(file_sha256(columns_path).encode())
+        return digest.hexdigest()[:16]
+
+    def current_version(self, model_path: str, columns_path: str) -> str:
+        """
+        Versión de los artefactos de origen sin recalcular los hashes si no cambiaron
+
+        El índice de la caché guarda el tamaño y la fecha de modificación de cada
+        par de fuentes junto con su versión; solo se recalcula al cambiar alguno.
+        """
+        key = f"{os.path.abspath(model_path)}|{os.path.abspath(columns_path)}"
+        stats = {'model': _file_stat(model_path), 'columns': _file_stat(columns_path)}
+        index_path = os.path.join(self.cache_dir, SOURCE_INDEX_FILE)
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        known = index.get(key)
+        if known is not None and known.get('stats') == stats:
+            return known['version']
+
+        version = self.source_version(model_path, columns_path)
+        index[key] = {'stats': stats, 'version': version}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{SOURCE_INDEX_FILE}-", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(index, f, indent=2)
+            os.replace(tmp_path, index_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return version
+
+    def entry_dir(self, version: str) -> str:
+        return os.path.join(self.cache_dir, version)
+
+    def read_manifest(self, version: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self.entry_dir(version), MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def is_valid(self, version: str, verify: bool = True) -> bool:
+        """Indica si existe una entrada utilizable para la versión (formato, librerías y archivos)"""
+        manifest = self.read_manifest(version)
+        if manifest is None:
+            return False
+        if manifest.get('format_version') != CACHE_FORMAT_VERSION:
+            return False
+        # Un pickle de scikit-learn/XGBoost solo es fiable con las mismas versiones de librerías
+        if manifest.get('libraries') != _library_versions():
+            return False
+        if verify:
+            try:
+                self.verify(version, manifest, checksums=False)
+            except (ArtifactIntegrityError, OSError):
+                return False
+        return True
+
+    def verify(self, version: str, manifest: Optional[Dict[str, Any]] = None, checksums: bool = True) -> None:
+        """
+        Comprueba los archivos de una entrada contra su manifiesto
+
+        Args:
+            version: Versión de la entrada
+            manifest: Manifiesto ya leído (por defecto se lee del disco)
+            checksums: Si se recalculan las sumas SHA-256; si no, basta con que
+                       coincidan el tamaño y la fecha de modificación
+        """
+        manifest = manifest or self.read_manifest(version)
+        if manifest is None:
+            raise ArtifactIntegrityError(f"No existe la entrada de caché {version}")
+        for filename, expected in manifest['files'].items():
+            path = os.path.join(self.entry_dir(version), filename)
+            if checksums:
+                valid = file_sha256(path) == expected['sha256']
+            else:
+                valid = _file_stat(path) == expected['stat']
+            if not valid:
+                raise ArtifactIntegrityError(
+                    f"Suma de verificación inválida para {filename} en la versión {version}")
+
+    def build(self, model_path: str, columns_path: str, version: Optional[str] = None) -> str:
+        """Convierte los artefactos originales al formato de trabajo y retorna la versión"""
+        import numpy as np
+
+        version = version or self.source_version(model_path, columns_path)
+        model = load_pickle_artifact(model_path)
+        with open(columns_path, 'rb') as f:
+            columns = list(pickle.load(f))
+        skeleton, booster, arrays = split_model(model)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f".{version}-", dir=self.cache_dir)
+        try:
+            with open(os.path.join(staging, CACHED_MODEL_FILE), 'wb') as f:
+                pickle.dump(skeleton, f, protocol=pickle.HIGHEST_PROTOCOL)
+            files = [CACHED_MODEL_FILE, CACHED_COLUMNS_FILE]
+            if booster is not None:
+                with open(os.path.join(staging, CACHED_BOOSTER_FILE), 'wb') as f:
+                    f.write(booster)
+                files.append(CACHED_BOOSTER_FILE)
+            for filename, (_, _, _, value) in arrays.items():
+                np.save(os.path.join(staging, filename), value, allow_pickle=False)
+                files.append(filename)
+            with open(os.path.join(staging, CACHED_COLUMNS_FILE), 'w', encoding='utf-8') as f:
+                json.dump(columns, f, ensure_ascii=False)
+
+            manifest = {
+                'format_version': CACHE_FORMAT_VERSION,
+                'version': version,
+                'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'sources': {
+                    'model': {'path': os.path.abspath(model_path), 'sha256': file_sha256(model_path)},
+                    'columns': {'path': os.path.abspath(columns_path), 'sha256': file_sha256(columns_path)},
+                },
+                'libraries': _library_versions(),
+                'arrays': {filename: [step, name, attr] for filename, (step, name, attr, _) in arrays.items()},
+                'files': {
+                    name: {'sha256': file_sha256(os.path.join(staging, name)),
+                           'stat': _file_stat(os.path.join(staging, name))}
+                    for name in files
+                },
+            }
+            with open(os.path.join(staging, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+
+            self._publish(staging, version)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return version
+
+    def _publish(self, staging: str, version: str) -> None:
+        """
+        Publica una entrada preparada con un solo rename
+
+        Una entrada inválida se aparta antes con otro rename. Si otro proceso
+        publica la misma versión entre tanto, se conserva la suya y se descarta
+        la preparada.
+        """
+        target = self.entry_dir(version)
+        stale = None
+        if os.path.exists(target) and not self.is_valid(version):
+            stale = os.path.join(self.cache_dir, f".{version}.{uuid.uuid4().hex[:8]}.stale")
+            try:
+                os.replace(target, stale)
+            except FileNotFoundError:
+                # Otro proceso ya la apartó
+                stale = None
+        try:
+            os.replace(staging, target)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            if not self.is_valid(version):
+                raise
+        finally:
+            if stale is not None:
+                shutil.rmtree(stale, ignore_errors=True)
+
+    def load(self, model_path: str, columns_path: str, verify: bool = True) -> Tuple[Any, List[str], str]:
+        """
+        Carga el modelo desde la caché, construyéndola si no existe o está desactualizada
+
+        Args:
+            model_path: Ruta del pipeline original (.pkl)
+            columns_path: Ruta de las columnas esperadas (.pkl)
+            verify: Si se comprueban el tamaño y la fecha de los archivos de la entrada
+
+        Returns:
+            Tupla con (modelo, columnas esperadas, versión)
+        """
+        import numpy as np
+
+        version = self.current_version(model_path, columns_path)
+        manifest = self.read_manifest(version) if self.is_valid(version, verify=verify) else None
+        if manifest is None:
+            self.build(model_path, columns_path, version)
+            manifest = self.read_manifest(version)
+
+        entry = self.entry_dir(version)
+        with open(os.path.join(entry, CACHED_MODEL_FILE), 'rb') as f:
+            skeleton = pickle.load(f)
+        booster = None
+        if CACHED_BOOSTER_FILE in manifest['files']:
+            with open(os.path.join(entry, CACHED_BOOSTER_FILE), 'rb') as f:
+                booster = f.read()
+        arrays = {filename: (step, name, attr, np.load(os.path.join(entry, filename), allow_pickle=False))
+                  for filename, (step, name, attr) in manifest['arrays'].items()}
+        model = join_model(skeleton, booster, arrays)
+        with open(os.path.join(entry, CACHED_COLUMNS_FILE), 'r', encoding='utf-8') as f:
+            columns = json.load(f)
+        return model, columns, version
@@ -0,0 +1,271 @@
+"""
+Benchmarks reproducibles de las rutas críticas de puntuación.
+
+Genera cohortes sintéticas a partir de las columnas esperadas y mide latencia,
+throughput y memoria máxima de cada etapa (preprocess_data, predict_batch,
+get_summary_statistics, export_predictions_to_csv, ...). Los resultados se
+guardan en JSON y pueden compararse con una línea base guardada:
+
+    python benchmark.py --output bench.json
+    python benchmark.py --sizes 1 1000 --baseline bench.json --threshold 0.10
+
+El proceso termina con código 1 si alguna etapa empeora más que el umbral.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from parallel import MIN_SHARD_ROWS
+from predictor import StudentDropoutPredictor
+from preprocessing import one_hot_groups
+from utils import export_predictions_to_csv, get_summary_statistics
+
+DEFAULT_SIZES = (1, 1_000, 100_000, 1_000_000)
+
+# Rangos plausibles (mín, máx, entero) para las columnas numéricas de la cohorte sintética
+SYNTHETIC_RANGES = {
+    'Application order': (1, 9, True),
+    'Previous qualification (grade)': (95.0, 190.0, False),
+    'Admission grade': (95.0, 190.0, False),
+    'Age at enrollment': (17, 60, True),
+    'Curricular units 2nd sem (grade)': (0.0, 18.0, False),
+    'Unemployment rate': (7.6, 16.2, False),
+    'Inflation rate': (-0.8, 3.7, False),
+    'GDP': (-4.1, 3.5, False),
+}
+DEFAULT_RANGE = (0, 20, True)
+
+
+def generate_synthetic_cohort(expected_columns: Sequence[str], n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Genera una cohorte sintética con el esquema de las columnas esperadas
+
+    Las columnas numéricas toman valores en rangos plausibles, las binarias 0/1 y
+    cada grupo one-hot tiene exactamente una categoría activa por fila.
+
+    Args:
+        expected_columns: Columnas esperadas por el modelo
+        n_rows: Número de estudiantes
+        seed: Semilla para que la cohorte sea reproducible
+
+    Returns:
+        DataFrame con la cohorte
+    """
+    rng = np.random.default_rng(seed)
+    columns = list(expected_columns)
+    matrix = np.zeros((n_rows, len(columns)), dtype=np.float64)
+
+    groups = one_hot_groups(columns)
+    grouped = {i for positions in groups.values() for i in positions}
+    for positions in groups.values():
+        choice = rng.integers(0, len(positions), size=n_rows)
+        matrix[np.arange(n_rows), np.asarray(positions)[choice]] = 1.0
+
+    for j, col in enumerate(columns):
+        if j in grouped:
+            continue
+        low, high, integer = SYNTHETIC_RANGES.get(col, DEFAULT_RANGE)
+        if col in ('Daytime/evening attendance', 'Displaced', 'Debtor', 'Tuition fees up to date',
+                   'Gender', 'Scholarship holder'):
+            low, high, integer = 0, 1, True
+        if integer:
+            matrix[:, j] = rng.integers(low, high + 1, size=n_rows)
+        else:
+            matrix[:, j] = np.round(rng.uniform(low, high, size=n_rows), 2)
+
+    return pd.DataFrame(matrix, columns=columns)
+
+
+def _measure(func: Callable[[], Any], repeats: int) -> Dict[str, Any]:
+    """Mide la latencia de `func` en varias repeticiones y su memoria máxima en una ejecución aparte"""
+    func()  # calentamiento
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings_arr = np.asarray(timings)
+    return {
+        'repeats': repeats,
+        'latency_s': {
+            'min': float(timings_arr.min()),
+            'median': float(np.median(timings_arr)),
+            'p95': float(np.percentile(timings_arr, 95)),
+            'mean': float(timings_arr.mean()),
+        },
+        'peak_memory_bytes': int(peak),
+    }
+
+
+def _repeats_for(n_rows: int) -> int:
+    if n_rows <= 1:
+        return 200
+    if n_rows <= 1_000:
+        return 30
+    if n_rows <= 100_000:
+        return 5
+    return 2
+
+
+def build_stages(predictor: StudentDropoutPredictor, data: pd.DataFrame,
+                 workers: Sequence[int] = ()) -> Dict[str, Callable[[], Any]]:
+    """Etapas y puntos de entrada a medir para una cohorte (`workers`: procesos de predict_batch_parallel)"""
+    predictions = predictor.predict_batch(data)
+    stages = {
+        'preprocess_data': lambda: predictor.preprocess_data(data),
+        'predict_batch': lambda: predictor.predict_batch(data),
+        'get_summary_statistics': lambda: get_summary_statistics(data, predictions),
+        'export_predictions_to_csv': lambda: export_predictions_to_csv(data, predictions),
+    }
+    if len(data) == 1:
+        row = data.iloc[0].to_dict()
+        stages['predict_single'] = lambda: predictor.predict_single(data)
+        stages['predict_fast'] = lambda: predictor.predict_fast(row)
+    if len(data) >= 2 * MIN_SHARD_ROWS:
+        for n_workers in workers:
+            stages[f'predict_batch_parallel_{n_workers}w'] = \
+                lambda n_workers=n_workers: predictor.predict_batch_parallel(data, n_workers=n_workers)
+    return stages
+
+
+def run_benchmarks(predictor: StudentDropoutPredictor, sizes: Sequence[int] = DEFAULT_SIZES,
+                   stages: Optional[Sequence[str]] = None, seed: int = 42,
+                   workers: Sequence[int] = ()) -> Dict[str, Any]:
+    """
+    Ejecuta los benchmarks para cada tamaño de cohorte
+
+    Returns:
+        Diccionario serializable a JSON con metadatos y resultados
+    """
+    results = []
+    for n_rows in sizes:
+        data = generate_synthetic_cohort(predictor.expected_columns, n_rows, seed)
+        # La caché de predicciones falsearía las mediciones de predict_single
+        predictor.prediction_cache.clear()
+        for name, func in build_stages(predictor, data, workers).items():
+            if stages and name not in stages:
+                continue
+            if name == 'predict_single':
+                func = _without_prediction_cache(predictor, func)
+            measurement = _measure(func, _repeats_for(n_rows))
+            median = measurement['latency_s']['median']
+            measurement.update({
+                'stage': name,
+                'rows': n_rows,
+                'throughput_rows_per_s': n_rows / median if median > 0 else None,
+            })
+            results.append(measurement)
+            print(f"{name:<28} {n_rows:>10,} filas  mediana {median * 1000:10.3f} ms  "
+                  f"pico {measurement['peak_memory_bytes'] / 2**20:9.2f} MiB", file=sys.stderr)
+
+    return {
+        'metadata': {
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'model_version': predictor.model_version,
+            'seed': seed,
+            'sizes': list(sizes),
+            'cpu_count': os.cpu_count(),
+            'workers': list(workers),
+        },
+        'results': results,
+    }
+
+
+def _without_prediction_cache(predictor: StudentDropoutPredictor, func: Callable[[], Any]) -> Callable[[], Any]:
+    def run() -> Any:
+        predictor.prediction_cache.clear()
+        return func()
+    return run
+
+
+def compare_with_baseline(current: Dict[str, Any], baseline: Dict[str, Any],
+                          threshold: float = 0.10) -> List[Dict[str, Any]]:
+    """
+    Compara dos ejecuciones y retorna las regresiones por encima del umbral
+
+    Se considera regresión que la mediana de latencia o la memoria máxima de una
+    etapa crezcan más de `threshold` (fracción) respecto a la línea base.
+    """
+    reference = {(r['stage'], r['rows']): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in current['results']:
+        base = reference.get((result['stage'], result['rows']))
+        if base is None:
+            continue
+        for metric, current_value, base_value in (
+            ('latency_median_s', result['latency_s']['median'], base['latency_s']['median']),
+            ('peak_memory_bytes', result['peak_memory_bytes'], base['peak_memory_bytes']),
+        ):
+            if base_value and current_value > base_value * (1 + threshold):
+                regressions.append({
+                    'stage': result['stage'],
+                    'rows': result['rows'],
+                    'metric': metric,
+                    'baseline': base_value,
+                    'current': current_value,
+                    'change': current_value / base_value - 1,
+                })
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de las rutas de puntuación")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="Tamaños de cohorte a medir")
+    parser.add_argument('--stages', nargs='+', default=None, help="Limitar a estas etapas")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, nargs='*', default=[],
+                        help="Procesos de predict_batch_parallel a medir (p. ej. 2 4)")
+    parser.add_argument('--output', default=None, help="Ruta del JSON de resultados")
+    parser.add_argument('--baseline', default=None, help="JSON de una ejecución anterior para comparar")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Empeoramiento relativo tolerado antes de marcar regresión")
+    args = parser.parse_args(argv)
+
+    predictor = StudentDropoutPredictor()
+    predictor.load_model()
+
+    try:
+        report = run_benchmarks(predictor, args.sizes, args.stages, args.seed, args.workers)
+    finally:
+        predictor.close_parallel()
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(report, baseline, args.threshold)
+        for reg in regressions:
+            print(f"REGRESIÓN {reg['stage']} ({reg['rows']:,} filas) {reg['metric']}: "
+                  f"{reg['baseline']:.6g} -> {reg['current']:.6g} ({reg['change']:+.1%})", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+
+def feature_vector_key(vector: np.ndarray) -> str:
+    """
+    Hash canónico de un vector de características alineado
+
+    Se normaliza a float64 contiguo (el tipo del preprocesamiento, para que dos
+    vectores distintos no compartan clave) y se convierte -0.0 en 0.0 para que dos
+    formularios equivalentes produzcan siempre la misma clave.
+    """
+    canonical = np.ascontiguousarray(vector, dtype=np.float64) + 0.0
+    return hashlib.blake2b(canonical.tobytes(), digest_size=16).hexdigest()
+
+
+_FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+_FNV_PRIME = np.uint64(0x100000001b3)
+
+
+def feature_row_hashes(matrix: np.ndarray) -> np.ndarray:
+    """
+    Hash de 64 bits de cada fila de una matriz de características alineada
+
+    Versión vectorizada para lotes: FNV-1a sobre los valores float64 de cada
+    fila (columna a columna, para todas las filas a la vez) seguido de la mezcla
+    final de splitmix64. Como en feature_vector_key, -0.0 y 0.0 son equivalentes.
+
+    Returns:
+        Arreglo int64 con un hash por fila (con signo, para guardarlo en SQLite)
+    """
+    canonical = np.ascontiguousarray(matrix, dtype=np.float64) + 0.0
+    words = canonical.view(np.uint64)
+    hashes = np.full(len(words), _FNV_OFFSET, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for j in range(words.shape[1]):
+            hashes ^= words[:, j]
+            hashes *= _FNV_PRIME
+        hashes ^= hashes >> np.uint64(30)
+        hashes *= np.uint64(0xbf58476d1ce4e5b9)
+        hashes ^= hashes >> np.uint64(27)
+        hashes *= np.uint64(0x94d049bb133111eb)
+        hashes ^= hashes >> np.uint64(31)
+    return hashes.view(np.int64)
+
+
+class PredictionCache:
+    """
+    Caché LRU con caducidad opcional (TTL) para predicciones repetidas.
+
+    Las entradas quedan asociadas a la versión del modelo: al cambiar el artefacto
+    cargado (`bind_version`) la caché se vacía automáticamente. Es segura entre hilos.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if max_size < 0:
+            raise ValueError("max_size no puede ser negativo")
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.model_version: Optional[str] = None
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def bind_version(self, model_version: Optional[str]) -> None:
+        """Asocia la caché a una versión del modelo, vaciándola si la versión cambia"""
+        with self._lock:
+            if model_version != self.model_version:
+                self._entries.clear()
+                self.model_version = model_version
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Retorna el valor guardado o None si no existe o ha caducado"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if self.ttl_seconds is None or self._clock() - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Guarda un valor, descartando el menos usado si se supera el tamaño máximo"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso de la caché"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'model_version': self.model_version,
+        }
@@ -0,0 +1,240 @@
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from preprocessing import PreprocessingPlan, one_hot_groups
+
+# Rango de los enteros que se guardan en int16
+INT16_RANGE = (np.iinfo(np.int16).min, np.iinfo(np.int16).max)
+
+# Disposición de las columnas: posiciones guardadas como bits, como int16 y como float64
+Layout = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def infer_layout(matrix: np.ndarray) -> Layout:
+    """
+    Elige el almacenamiento más pequeño que representa exactamente cada columna
+
+    Las columnas con valores 0/1 (los grupos one-hot y las binarias) se guardan
+    como bits, las enteras en el rango de int16 como int16 y el resto en float64.
+    """
+    binary = ((matrix == 0) | (matrix == 1)).all(axis=0)
+    integral = (matrix == np.trunc(matrix)).all(axis=0)
+    if len(matrix):
+        integral &= (matrix.min(axis=0) >= INT16_RANGE[0]) & (matrix.max(axis=0) <= INT16_RANGE[1])
+    return (np.flatnonzero(binary), np.flatnonzero(integral & ~binary), np.flatnonzero(~integral))
+
+
+def merge_layouts(layouts: Sequence[Layout], num_columns: int) -> Layout:
+    """Disposición válida para todos los bloques: cada columna toma el tipo más general que necesita"""
+    kind = np.zeros(num_columns, dtype=np.int8)  # 0 = bits, 1 = int16, 2 = float64
+    for _, ints, floats in layouts:
+        kind[ints] = np.maximum(kind[ints], 1)
+        kind[floats] = 2
+    return (np.flatnonzero(kind == 0), np.flatnonzero(kind == 1), np.flatnonzero(kind == 2))
+
+
+class CompactBatch:
+    """
+    Representación compacta de un lote alineado con las columnas esperadas.
+
+    Los grupos one-hot y las columnas binarias se empaquetan a 1 bit por valor,
+    las columnas enteras se guardan en int16 y el resto en float64 (en float32 no
+    serían exactas: 127.3 no tiene representación float32); las columnas de
+    entrada que el modelo no usa (identificadores, ...) se conservan aparte.
+    La reconstrucción es exacta respecto de la matriz del preprocesamiento, de
+    modo que puntuar desde el lote compacto da las mismas probabilidades.
+    """
+
+    def __init__(self, columns: Sequence[str], layout: Layout, bits: np.ndarray, ints: np.ndarray,
+                 floats: np.ndarray, extras: Optional[pd.DataFrame] = None,
+                 source_columns: Optional[Sequence[Any]] = None):
+        self.columns = list(columns)
+        self.bit_positions, self.int_positions, self.float_positions = layout
+        self.bits = bits
+        self.ints = ints
+        self.floats = floats
+        self.extras = extras if extras is not None else pd.DataFrame(index=pd.RangeIndex(len(bits)))
+        # Columnas del archivo original, en su orden (las esperadas ausentes no se devuelven en to_frame)
+        self.source_columns = list(source_columns) if source_columns is not None else list(self.columns)
+
+    @classmethod
+    def from_matrix(cls, matrix: np.ndarray, columns: Sequence[str], layout: Optional[Layout] = None,
+                    extras: Optional[pd.DataFrame] = None,
+                    source_columns: Optional[Sequence[Any]] = None) -> "CompactBatch":
+        """
+        Compacta una matriz alineada con las columnas esperadas
+
+        Args:
+            matrix: Matriz del preprocesamiento
+            columns: Columnas esperadas
+            layout: Disposición a usar; por defecto la más pequeña para estos datos
+        """
+        if layout is None:
+            layout = infer_layout(matrix)
+        bit_positions, int_positions, float_positions = layout
+        bits = np.packbits(matrix[:, bit_positions].astype(np.uint8), axis=1, bitorder='little')
+        ints = matrix[:, int_positions].astype(np.int16)
+        floats = np.ascontiguousarray(matrix[:, float_positions], dtype=np.float64)
+        return cls(columns, layout, bits, ints, floats, extras, source_columns)
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame, plan: PreprocessingPlan,
+                   matrix: Optional[np.ndarray] = None) -> "CompactBatch":
+        """
+        Preprocesa y compacta un DataFrame; las columnas que el modelo no usa se guardan tal cual
+
+        Args:
+            data: DataFrame de entrada
+            plan: Plan de preprocesamiento
+            matrix: Matriz ya preprocesada de `data` (plan.transform), para no repetir la conversión
+        """
+        extra_columns = [col for col in data.columns if col not in plan.column_index]
+        extras = data[extra_columns].reset_index(drop=True)
+        if matrix is None:
+            matrix = plan.transform(data)
+        return cls.from_matrix(matrix, plan.columns, extras=extras, source_columns=data.columns)
+
+    @classmethod
+    def concat(cls, parts: Sequence["CompactBatch"]) -> "CompactBatch":
+        """Une varios lotes (p. ej. los bloques de un archivo) en una disposición común"""
+        first = parts[0]
+        layout = merge_layouts([part.layout for part in parts], len(first.columns))
+        aligned = [part if all(np.array_equal(a, b) for a, b in zip(part.layout, layout))
+                   else cls.from_matrix(part.to_dense(), part.columns, layout, part.extras, part.source_columns)
+                   for part in parts]
+        return cls(first.columns, layout,
+                   np.concatenate([part.bits for part in aligned]),
+                   np.concatenate([part.ints for part in aligned]),
+                   np.concatenate([part.floats for part in aligned]),
+                   pd.concat([part.extras for part in aligned], ignore_index=True),
+                   first.source_columns)
+
+    @property
+    def layout(self) -> Layout:
+        return (self.bit_positions, self.int_positions, self.float_positions)
+
+    def __len__(self) -> int:
+        return len(self.bits)
+
+    @property
+    def extra_columns(self) -> List[Any]:
+        return list(self.extras.columns)
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria de los arreglos del modelo (sin las columnas adicionales)"""
+        return self.bits.nbytes + self.ints.nbytes + self.floats.nbytes
+
+    @property
+    def dense_nbytes(self) -> int:
+        """Memoria de la misma matriz en float64 denso, como la del preprocesamiento"""
+        return len(self) * len(self.columns) * np.dtype(np.float64).itemsize
+
+    def memory_stats(self) -> Dict[str, float]:
+        """Bytes por fila en formato compacto, float32 denso y float64 (como un DataFrame numérico)"""
+        rows = max(len(self), 1)
+        return {
+            'rows': len(self),
+            'compact_bytes_per_row': self.nbytes / rows,
+            'float32_bytes_per_row': self.dense_nbytes / 2 / rows,
+            'float64_bytes_per_row': self.dense_nbytes / rows,
+            'ratio_vs_float64': self.dense_nbytes / max(self.nbytes, 1),
+        }
+
+    def slice(self, start: int, stop: Optional[int] = None) -> "CompactBatch":
+        """Vista de un tramo de filas, sin copiar"""
+        rows = slice(start, stop)
+        return CompactBatch(self.columns, self.layout, self.bits[rows], self.ints[rows], self.floats[rows],
+                            self.extras.iloc[rows].reset_index(drop=True), self.source_columns)
+
+    def to_dense(self) -> np.ndarray:
+        """Matriz float64 alineada con las columnas esperadas, lista para el modelo"""
+        matrix = np.empty((len(self), len(self.columns)), dtype=np.float64)
+        matrix[:, self.bit_positions] = np.unpackbits(self.bits, axis=1, count=len(self.bit_positions),
+                                                      bitorder='little')
+        matrix[:, self.int_positions] = self.ints
+        matrix[:, self.float_positions] = self.floats
+        return matrix
+
+    def iter_dense(self, chunksize: int = 50_000) -> Iterator[np.ndarray]:
+        """Reconstruye la matriz por bloques, para puntuar sin materializar el lote completo en float64"""
+        for start in range(0, len(self), chunksize):
+            yield self.slice(start, start + chunksize).to_dense()
+
+    def select(self, columns: Sequence[str]) -> np.ndarray:
+        """Matriz float64 de algunas columnas esperadas, decodificando solo lo necesario"""
+        index = {col: i for i, col in enumerate(self.columns)}
+        wanted = np.asarray([index[col] for col in columns], dtype=np.intp)
+        out = np.empty((len(self), len(wanted)), dtype=np.float64)
+        for positions, values in ((self.int_positions, self.ints), (self.float_positions, self.floats)):
+            hit = np.isin(wanted, positions)
+            if hit.any():
+                out[:, hit] = values[:, np.searchsorted(positions, wanted[hit])]
+        hit = np.isin(wanted, self.bit_positions)
+        if hit.any():
+            unpacked = np.unpackbits(self.bits, axis=1, count=len(self.bit_positions), bitorder='little')
+            out[:, hit] = unpacked[:, np.searchsorted(self.bit_positions, wanted[hit])]
+        return out
+
+    def group_columns(self, groups: Optional[Sequence[str]] = None) -> List[str]:
+        """Columnas de los grupos one-hot indicados (todos si es None)"""
+        return [self.columns[i] for group, positions in one_hot_groups(self.columns).items()
+                if groups is None or group in groups for i in positions]
+
+    def to_frame(self, start: int = 0, stop: Optional[int] = None,
+                 columns: Optional[Sequence[Any]] = None) -> pd.DataFrame:
+        """
+        DataFrame de un tramo de filas con las columnas del archivo original
+
+        Los bits se devuelven como uint8 y los enteros como int16; las columnas
+        esperadas que faltaban en el archivo no se incluyen.
+
+        Args:
+            start: Primera fila
+            stop: Fila final (exclusiva); None hasta el final
+            columns: Columnas a devolver; por defecto las del archivo original
+        """
+        part = self.slice(start, stop)
+        index = pd.RangeIndex(start, start + len(part))
+        expected = {col: i for i, col in enumerate(self.columns)}
+        output = {}
+        unpacked = None
+        for col in (self.source_columns if columns is None else columns):
+            if col not in expected:
+                output[col] = part.extras[col].to_numpy()
+                continue
+            i = expected[col]
+            k = np.searchsorted(self.bit_positions, i)
+            if k < len(self.bit_positions) and self.bit_positions[k] == i:
+                if unpacked is None:
+                    unpacked = np.unpackbits(part.bits, axis=1, count=len(self.bit_positions), bitorder='little')
+                output[col] = unpacked[:, k]
+                continue
+            k = np.searchsorted(self.int_positions, i)
+            if k < len(self.int_positions) and self.int_positions[k] == i:
+                output[col] = part.ints[:, k]
+            else:
+                output[col] = part.floats[:, np.searchsorted(self.float_positions, i)]
+        return pd.DataFrame(output, index=index, copy=False)
+
+    def iter_frames(self, chunksize: int = 50_000, columns: Optional[Sequence[Any]] = None) -> Iterator[pd.DataFrame]:
+        """Reconstruye el lote como DataFrames de como máximo `chunksize` filas"""
+        for start in range(0, len(self), chunksize):
+            yield self.to_frame(start, start + chunksize, columns)
+
+
+def iter_compact_scored_chunks(batch: CompactBatch, predictions: Dict[str, Any], chunksize: int = 50_000,
+                               columns: Optional[Sequence[Any]] = None) -> Iterator[Tuple[pd.DataFrame, Dict[str, Any]]]:
+    """
+    Como exporters.iter_scored_chunks, reconstruyendo cada bloque desde el lote compacto
+
+    Con `columns` solo se decodifican las columnas que se van a exportar. Los
+    valores son los del preprocesamiento (ausentes rellenados, one-hot en uint8):
+    sirven para rankings y vistas previas; para devolver los datos del usuario se
+    relee la fuente con exporters.iter_source_scored_chunks.
+    """
+    for start, frame in zip(range(0, len(batch), chunksize), batch.iter_frames(chunksize, columns)):
+        stop = start + chunksize
+        yield frame, {key: values[start:stop] for key, values in predictions.items()}
@@ -0,0 +1,588 @@
+"""
+Monitoreo de deriva de las entradas del modelo.
+
+Un perfil de referencia guarda, para cada columna numérica, los cortes de su
+histograma y la proporción de filas en cada tramo, y para cada grupo one-hot la
+proporción de cada categoría. DriftMonitor acumula los mismos conteos sobre los
+lotes que se puntúan (memoria constante: un contador por tramo o categoría) y
+los compara con la referencia con PSI y con un KS sobre los histogramas. Los
+valores ausentes se cuentan aparte y no entran en los histogramas.
+
+    python drift.py build-reference cohorte_2025.csv --output drift_reference.json
+    python drift.py report cohorte_2026.csv --reference drift_reference.json
+"""
+import argparse
+import json
+import os
+import pickle
+import queue
+import sys
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from artifacts import COLUMNS_FILENAME, resolve_artifact_path
+from metrics import METRIC_PREFIX, _escape
+from preprocessing import PreprocessingPlan, one_hot_groups
+from whatif import REFERENCE_CATEGORY
+
+# Perfil de referencia activo; si el archivo no existe el monitoreo queda desactivado
+DEFAULT_DRIFT_REFERENCE_PATH = os.environ.get("DESERCION_DRIFT_REFERENCE", "drift_reference.json")
+
+DEFAULT_DRIFT_BINS = 10
+
+# Filas por lote que se incorporan a los histogramas; los lotes mayores se submuestrean
+DEFAULT_DRIFT_SAMPLE_ROWS = 5_000
+
+# Filas de lotes pequeños que se acumulan antes de contarlas juntas
+DEFAULT_DRIFT_BUFFER_ROWS = 256
+
+# Lotes pendientes del conteo en segundo plano; con la cola llena se cuentan en el hilo que llama
+DEFAULT_DRIFT_QUEUE = 8
+
+# Umbrales habituales del PSI: < 0.1 estable, < 0.25 deriva moderada, >= 0.25 deriva significativa
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+DRIFT_STABLE = 'estable'
+DRIFT_MODERATE = 'moderada'
+DRIFT_SIGNIFICANT = 'significativa'
+
+# Proporción mínima usada en el PSI para que un tramo vacío no dé un valor infinito
+_PSI_EPSILON = 1e-4
+
+
+def _histogram_edges(values: np.ndarray, bins: int) -> np.ndarray:
+    """
+    Cortes internos del histograma de una columna de referencia
+
+    Las columnas con pocos valores distintos (binarias, contadores) usan un tramo
+    por valor, cortando en los puntos medios; el resto, cuantiles de igual frecuencia.
+    """
+    distinct = np.unique(values)
+    if len(distinct) <= bins:
+        return (distinct[:-1] + distinct[1:]) / 2
+    return np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+
+
+def population_stability_index(expected: np.ndarray, actual: np.ndarray) -> float:
+    """PSI entre dos distribuciones de proporciones sobre los mismos tramos"""
+    expected = np.clip(expected, _PSI_EPSILON, None)
+    actual = np.clip(actual, _PSI_EPSILON, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def drift_status(psi: float) -> str:
+    if psi >= PSI_SIGNIFICANT:
+        return DRIFT_SIGNIFICANT
+    if psi >= PSI_MODERATE:
+        return DRIFT_MODERATE
+    return DRIFT_STABLE
+
+
+class DriftReference:
+    """
+    Perfil de referencia de las columnas esperadas.
+
+    Cada columna que no pertenece a un grupo one-hot tiene sus cortes, las
+    proporciones de referencia por tramo y su media; cada grupo one-hot tiene la
+    proporción de cada categoría, incluida la de referencia (todas en cero). Las
+    proporciones se calculan sobre las filas con valor; `missing` guarda la
+    fracción de filas sin valor de cada variable.
+    """
+
+    def __init__(self, columns: Sequence[str], edges: Dict[str, Sequence[float]],
+                 proportions: Dict[str, Sequence[float]], means: Dict[str, float], rows: int,
+                 created_at: Optional[str] = None, description: str = "",
+                 missing: Optional[Dict[str, float]] = None):
+        self.columns = list(columns)
+        self.edges = {name: np.asarray(cuts, dtype=np.float64) for name, cuts in edges.items()}
+        self.proportions = {name: np.asarray(values, dtype=np.float64) for name, values in proportions.items()}
+        self.means = dict(means)
+        self.rows = rows
+        self.created_at = created_at or datetime.now().isoformat(timespec='seconds')
+        self.description = description
+        self.missing = dict(missing or {})
+
+        self.groups = one_hot_groups(self.columns)
+        grouped = {i for positions in self.groups.values() for i in positions}
+        self.numeric_positions = [i for i in range(len(self.columns)) if i not in grouped]
+        self.numeric_columns = [self.columns[i] for i in self.numeric_positions]
+
+    def categories(self, group: str) -> List[str]:
+        """Categorías de un grupo en el orden de sus contadores (la de referencia al final)"""
+        return [self.columns[i].split('_', 1)[1] for i in self.groups[group]] + [REFERENCE_CATEGORY]
+
+    @classmethod
+    def from_matrix(cls, matrix: np.ndarray, columns: Sequence[str], bins: int = DEFAULT_DRIFT_BINS,
+                    description: str = "", missing: Optional[np.ndarray] = None) -> "DriftReference":
+        """
+        Construye el perfil a partir de una matriz alineada con las columnas esperadas
+
+        Args:
+            matrix: Matriz del preprocesamiento de la población de referencia
+                (p. ej. la cohorte con que se entrenó el modelo), sin rellenar los
+                valores ausentes (NaN)
+            columns: Columnas esperadas
+            bins: Tramos máximos por columna numérica
+            missing: Máscara de valores ausentes antes del relleno, si la matriz ya se rellenó
+        """
+        if len(matrix) == 0:
+            raise ValueError("La población de referencia está vacía")
+        absent = _missing_mask(matrix, missing)
+        reference = cls(columns, {}, {}, {}, len(matrix), description=description)
+        for position, name in zip(reference.numeric_positions, reference.numeric_columns):
+            values = matrix[~absent[:, position], position].astype(np.float64)
+            reference.edges[name] = _histogram_edges(values, bins) if len(values) else np.empty(0)
+            if len(values):
+                reference.means[name] = float(values.mean())
+
+        # Las proporciones de referencia se cuentan igual que en el monitoreo
+        monitor = DriftMonitor(reference, sample_rows=None)
+        monitor.update(matrix, absent)
+        reference.proportions = {name: counts / max(counts.sum(), 1.0) for name, counts in monitor.counts().items()}
+        reference.missing = monitor.missing_rates()
+        return reference
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'columns': self.columns,
+            'rows': self.rows,
+            'created_at': self.created_at,
+            'description': self.description,
+            'edges': {name: cuts.tolist() for name, cuts in self.edges.items()},
+            'proportions': {name: values.tolist() for name, values in self.proportions.items()},
+            'means': self.means,
+            'missing': self.missing,
+        }
+
+    @classmethod
+    def from_dict(cls, definition: Dict[str, Any]) -> "DriftReference":
+        return cls(definition['columns'], definition['edges'], definition['proportions'],
+                   definition.get('means', {}), definition.get('rows', 0), definition.get('created_at'),
+                   definition.get('description', ""), definition.get('missing'))
+
+
+def load_drift_reference(path: Optional[str] = None) -> Optional[DriftReference]:
+    """
+    Carga un perfil de referencia desde JSON
+
+    Returns:
+        El perfil, o None si no se indicó ruta y DEFAULT_DRIFT_REFERENCE_PATH no existe
+    """
+    explicit = path is not None
+    path = path or DEFAULT_DRIFT_REFERENCE_PATH
+    if not os.path.exists(path):
+        if explicit:
+            raise FileNotFoundError(f"No se encontró el perfil de referencia: {path}")
+        return None
+    with open(path, encoding='utf-8') as f:
+        return DriftReference.from_dict(json.load(f))
+
+
+def save_drift_reference(reference: DriftReference, path: str) -> None:
+    """Guarda un perfil en JSON, reemplazando el archivo de forma atómica"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(reference.to_dict(), f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class DriftMonitor:
+    """
+    Histogramas y contadores acumulados de los lotes puntuados.
+
+    `update` asigna el tramo de todos los valores numéricos del lote a la vez
+    (una comparación de la matriz por corte, con los cortes de cada columna
+    completados con inf) y los cuenta con un solo bincount; los grupos one-hot
+    se cuentan con reduceat, sin recorrer columnas ni grupos en Python. La memoria es fija (un contador
+    por tramo o categoría) sin importar cuántas filas pasen. Los lotes de más de
+    `sample_rows` filas se submuestrean con paso fijo y cada fila muestreada pesa
+    rows / muestra, de modo que el costo por lote queda acotado y cada lote
+    cuenta según su tamaño. Los lotes de hasta `buffer_rows` filas (p. ej. las
+    predicciones individuales) solo se copian a un búfer que se cuenta de una vez
+    al llenarse o al leer los conteos. Con `background=True` los conteos los hace
+    un hilo aparte y `update` solo copia la muestra a una cola, de modo que la
+    ruta de predicción no espera al conteo; si la cola está llena el lote se
+    cuenta en el hilo que llama (no se pierden filas), y leer los conteos espera
+    a que la cola se vacíe. Los valores ausentes (NaN en la matriz o
+    marcados en la máscara `missing`) se cuentan por variable y quedan fuera de
+    los histogramas y de las medias, de modo que un relleno con 0 no aparece
+    como deriva. Es seguro llamarlo desde varios hilos.
+    """
+
+    def __init__(self, reference: DriftReference, sample_rows: Optional[int] = DEFAULT_DRIFT_SAMPLE_ROWS,
+                 buffer_rows: int = DEFAULT_DRIFT_BUFFER_ROWS, background: bool = False,
+                 max_pending: int = DEFAULT_DRIFT_QUEUE):
+        """
+        Args:
+            reference: Perfil contra el que se compara
+            sample_rows: Máximo de filas por lote que se cuentan; None = todas
+            buffer_rows: Filas que se acumulan de los lotes pequeños antes de contarlas; 0 = sin búfer
+            background: Contar los lotes en un hilo aparte en lugar de en `update`
+            max_pending: Lotes que pueden esperar en la cola del hilo
+        """
+        self.reference = reference
+        self.sample_rows = sample_rows
+        self.buffer_rows = buffer_rows
+        self._lock = threading.Lock()
+        self._queue: Optional["queue.Queue[Any]"] = queue.Queue(maxsize=max_pending) if background else None
+        self._thread: Optional[threading.Thread] = None
+        self._numeric_positions = np.asarray(reference.numeric_positions, dtype=np.intp)
+
+        # Cortes de cada columna numérica en una fila, completados con inf hasta el máximo de cortes:
+        # el tramo de un valor es el número de cortes de su columna menores o iguales que él
+        edges = [reference.edges[name] for name in reference.numeric_columns]
+        self._padded_edges = np.full((len(edges), max((len(cuts) for cuts in edges), default=0)), np.inf)
+        for k, cuts in enumerate(edges):
+            self._padded_edges[k, :len(cuts)] = cuts
+        # Inicio de los contadores de cada columna en el arreglo plano de tramos
+        self._numeric_bounds = np.concatenate([[0], np.cumsum([len(cuts) + 1 for cuts in edges])]).astype(np.intp)
+
+        # Columnas one-hot ordenadas por grupo; en el arreglo plano de categorías cada grupo
+        # ocupa sus columnas seguidas de la categoría de referencia
+        self._one_hot_positions = np.asarray([i for positions in reference.groups.values() for i in positions],
+                                             dtype=np.intp)
+        sizes = np.asarray([len(positions) for positions in reference.groups.values()], dtype=np.intp)
+        self._group_starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+        self._group_bounds = np.concatenate([[0], np.cumsum(sizes + 1)]).astype(np.intp)
+        self._reference_slots = self._group_bounds[1:] - 1
+        self._hit_slots = np.arange(len(self._one_hot_positions)) + np.repeat(np.arange(len(sizes)), sizes)
+        self.reset()
+
+    def reset(self) -> None:
+        """Reinicia los conteos (p. ej. al empezar un nuevo periodo académico)"""
+        if self._queue is not None:
+            self._queue.join()
+        with self._lock:
+            self.rows = 0
+            self.batches = 0
+            self._numeric_counts = np.zeros(self._numeric_bounds[-1], dtype=np.float64)
+            self._group_counts = np.zeros(self._group_bounds[-1], dtype=np.float64)
+            self._sums = np.zeros(len(self._numeric_positions), dtype=np.float64)
+            # Filas con valor de cada columna numérica, para las medias
+            self._present = np.zeros(len(self._numeric_positions), dtype=np.float64)
+            self._numeric_missing = np.zeros(len(self._numeric_positions), dtype=np.float64)
+            self._group_missing = np.zeros(len(self._group_starts), dtype=np.float64)
+            self._pending: List[Tuple[np.ndarray, Optional[np.ndarray]]] = []
+            self._pending_rows = 0
+
+    def sample_step(self, rows: int) -> int:
+        """Paso del submuestreo de un lote de `rows` filas (1 = se cuentan todas)"""
+        if self.sample_rows and rows > self.sample_rows:
+            return -(-rows // self.sample_rows)
+        return 1
+
+    def update(self, matrix: np.ndarray, missing: Optional[np.ndarray] = None,
+               rows: Optional[int] = None) -> None:
+        """
+        Acumula un lote alineado con las columnas esperadas
+
+        Args:
+            matrix: Matriz del lote
+            missing: Máscara de valores ausentes antes del relleno (PreprocessingPlan.transform
+                con return_missing=True); sin ella solo se consideran ausentes los NaN
+            rows: Filas del lote completo cuando `matrix` ya es su submuestra con
+                paso sample_step(rows) (p. ej. la reunida por los trabajadores de ParallelScorer)
+        """
+        if rows is None and len(matrix) <= self.buffer_rows:
+            if len(matrix) == 0:
+                return
+            # Lotes pequeños: se copian y se cuentan juntos (todos pesan 1)
+            with self._lock:
+                self.rows += len(matrix)
+                self.batches += 1
+                self._pending.append((np.array(matrix), None if missing is None else np.array(missing)))
+                self._pending_rows += len(matrix)
+                full = self._pending_rows >= self.buffer_rows
+            if full:
+                self._submit(*self._take_pending())
+            return
+
+        if rows is None:
+            rows = len(matrix)
+            step = self.sample_step(rows)
+            sample = matrix[::step] if step > 1 else matrix
+            sample_missing = missing[::step] if step > 1 and missing is not None else missing
+        else:
+            sample, sample_missing = matrix, missing
+        if rows == 0 or len(sample) == 0:
+            return
+        with self._lock:
+            self.rows += rows
+            self.batches += 1
+        if self._queue is not None:
+            # El llamador puede reutilizar la matriz: el hilo cuenta una copia
+            sample = np.array(sample)
+            sample_missing = None if sample_missing is None else np.array(sample_missing)
+        self._submit(sample, sample_missing, rows / len(sample))
+
+    def _take_pending(self) -> Tuple[Optional[np.ndarray], Optional[np.ndarray], float]:
+        """Vacía el búfer de lotes pequeños y devuelve sus filas unidas (todas pesan 1)"""
+        with self._lock:
+            pending, self._pending, self._pending_rows = self._pending, [], 0
+        if not pending:
+            return None, None, 1.0
+        matrix = np.concatenate([part for part, _ in pending])
+        missing = None
+        if any(mask is not None for _, mask in pending):
+            missing = np.concatenate([mask if mask is not None else np.zeros(part.shape, dtype=bool)
+                                      for part, mask in pending])
+        return matrix, missing, 1.0
+
+    def _submit(self, sample: Optional[np.ndarray], sample_missing: Optional[np.ndarray], weight: float) -> None:
+        """Cuenta una muestra aquí o la encola para el hilo de conteo"""
+        if sample is None:
+            return
+        if self._queue is not None:
+            self._start_worker()
+            try:
+                self._queue.put_nowait((sample, sample_missing, weight))
+                return
+            except queue.Full:
+                pass
+        counts = self._count(sample, sample_missing, weight)
+        with self._lock:
+            self._accumulate(counts)
+
+    def _start_worker(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="drift-monitor", daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        jobs = self._queue
+        while True:
+            item = jobs.get()
+            try:
+                if item is None:
+                    return
+                counts = self._count(*item)
+                with self._lock:
+                    self._accumulate(counts)
+            finally:
+                jobs.task_done()
+
+    def flush(self) -> None:
+        """Cuenta las filas pendientes del búfer y espera a que el hilo de conteo termine la cola"""
+        sample, sample_missing, weight = self._take_pending()
+        if sample is not None:
+            counts = self._count(sample, sample_missing, weight)
+            with self._lock:
+                self._accumulate(counts)
+        if self._queue is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """Cuenta lo pendiente y detiene el hilo de conteo; los lotes posteriores se cuentan en `update`"""
+        self.flush()
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5.0)
+            self._thread = None
+        self._queue = None
+
+    def _count(self, sample: np.ndarray, sample_missing: Optional[np.ndarray],
+               weight: float) -> Tuple[np.ndarray, ...]:
+        """Conteos ponderados de una muestra, sin tocar el estado acumulado"""
+        n = len(sample)
+        absent = _missing_mask(sample, sample_missing)
+
+        values = sample[:, self._numeric_positions]
+        numeric_absent = absent[:, self._numeric_positions]
+        # Tramo de todos los valores a la vez: pocas comparaciones (una por corte) sobre la matriz completa
+        bins = np.zeros(values.shape, dtype=np.intp)
+        for cuts in self._padded_edges.T:
+            bins += values >= cuts
+        bins += self._numeric_bounds[:-1]
+        # Los ausentes van a un contador adicional que se descarta
+        bins[numeric_absent] = self._numeric_bounds[-1]
+        numeric = np.bincount(bins.ravel(), minlength=self._numeric_bounds[-1] + 1)[:-1] * weight
+        n_absent = np.count_nonzero(numeric_absent, axis=0)
+        sums = np.where(numeric_absent, 0.0, values).sum(axis=0, dtype=np.float64) * weight
+
+        hits = np.zeros(len(self._one_hot_positions), dtype=np.float64)
+        reference_hits = np.zeros(len(self._group_starts), dtype=np.float64)
+        unknown_rows = np.zeros(len(self._group_starts), dtype=np.float64)
+        if len(self._one_hot_positions):
+            active = sample[:, self._one_hot_positions] == 1
+            hits = np.count_nonzero(active, axis=0) * weight
+            any_active = np.logical_or.reduceat(active, self._group_starts, axis=1)
+            # Sin categoría activa y con alguna columna ausente no se sabe la categoría
+            unknown = np.logical_or.reduceat(absent[:, self._one_hot_positions], self._group_starts, axis=1)
+            unknown &= ~any_active
+            unknown_rows = np.count_nonzero(unknown, axis=0)
+            reference_hits = (n - np.count_nonzero(any_active, axis=0) - unknown_rows) * weight
+            unknown_rows = unknown_rows * weight
+        return numeric, sums, (n - n_absent) * weight, n_absent * weight, hits, reference_hits, unknown_rows
+
+    def _accumulate(self, counts: Tuple[np.ndarray, ...]) -> None:
+        """Suma los conteos de _count al estado (con el candado tomado)"""
+        numeric, sums, present, numeric_missing, hits, reference_hits, group_missing = counts
+        self._numeric_counts += numeric
+        self._sums += sums
+        self._present += present
+        self._numeric_missing += numeric_missing
+        self._group_counts[self._hit_slots] += hits
+        self._group_counts[self._reference_slots] += reference_hits
+        self._group_missing += group_missing
+
+    def counts(self) -> Dict[str, np.ndarray]:
+        """Conteos acumulados por columna numérica y por grupo one-hot"""
+        self.flush()
+        with self._lock:
+            numeric, groups = self._numeric_counts.copy(), self._group_counts.copy()
+        bounds, group_bounds = self._numeric_bounds, self._group_bounds
+        return {**{name: numeric[bounds[k]:bounds[k + 1]]
+                   for k, name in enumerate(self.reference.numeric_columns)},
+                **{group: groups[group_bounds[k]:group_bounds[k + 1]]
+                   for k, group in enumerate(self.reference.groups)}}
+
+    def missing_rates(self) -> Dict[str, float]:
+        """Fracción de filas observadas sin valor, por columna numérica y por grupo one-hot"""
+        self.flush()
+        with self._lock:
+            rows = self.rows
+            missing = np.concatenate([self._numeric_missing, self._group_missing])
+        names = list(self.reference.numeric_columns) + list(self.reference.groups)
+        return {name: float(count) / rows if rows else 0.0 for name, count in zip(names, missing)}
+
+    def report(self) -> pd.DataFrame:
+        """
+        Comparación con la referencia, de mayor a menor PSI
+
+        Returns:
+            DataFrame con feature, kind ('numeric' o 'one_hot'), psi, ks (máxima
+            diferencia entre las distribuciones acumuladas de los tramos), status,
+            reference_mean y current_mean (solo columnas numéricas), y
+            reference_missing_rate y missing_rate (fracción de filas sin valor).
+            PSI, KS y medias se calculan solo sobre las filas con valor.
+        """
+        counts = self.counts()
+        missing_rates = self.missing_rates()
+        with self._lock:
+            sums, present = self._sums.copy(), self._present.copy()
+        reference = self.reference
+        means = {name: total / n for name, total, n in zip(reference.numeric_columns, sums, present) if n}
+        records = []
+        for name, observed in counts.items():
+            expected = reference.proportions[name]
+            observed_rows = observed.sum()
+            actual = observed / observed_rows if observed_rows else np.zeros_like(expected)
+            psi = population_stability_index(expected, actual) if observed_rows else 0.0
+            is_numeric = name in reference.edges
+            records.append({
+                'feature': name,
+                'kind': 'numeric' if is_numeric else 'one_hot',
+                'psi': psi,
+                # En los grupos one-hot el orden de las categorías es arbitrario: se usa la mayor diferencia
+                'ks': float(np.abs(np.cumsum(actual) - np.cumsum(expected)).max() if is_numeric
+                            else np.abs(actual - expected).max()) if observed_rows else 0.0,
+                'status': drift_status(psi) if observed_rows else DRIFT_STABLE,
+                'reference_mean': reference.means.get(name) if is_numeric else None,
+                'current_mean': float(means[name]) if name in means else None,
+                'reference_missing_rate': reference.missing.get(name, 0.0),
+                'missing_rate': missing_rates[name],
+            })
+        return pd.DataFrame.from_records(records).sort_values('psi', ascending=False, kind='stable') \
+            .reset_index(drop=True)
+
+    def category_shift(self, group: str) -> pd.DataFrame:
+        """Proporción de referencia y actual de cada categoría de un grupo one-hot"""
+        observed = self.counts()[group]
+        total = max(float(observed.sum()), 1.0)
+        return pd.DataFrame({'reference': self.reference.proportions[group], 'current': observed / total},
+                            index=pd.Index(self.reference.categories(group), name=group))
+
+    def summary(self) -> Dict[str, Any]:
+        """Resumen para get_model_info: filas observadas y variables con deriva"""
+        report = self.report()
+        return {
+            'rows': self.rows,
+            'batches': self.batches,
+            'reference_rows': self.reference.rows,
+            'max_psi': float(report['psi'].max()) if len(report) else 0.0,
+            'moderate': report.loc[report['status'] == DRIFT_MODERATE, 'feature'].tolist(),
+            'significant': report.loc[report['status'] == DRIFT_SIGNIFICANT, 'feature'].tolist(),
+            'missing': {name: float(rate) for name, rate in zip(report['feature'], report['missing_rate']) if rate},
+        }
+
+    def to_prometheus(self, prefix: str = METRIC_PREFIX) -> str:
+        """PSI, KS y fracción sin valor por variable como gauges con etiqueta, en formato de texto de Prometheus"""
+        report = self.report()
+        lines = [f"# TYPE {prefix}_drift_rows gauge", f"{prefix}_drift_rows {self.rows}"]
+        for metric, description in (('psi', 'Índice de estabilidad poblacional respecto de la referencia'),
+                                    ('ks', 'Máxima diferencia de distribución acumulada respecto de la referencia'),
+                                    ('missing_rate', 'Fracción de filas observadas sin valor')):
+            lines.append(f"# HELP {prefix}_drift_{metric} {description}")
+            lines.append(f"# TYPE {prefix}_drift_{metric} gauge")
+            for name, value in zip(report['feature'], report[metric]):
+                lines.append(f'{prefix}_drift_{metric}{{feature="{_escape(name)}"}} {float(value)!r}')
+        return "\n".join(lines) + "\n"
+
+
+def _missing_mask(matrix: np.ndarray, missing: Optional[np.ndarray]) -> np.ndarray:
+    """Valores ausentes: los NaN de la matriz más los marcados en la máscara previa al relleno"""
+    absent = np.isnan(matrix)
+    if missing is not None:
+        absent |= missing
+    return absent
+
+
+def _load_plan(columns_path: Optional[str]) -> PreprocessingPlan:
+    with open(columns_path or resolve_artifact_path(COLUMNS_FILENAME), 'rb') as f:
+        return PreprocessingPlan(list(pickle.load(f)))
+
+
+def _iter_matrices(source: str, plan: PreprocessingPlan, chunksize: int) -> Iterable[Tuple[np.ndarray, np.ndarray]]:
+    from predictor import iter_data_chunks
+    for chunk in iter_data_chunks(source, chunksize):
+        # Sin rellenar: los valores ausentes se cuentan aparte de los histogramas
+        yield plan.transform(chunk, fill_missing=False, return_missing=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Monitoreo de deriva de las entradas del modelo")
+    parser.add_argument('--columns-path', default=None, help="Ruta de las columnas esperadas (.pkl)")
+    parser.add_argument('--chunksize', type=int, default=50_000)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build-reference', help="Crear el perfil de referencia desde una cohorte")
+    build.add_argument('source', help="Archivo CSV o Parquet de la población de referencia")
+    build.add_argument('--output', default=DEFAULT_DRIFT_REFERENCE_PATH)
+    build.add_argument('--bins', type=int, default=DEFAULT_DRIFT_BINS)
+    build.add_argument('--description', default="")
+
+    report = commands.add_parser('report', help="Comparar una cohorte con el perfil de referencia")
+    report.add_argument('source', help="Archivo CSV o Parquet")
+    report.add_argument('--reference', default=DEFAULT_DRIFT_REFERENCE_PATH)
+
+    args = parser.parse_args(argv)
+    plan = _load_plan(args.columns_path)
+    try:
+        if args.command == 'build-reference':
+            # Los cuantiles necesitan la población completa, que se reúne en memoria
+            matrices, masks = zip(*_iter_matrices(args.source, plan, args.chunksize))
+            reference = DriftReference.from_matrix(np.concatenate(matrices), plan.columns, args.bins,
+                                                   args.description, np.concatenate(masks))
+            save_drift_reference(reference, args.output)
+            print(f"Perfil de {reference.rows} filas guardado en {args.output}")
+        elif args.command == 'report':
+            monitor = DriftMonitor(load_drift_reference(args.reference))
+            for matrix, missing in _iter_matrices(args.source, plan, args.chunksize):
+                monitor.update(matrix, missing)
+            with pd.option_context('display.max_rows', None, 'display.width', 120):
+                print(monitor.report().to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
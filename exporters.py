@@ -0,0 +1,308 @@
+"""
+Exportación incremental de predicciones a CSV, Parquet o Arrow IPC.
+
+Los escritores reciben los resultados bloque a bloque (por ejemplo, de
+StudentDropoutPredictor.predict_stream) y los escriben en un destino tipo
+archivo sin materializar nunca el resultado completo en memoria. pyarrow solo
+se importa al escribir Parquet o Arrow.
+"""
+import io
+import os
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+PREDICTION_COLUMNS = ['Probabilidad_Desercion', 'Prediccion_Desercion', 'Clasificacion',
+                      'Nivel_Riesgo', 'Fecha_Prediccion']
+
+CLASSIFICATION_LABELS = np.array(['No Deserción', 'Deserción'], dtype=object)
+
+EXPORT_FORMATS = ('csv', 'parquet', 'arrow')
+
+EXPORT_MIME_TYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+ScoredChunk = Tuple[pd.DataFrame, Dict[str, Any]]
+
+
+def build_export_frame(chunk: pd.DataFrame, predictions: Dict[str, Any], timestamp: str,
+                       columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Construye el bloque de salida: columnas de entrada proyectadas más columnas de predicción
+
+    Args:
+        chunk: Bloque de datos de entrada
+        predictions: Predicciones del bloque
+        timestamp: Fecha de predicción común a toda la exportación
+        columns: Columnas de entrada a conservar (p. ej. identificadores); None conserva todas
+
+    Returns:
+        DataFrame listo para escribir
+    """
+    selected = chunk if columns is None else chunk.loc[:, list(columns)]
+    labels = np.asarray(predictions['predictions'])
+    output = {name: selected[name].to_numpy() for name in selected.columns}
+    output.update({
+        'Probabilidad_Desercion': np.asarray(predictions['probabilities']),
+        'Prediccion_Desercion': labels,
+        # Etiqueta vectorizada: índice 0/1 sobre un arreglo de dos cadenas
+        'Clasificacion': CLASSIFICATION_LABELS[(labels == 1).astype(np.intp)],
+        'Nivel_Riesgo': np.asarray(predictions['risk_levels']),
+        'Fecha_Prediccion': np.full(len(selected), timestamp, dtype=object),
+    })
+    return pd.DataFrame(output, index=selected.index, copy=False)
+
+
+class PredictionWriter:
+    """Escritor incremental de predicciones; las subclases definen el formato"""
+
+    format_name = ''
+
+    def __init__(self, sink: Any, columns: Optional[Sequence[str]] = None, timestamp: Optional[str] = None):
+        self.columns = list(columns) if columns is not None else None
+        self.timestamp = timestamp or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.rows_written = 0
+        self._owns_sink = not hasattr(sink, 'write')
+        self._sink = self._open(sink) if self._owns_sink else sink
+
+    def __enter__(self) -> "PredictionWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _open(self, path: Any) -> Any:
+        return open(path, 'wb')
+
+    def write(self, chunk: pd.DataFrame, predictions: Dict[str, Any]) -> int:
+        """Escribe un bloque y retorna el número de filas escritas"""
+        frame = build_export_frame(chunk, predictions, self.timestamp, self.columns)
+        self._write_frame(frame)
+        self.rows_written += len(frame)
+        return len(frame)
+
+    def _write_frame(self, frame: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        if self._owns_sink and self._sink is not None:
+            self._sink.close()
+        self._sink = None
+
+
+class CsvPredictionWriter(PredictionWriter):
+    """CSV UTF-8; el encabezado se escribe solo con el primer bloque"""
+
+    format_name = 'csv'
+
+    def __init__(self, sink: Any, columns: Optional[Sequence[str]] = None, timestamp: Optional[str] = None):
+        super().__init__(sink, columns, timestamp)
+        self._header_written = False
+        # Los destinos binarios se envuelven para escribir texto
+        self._text = self._sink if isinstance(self._sink, io.TextIOBase) else \
+            io.TextIOWrapper(self._sink, encoding='utf-8', newline='', write_through=True)
+
+    def _open(self, path: Any) -> Any:
+        return open(path, 'w', encoding='utf-8', newline='')
+
+    def _write_frame(self, frame: pd.DataFrame) -> None:
+        frame.to_csv(self._text, index=False, header=not self._header_written)
+        self._header_written = True
+
+    def close(self) -> None:
+        if self._text is not self._sink and self._text is not None:
+            self._text.flush()
+            self._text.detach()
+        self._text = None
+        super().close()
+
+
+class ParquetPredictionWriter(PredictionWriter):
+    """Parquet con un grupo de filas por bloque; el esquema lo fija el primer bloque"""
+
+    format_name = 'parquet'
+
+    def __init__(self, sink: Any, columns: Optional[Sequence[str]] = None, timestamp: Optional[str] = None):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa, self._pq = pa, pq
+        self._writer = None
+        self._schema = None
+        super().__init__(sink, columns, timestamp)
+
+    def _write_frame(self, frame: pd.DataFrame) -> None:
+        table = self._pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False)
+        if self._writer is None:
+            self._schema = table.schema
+            self._writer = self._pq.ParquetWriter(self._sink, self._schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        super().close()
+
+
+class ArrowPredictionWriter(PredictionWriter):
+    """Arrow IPC en formato stream (admite destinos no posicionables)"""
+
+    format_name = 'arrow'
+
+    def __init__(self, sink: Any, columns: Optional[Sequence[str]] = None, timestamp: Optional[str] = None):
+        import pyarrow as pa
+        self._pa = pa
+        self._writer = None
+        self._schema = None
+        super().__init__(sink, columns, timestamp)
+
+    def _write_frame(self, frame: pd.DataFrame) -> None:
+        batch = self._pa.RecordBatch.from_pandas(frame, schema=self._schema, preserve_index=False)
+        if self._writer is None:
+            self._schema = batch.schema
+            self._writer = self._pa.ipc.new_stream(self._sink, self._schema)
+        self._writer.write_batch(batch)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        super().close()
+
+
+WRITERS = {
+    'csv': CsvPredictionWriter,
+    'parquet': ParquetPredictionWriter,
+    'arrow': ArrowPredictionWriter,
+}
+
+
+def infer_export_format(sink: Any, default: str = 'csv') -> str:
+    """Deduce el formato a partir de la extensión del destino"""
+    if isinstance(sink, (str, os.PathLike)):
+        suffix = os.path.splitext(os.fspath(sink))[1].lower()
+        if suffix in ('.parquet', '.pq'):
+            return 'parquet'
+        if suffix in ('.arrow', '.arrows', '.ipc', '.feather'):
+            return 'arrow'
+    return default
+
+
+def open_prediction_writer(sink: Any, file_format: Optional[str] = None,
+                           columns: Optional[Sequence[str]] = None) -> PredictionWriter:
+    """
+    Crea un escritor incremental para el destino indicado
+
+    Args:
+        sink: Ruta o archivo abierto (texto para CSV, binario para cualquier formato)
+        file_format: 'csv', 'parquet' o 'arrow'; por defecto se deduce de la extensión
+        columns: Columnas de entrada a conservar además de las de predicción
+
+    Returns:
+        Escritor listo para recibir bloques
+    """
+    file_format = file_format or infer_export_format(sink)
+    if file_format not in WRITERS:
+        raise ValueError(f"Formato de exportación no soportado: {file_format}. Use uno de {EXPORT_FORMATS}")
+    return WRITERS[file_format](sink, columns)
+
+
+def export_predictions(results: Iterable[ScoredChunk], sink: Any, file_format: Optional[str] = None,
+                       columns: Optional[Sequence[str]] = None, metrics: Any = None, policy: Any = None) -> int:
+    """
+    Escribe bloque a bloque los resultados de una puntuación
+
+    Args:
+        results: Iterable de tuplas (bloque, predicciones del bloque)
+        sink: Ruta o archivo de destino
+        file_format: 'csv', 'parquet' o 'arrow'
+        columns: Columnas de entrada a conservar
+        metrics: PredictorMetrics opcional donde registrar la etapa 'export'
+        policy: RiskPolicy con la que recalcular Nivel_Riesgo; None conserva los niveles recibidos
+
+    Returns:
+        Número total de filas escritas
+    """
+    if policy is not None:
+        results = rebucket_chunks(results, policy)
+    with open_prediction_writer(sink, file_format, columns) as writer:
+        for chunk, predictions in results:
+            if metrics is not None:
+                with metrics.stage('export', len(chunk)):
+                    writer.write(chunk, predictions)
+            else:
+                writer.write(chunk, predictions)
+        return writer.rows_written
+
+
+def export_to_bytes(results: Iterable[ScoredChunk], file_format: str = 'csv',
+                    columns: Optional[Sequence[str]] = None, metrics: Any = None, policy: Any = None) -> bytes:
+    """
+    Exporta a bytes, el tipo que acepta st.download_button con `data` diferido
+
+    El archivo se escribe primero en disco, de modo que en memoria solo queda
+    una copia del resultado (la que se entrega).
+
+    Returns:
+        Contenido del archivo exportado
+    """
+    with tempfile.TemporaryFile(mode='w+b') as handle:
+        export_predictions(results, _NonClosing(handle), file_format, columns, metrics, policy)
+        handle.seek(0)
+        return handle.read()
+
+
+def iter_scored_chunks(data: pd.DataFrame, predictions: Dict[str, Any],
+                       chunksize: int = 50_000) -> Iterator[ScoredChunk]:
+    """Divide un resultado ya materializado en bloques (vistas) para exportarlo incrementalmente"""
+    for start in range(0, len(data), chunksize):
+        stop = start + chunksize
+        yield data.iloc[start:stop], {key: values[start:stop] for key, values in predictions.items()}
+
+
+def iter_source_scored_chunks(chunks: Iterable[pd.DataFrame], predictions: Dict[str, Any]) -> Iterator[ScoredChunk]:
+    """
+    Empareja, en orden, los bloques releídos de la fuente original con predicciones ya calculadas
+
+    Sirve para exportar los valores tal como venían en el archivo (ausentes, texto,
+    tipos originales) cuando lo que se guardó tras puntuar es una forma procesada.
+    """
+    start = 0
+    total = len(predictions['probabilities'])
+    for chunk in chunks:
+        stop = start + len(chunk)
+        if stop > total:
+            raise ValueError(f"La fuente tiene más filas que las {total} predicciones")
+        yield chunk, {key: values[start:stop] for key, values in predictions.items()}
+        start = stop
+    if start != total:
+        raise ValueError(f"La fuente tiene {start} filas; se esperaban {total}")
+
+
+def rebucket_chunks(results: Iterable[ScoredChunk], policy: Any) -> Iterator[ScoredChunk]:
+    """Recalcula los niveles de riesgo de cada bloque con otra política, sin volver a puntuar"""
+    for chunk, predictions in results:
+        risk_levels = policy.assign_frame(predictions['probabilities'], chunk)
+        yield chunk, {**predictions, 'risk_levels': risk_levels}
+
+
+class _NonClosing:
+    """Envoltorio que impide que el escritor cierre el archivo temporal"""
+
+    def __init__(self, handle: Any):
+        self._handle = handle
+
+    def write(self, data: Any) -> Any:
+        return self._handle.write(data)
+
+    def flush(self) -> None:
+        self._handle.flush()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._handle, name)
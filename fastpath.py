@@ -0,0 +1,264 @@
+"""
+Ruta rápida de inferencia para lotes pequeños.
+
+Compila el pipeline ajustado (ColumnTransformer con MinMaxScaler/passthrough +
+XGBClassifier binario) en arreglos NumPy planos: la transformación se reduce a
+una permutación de columnas con factores de escala y los árboles de XGBoost a
+arreglos de nodos recorridos de forma vectorizada. Reproduce las mismas
+operaciones que scikit-learn y XGBoost (escalado en float64, recorrido y suma
+de hojas en float32), por lo que las probabilidades coinciden bit a bit con
+`predict_proba` del pipeline original sobre datos float64 (lo comprueba
+`verify_parity`).
+"""
+import ctypes
+import ctypes.util
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class FastPathCompilationError(Exception):
+    """El pipeline contiene pasos que la ruta rápida no sabe reproducir"""
+
+
+def _parse_float(value: Any) -> float:
+    if isinstance(value, str):
+        value = value.strip('[]').split(',')[0]
+    return float(value)
+
+
+class CompiledPipeline:
+    """Representación plana del pipeline de preprocesamiento + XGBoost"""
+
+    def __init__(self, input_positions: np.ndarray, scale: np.ndarray, offset: np.ndarray,
+                 scaled_mask: np.ndarray, features: np.ndarray, thresholds: np.ndarray,
+                 left: np.ndarray, right: np.ndarray, default_left: np.ndarray,
+                 leaf_values: np.ndarray, roots: np.ndarray, max_depth: int, base_margin: np.float32):
+        self.input_positions = input_positions
+        self.scale = scale
+        self.offset = offset
+        self.scaled_mask = scaled_mask
+        self.features = features
+        self.thresholds = thresholds
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.leaf_values = leaf_values
+        self.roots = roots
+        self.max_depth = max_depth
+        self.base_margin = base_margin
+        internal = left != right
+        self.paired_children = bool(np.all(right[internal] == left[internal] + 1))
+
+    @property
+    def num_trees(self) -> int:
+        return len(self.roots)
+
+    @classmethod
+    def from_pipeline(cls, pipeline: Any, expected_columns: Sequence[str]) -> "CompiledPipeline":
+        """Compila un Pipeline(preprocessor=ColumnTransformer, classifier=XGBClassifier)"""
+        steps = getattr(pipeline, 'steps', None)
+        if not steps or len(steps) != 2:
+            raise FastPathCompilationError("Se esperaba un pipeline de dos pasos (preprocesador, clasificador)")
+        transformer, classifier = steps[0][1], steps[1][1]
+        input_positions, scale, offset, scaled_mask = cls._compile_transformer(transformer, expected_columns)
+        trees = cls._compile_booster(classifier, len(input_positions))
+        return cls(input_positions, scale, offset, scaled_mask, *trees)
+
+    @staticmethod
+    def _compile_transformer(transformer: Any, expected_columns: Sequence[str]) -> Tuple[np.ndarray, ...]:
+        from sklearn.preprocessing import MinMaxScaler
+
+        column_index = {col: i for i, col in enumerate(expected_columns)}
+        names_in = list(getattr(transformer, 'feature_names_in_', expected_columns))
+        if names_in != list(expected_columns):
+            raise FastPathCompilationError("El preprocesador se ajustó con otras columnas de entrada")
+
+        positions: List[int] = []
+        scales: List[float] = []
+        offsets: List[float] = []
+        scaled: List[bool] = []
+        for name, step, columns in transformer.transformers_:
+            if isinstance(columns, slice) or np.ndim(columns) == 0:
+                raise FastPathCompilationError(f"Selección de columnas no soportada en '{name}'")
+            indices = [column_index[c] if isinstance(c, str) else int(c) for c in columns]
+            if len(indices) == 0 or step == 'drop':
+                continue
+            if step == 'passthrough':
+                positions.extend(indices)
+                scales.extend([1.0] * len(indices))
+                offsets.extend([0.0] * len(indices))
+                scaled.extend([False] * len(indices))
+            elif isinstance(step, MinMaxScaler) and not step.clip:
+                positions.extend(indices)
+                scales.extend(step.scale_.tolist())
+                offsets.extend(step.min_.tolist())
+                scaled.extend([True] * len(indices))
+            else:
+                raise FastPathCompilationError(f"Transformador no soportado: {type(step).__name__}")
+
+        return (np.asarray(positions, dtype=np.intp), np.asarray(scales, dtype=np.float64),
+                np.asarray(offsets, dtype=np.float64), np.asarray(scaled, dtype=bool))
+
+    @staticmethod
+    def _compile_booster(classifier: Any, num_features: int) -> Tuple[Any, ...]:
+        if not hasattr(classifier, 'get_booster'):
+            raise FastPathCompilationError(f"Clasificador no soportado: {type(classifier).__name__}")
+        model = json.loads(bytes(classifier.get_booster().save_raw(raw_format='json')))
+        learner = model['learner']
+        if learner['objective']['name'] != 'binary:logistic':
+            raise FastPathCompilationError(f"Objetivo no soportado: {learner['objective']['name']}")
+        booster = learner['gradient_booster']
+        if booster['name'] != 'gbtree':
+            raise FastPathCompilationError(f"Booster no soportado: {booster['name']}")
+        trees = booster['model']['trees']
+
+        offsets = np.cumsum([0] + [len(t['left_children']) for t in trees])
+        features, thresholds, left, right, default_left, leaf_values = [], [], [], [], [], []
+        max_depth = 0
+        for tree, start in zip(trees, offsets[:-1]):
+            if any(tree['split_type']):
+                raise FastPathCompilationError("Divisiones categóricas no soportadas")
+            tree_left = np.asarray(tree['left_children'], dtype=np.int64)
+            tree_right = np.asarray(tree['right_children'], dtype=np.int64)
+            is_leaf = tree_left == -1
+            node_ids = np.arange(len(tree_left))
+            conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+
+            # Las hojas apuntan a sí mismas para que el recorrido pueda iterar una profundidad fija
+            left.append(np.where(is_leaf, node_ids, tree_left) + start)
+            right.append(np.where(is_leaf, node_ids, tree_right) + start)
+            features.append(np.where(is_leaf, 0, tree['split_indices']))
+            thresholds.append(np.where(is_leaf, np.float32(np.nan), conditions))
+            default_left.append(np.asarray(tree['default_left'], dtype=bool))
+            leaf_values.append(np.where(is_leaf, conditions, np.float32(0)))
+            max_depth = max(max_depth, _tree_depth(tree_left, tree_right))
+
+        if int(np.concatenate(features).max(initial=0)) >= num_features:
+            raise FastPathCompilationError("El modelo usa más características que el preprocesador")
+
+        # XGBoost guarda base_score como probabilidad; el margen inicial es su logit en float32
+        base_score = np.float32(_parse_float(learner['learner_model_param']['base_score']))
+        base_margin = np.float32(-np.log(np.float32(1.0) / base_score - np.float32(1.0)))
+
+        return (np.concatenate(features).astype(np.intp), np.concatenate(thresholds),
+                np.concatenate(left).astype(np.intp), np.concatenate(right).astype(np.intp),
+                np.concatenate(default_left), np.concatenate(leaf_values).astype(np.float32),
+                offsets[:-1].astype(np.intp), max_depth, base_margin)
+
+    def transform(self, matrix: np.ndarray) -> np.ndarray:
+        """Aplica el preprocesador compilado a una matriz float64 en el orden de las columnas esperadas"""
+        out = np.asarray(matrix, dtype=np.float64)[:, self.input_positions]
+        scaled = out[:, self.scaled_mask]
+        # Mismas operaciones que MinMaxScaler.transform sobre float64: producto y luego suma
+        scaled *= self.scale[self.scaled_mask]
+        scaled += self.offset[self.scaled_mask]
+        out[:, self.scaled_mask] = scaled
+        # XGBoost redondea las características a float32 al construir su matriz
+        return out.astype(np.float32)
+
+    def predict_margin(self, transformed: np.ndarray) -> np.ndarray:
+        """Suma de las hojas de todos los árboles más el margen inicial, en float32"""
+        n_rows = transformed.shape[0]
+        rows = np.arange(n_rows)[:, None]
+        nodes = np.broadcast_to(self.roots, (n_rows, self.num_trees))
+        if self.paired_children and not np.isnan(transformed).any():
+            # Sin valores ausentes y con hijos consecutivos: hijo = izquierdo + (valor >= umbral).
+            # Las hojas tienen umbral NaN, así que la comparación es falsa y se quedan en sí mismas.
+            for _ in range(self.max_depth):
+                nodes = self.left[nodes] + (transformed[rows, self.features[nodes]] >= self.thresholds[nodes])
+        else:
+            for _ in range(self.max_depth):
+                values = transformed[rows, self.features[nodes]]
+                go_left = np.where(np.isnan(values), self.default_left[nodes], values < self.thresholds[nodes])
+                nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        # Acumulación secuencial árbol por árbol, como el predictor de XGBoost
+        leaves = np.empty((n_rows, self.num_trees + 1), dtype=np.float32)
+        leaves[:, 0] = self.base_margin
+        leaves[:, 1:] = self.leaf_values[nodes]
+        return np.cumsum(leaves, axis=1, dtype=np.float32)[:, -1]
+
+    def predict_proba(self, matrix: np.ndarray) -> np.ndarray:
+        """Probabilidad de la clase positiva para una matriz alineada con las columnas esperadas"""
+        margin = self.predict_margin(self.transform(np.asarray(matrix, dtype=np.float64).reshape(-1, len(self.input_positions))))
+        return _sigmoid(margin)
+
+
+def _tree_depth(left: np.ndarray, right: np.ndarray) -> int:
+    depth, frontier = 0, [0]
+    while frontier:
+        children = [c for n in frontier for c in (left[n], right[n]) if c != -1]
+        if children:
+            depth += 1
+        frontier = children
+    return depth
+
+
+def _load_expf() -> Optional[Callable[[np.ndarray], np.ndarray]]:
+    """expf de la biblioteca matemática de C, la misma que usa XGBoost para la sigmoide"""
+    try:
+        libm = ctypes.CDLL(ctypes.util.find_library('m') or 'libm.so.6')
+        expf = libm.expf
+    except (OSError, AttributeError):
+        return None
+    expf.restype = ctypes.c_float
+    expf.argtypes = [ctypes.c_float]
+    vectorized = np.frompyfunc(expf, 1, 1)
+    return lambda x: vectorized(x).astype(np.float32)
+
+
+_EXPF = _load_expf()
+
+
+def _sigmoid(margin: np.ndarray) -> np.ndarray:
+    """Sigmoide de XGBoost (common::Sigmoid) en float32"""
+    x = np.minimum(-margin, np.float32(88.7))
+    if _EXPF is not None:
+        exp_x = _EXPF(x)
+    else:
+        # Sin libm accesible, exp en float64 redondeado a float32 (puede diferir en 1 ulp)
+        exp_x = np.exp(x.astype(np.float64)).astype(np.float32)
+    return (np.float32(1.0) / (exp_x + np.float32(1.0))).astype(np.float32)
+
+
+def verify_parity(pipeline: Any, compiled: CompiledPipeline, matrix: np.ndarray,
+                  expected_columns: Sequence[str]) -> Dict[str, Any]:
+    """
+    Compara la ruta rápida con `predict_proba` del pipeline original sobre un DataFrame float64
+
+    Args:
+        pipeline: Pipeline ajustado original
+        compiled: Pipeline compilado
+        matrix: Matriz alineada con las columnas esperadas (se convierte a float64)
+        expected_columns: Columnas esperadas, en orden
+
+    Returns:
+        Diccionario con el número de filas, discrepancias y diferencia máxima
+    """
+    import pandas as pd
+
+    matrix = np.asarray(matrix, dtype=np.float64)
+    reference = pipeline.predict_proba(pd.DataFrame(matrix, columns=list(expected_columns)))[:, 1]
+    fast = compiled.predict_proba(matrix)
+    mismatches = int(np.count_nonzero(reference != fast))
+    return {
+        'rows': int(len(matrix)),
+        'mismatches': mismatches,
+        'max_abs_diff': float(np.max(np.abs(reference.astype(np.float64) - fast))) if len(matrix) else 0.0,
+        'bitwise_equal': mismatches == 0,
+    }
+
+
+def parity_sample(expected_columns: Sequence[str], n_rows: int = 2_000, seed: int = 0) -> np.ndarray:
+    """Matriz sintética para comprobar la paridad: valores binarios y numéricos en rangos variados"""
+    rng = np.random.default_rng(seed)
+    matrix = rng.integers(0, 2, size=(n_rows, len(expected_columns))).astype(np.float64)
+    for j, col in enumerate(expected_columns):
+        if '_' not in col:
+            # Decimales sin representación exacta en float32, como los de un CSV real
+            matrix[:, j] = np.round(rng.uniform(-5.0, 200.0, size=n_rows), 2)
+            # Incluir valores enteros habituales para ejercitar umbrales exactos
+            matrix[::3, j] = np.round(matrix[::3, j] / 10.0)
+    return matrix
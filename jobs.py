@@ -0,0 +1,575 @@
+"""
+Cola local de trabajos de puntuación en segundo plano.
+
+Los trabajos se registran en una cola SQLite y los ejecutan procesos
+trabajadores independientes de la sesión de Streamlit. Cada bloque puntuado se
+guarda como punto de control, de modo que un trabajo interrumpido (navegador
+cerrado, proceso reiniciado) continúa desde el último bloque completado.
+
+    python jobs.py submit cohorte.csv --chunksize 50000
+    python jobs.py worker --workers 2
+    python jobs.py status <job_id>
+    python jobs.py list
+    python jobs.py cancel <job_id>
+    python jobs.py result <job_id> --output predicciones.parquet --columns student_id
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from exporters import export_predictions
+from predictor import StudentDropoutPredictor, iter_data_chunks
+from registry import ModelHandle
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS_DIR = os.environ.get("DESERCION_JOBS_DIR", "jobs")
+JOBS_DB_FILENAME = "jobs.sqlite3"
+
+DEFAULT_JOB_CHUNKSIZE = 50_000
+
+# Segundos sin latido tras los que un trabajo en ejecución se considera abandonado
+HEARTBEAT_TIMEOUT = 120.0
+
+# Espera entre consultas de un trabajador sin trabajos pendientes (segundos)
+POLL_INTERVAL = 1.0
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_COMPLETED = 'completed'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+FINAL_STATUSES = (STATUS_COMPLETED, STATUS_FAILED, STATUS_CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    source TEXT NOT NULL,
+    file_format TEXT NOT NULL,
+    chunksize INTEGER NOT NULL,
+    total_rows INTEGER,
+    rows_done INTEGER NOT NULL DEFAULT 0,
+    chunks_done INTEGER NOT NULL DEFAULT 0,
+    model_version TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker_pid INTEGER,
+    heartbeat REAL,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    job_id TEXT NOT NULL,
+    start_row INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (job_id, start_row)
+);
+"""
+
+JobSource = Union[str, os.PathLike, bytes, pd.DataFrame]
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    """Indica si un proceso local sigue vivo (en Windows solo se confía en el latido)"""
+    if not pid or os.name == 'nt':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def count_rows(path: str, file_format: str) -> Optional[int]:
+    """Número de filas de datos de un archivo, o None si no puede determinarse sin leerlo entero"""
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    lines, last = 0, b'\n'
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    # La última línea puede no terminar en salto de línea; la primera es el encabezado
+    return max(lines + (last != b'\n') - 1, 0)
+
+
+class Job:
+    """Estado de un trabajo tal como está registrado en la cola"""
+
+    def __init__(self, row: sqlite3.Row):
+        self.job_id = row['job_id']
+        self.status = row['status']
+        self.source = row['source']
+        self.file_format = row['file_format']
+        self.chunksize = row['chunksize']
+        self.total_rows = row['total_rows']
+        self.rows_done = row['rows_done']
+        self.chunks_done = row['chunks_done']
+        self.model_version = row['model_version']
+        self.cancel_requested = bool(row['cancel_requested'])
+        self.worker_pid = row['worker_pid']
+        self.heartbeat = row['heartbeat']
+        self.error = row['error']
+        self.created_at = row['created_at']
+        self.started_at = row['started_at']
+        self.finished_at = row['finished_at']
+
+    @property
+    def progress(self) -> float:
+        """Fracción de filas puntuadas (1.0 al completar)"""
+        if self.status == STATUS_COMPLETED:
+            return 1.0
+        if not self.total_rows:
+            return 0.0
+        return min(self.rows_done / self.total_rows, 1.0)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in FINAL_STATUSES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'progress': round(self.progress, 4),
+            'rows_done': self.rows_done,
+            'total_rows': self.total_rows,
+            'chunks_done': self.chunks_done,
+            'model_version': self.model_version,
+            'cancel_requested': self.cancel_requested,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+    def __repr__(self) -> str:
+        return f"Job({self.job_id!r}, {self.status}, {self.rows_done}/{self.total_rows})"
+
+
+class JobQueue:
+    """
+    Cola de trabajos persistente en SQLite.
+
+    Guarda los trabajos y sus puntos de control en `jobs_dir`: la base de datos
+    de la cola y una carpeta por trabajo con la entrada (si se envió en memoria)
+    y las predicciones de cada bloque. Cada operación abre su propia conexión, de
+    modo que la misma cola puede usarse desde varios hilos y procesos.
+    """
+
+    def __init__(self, jobs_dir: str = DEFAULT_JOBS_DIR):
+        self.jobs_dir = jobs_dir
+        self.db_path = os.path.join(jobs_dir, JOBS_DB_FILENAME)
+        os.makedirs(jobs_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Transacción con bloqueo de escritura desde el inicio (evita que dos trabajadores tomen el mismo trabajo)"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def job_dir(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, job_id)
+
+    def submit(self, source: JobSource, file_format: Optional[str] = None,
+               chunksize: int = DEFAULT_JOB_CHUNKSIZE) -> str:
+        """
+        Registra un trabajo de puntuación
+
+        Args:
+            source: Ruta de un CSV/Parquet, contenido de un CSV en bytes o DataFrame
+            file_format: 'csv' o 'parquet'; por defecto se deduce de la extensión
+            chunksize: Filas por bloque (y por punto de control)
+
+        Returns:
+            Identificador del trabajo
+        """
+        if chunksize <= 0:
+            raise ValueError("chunksize debe ser mayor que 0")
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = self.job_dir(job_id)
+        os.makedirs(job_dir, exist_ok=True)
+
+        # Las entradas en memoria se copian a la carpeta del trabajo para poder reanudarlo
+        if isinstance(source, pd.DataFrame):
+            path, file_format = os.path.join(job_dir, "input.csv"), 'csv'
+            source.to_csv(path, index=False)
+        elif isinstance(source, (bytes, bytearray)):
+            file_format = file_format or 'csv'
+            path = os.path.join(job_dir, f"input.{file_format}")
+            with open(path, 'wb') as f:
+                f.write(source)
+        else:
+            path = os.path.abspath(os.fspath(source))
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No se encontró el archivo de entrada: {path}")
+            if file_format is None:
+                suffix = os.path.splitext(path)[1].lower()
+                file_format = 'parquet' if suffix in ('.parquet', '.pq') else 'csv'
+
+        total_rows = count_rows(path, file_format)
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, status, source, file_format, chunksize, total_rows, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, STATUS_QUEUED, path, file_format, chunksize, total_rows, _now()))
+        return job_id
+
+    def poll(self, job_id: str) -> Job:
+        """Estado actual de un trabajo"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"Trabajo desconocido: {job_id}")
+        return Job(row)
+
+    def list_jobs(self, limit: int = 20) -> List[Job]:
+        """Trabajos más recientes primero"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC, rowid DESC LIMIT ?",
+                                (limit,)).fetchall()
+        return [Job(row) for row in rows]
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancela un trabajo: los pendientes se cancelan de inmediato y los que están
+        en ejecución se detienen al terminar el bloque en curso
+
+        Returns:
+            False si el trabajo ya había terminado
+        """
+        with self._transaction() as conn:
+            job = conn.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if job is None:
+                raise KeyError(f"Trabajo desconocido: {job_id}")
+            if job['status'] == STATUS_QUEUED:
+                conn.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE job_id = ?",
+                             (STATUS_CANCELLED, _now(), job_id))
+                return True
+            if job['status'] == STATUS_RUNNING:
+                conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE job_id = ?", (job_id,))
+                return True
+            return False
+
+    def claim(self, worker_pid: int) -> Optional[Job]:
+        """
+        Toma el trabajo pendiente más antiguo, o uno en ejecución abandonado por
+        un trabajador que murió (proceso inexistente o sin latido reciente)
+        """
+        stale_before = time.time() - HEARTBEAT_TIMEOUT
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at, rowid",
+                                (STATUS_QUEUED, STATUS_RUNNING)).fetchall()
+            for row in rows:
+                abandoned = row['status'] == STATUS_RUNNING and (
+                    (row['heartbeat'] or 0) < stale_before or not _pid_alive(row['worker_pid']))
+                if row['status'] == STATUS_QUEUED or abandoned:
+                    if abandoned and row['cancel_requested']:
+                        conn.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE job_id = ?",
+                                     (STATUS_CANCELLED, _now(), row['job_id']))
+                        continue
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, worker_pid = ?, heartbeat = ?, "
+                        "started_at = COALESCE(started_at, ?) WHERE job_id = ?",
+                        (STATUS_RUNNING, worker_pid, time.time(), _now(), row['job_id']))
+                    if abandoned:
+                        logger.info("Reanudando el trabajo %s desde la fila %d", row['job_id'], row['rows_done'])
+                    return Job(conn.execute("SELECT * FROM jobs WHERE job_id = ?", (row['job_id'],)).fetchone())
+        return None
+
+    def checkpoint(self, job_id: str, start_row: int, predictions: Dict[str, np.ndarray]) -> bool:
+        """
+        Guarda las predicciones de un bloque y avanza el progreso del trabajo
+
+        El archivo del bloque se escribe antes de registrar el avance: si el
+        proceso muere entre ambos pasos, el bloque simplemente se repite.
+
+        Returns:
+            True si se pidió cancelar el trabajo
+        """
+        rows = len(predictions['probabilities'])
+        path = os.path.join(self.job_dir(job_id), f"chunk-{start_row:012d}.npz")
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, predictions=np.asarray(predictions['predictions']),
+                 probabilities=np.asarray(predictions['probabilities']),
+                 risk_levels=np.asarray(predictions['risk_levels']).astype(str))
+        os.replace(tmp_path, path)
+
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?)", (job_id, start_row, rows, path))
+            conn.execute("UPDATE jobs SET rows_done = ?, chunks_done = chunks_done + 1, heartbeat = ? "
+                         "WHERE job_id = ?", (start_row + rows, time.time(), job_id))
+            cancel = conn.execute("SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(cancel['cancel_requested'])
+
+    def set_model_version(self, job_id: str, model_version: Optional[str]) -> None:
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET model_version = ?, heartbeat = ? WHERE job_id = ?",
+                         (model_version, time.time(), job_id))
+
+    def reset_checkpoints(self, job_id: str) -> None:
+        """Descarta los bloques ya puntuados de un trabajo (p. ej. si cambió el modelo)"""
+        with self._transaction() as conn:
+            paths = [row['path'] for row in conn.execute("SELECT path FROM checkpoints WHERE job_id = ?", (job_id,))]
+            conn.execute("DELETE FROM checkpoints WHERE job_id = ?", (job_id,))
+            conn.execute("UPDATE jobs SET rows_done = 0, chunks_done = 0 WHERE job_id = ?", (job_id,))
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def finish(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ?, heartbeat = ? WHERE job_id = ?",
+                         (status, error, _now(), time.time(), job_id))
+
+    def result(self, job_id: str) -> Dict[str, np.ndarray]:
+        """
+        Predicciones de un trabajo completado, en el orden de la entrada
+
+        Returns:
+            Diccionario con predicciones, probabilidades y niveles de riesgo
+        """
+        job = self.poll(job_id)
+        if job.status != STATUS_COMPLETED:
+            raise ValueError(f"El trabajo {job_id} no está completado (estado: {job.status})")
+        with self._connect() as conn:
+            paths = [row['path'] for row in conn.execute(
+                "SELECT path FROM checkpoints WHERE job_id = ? ORDER BY start_row", (job_id,))]
+        parts = []
+        for path in paths:
+            with np.load(path) as part:
+                parts.append({key: part[key] for key in part.files})
+        if not parts:
+            return {'predictions': np.empty(0, dtype=np.int64), 'probabilities': np.empty(0, dtype=np.float32),
+                    'risk_levels': np.empty(0, dtype=object)}
+        results = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+        results['risk_levels'] = results['risk_levels'].astype(object)
+        return results
+
+    def iter_results(self, job_id: str) -> Iterator[Tuple[pd.DataFrame, Dict[str, np.ndarray]]]:
+        """Bloques de la entrada con sus predicciones, listos para exporters.export_predictions"""
+        job = self.poll(job_id)
+        predictions = self.result(job_id)
+        offset = 0
+        for chunk in iter_data_chunks(job.source, job.chunksize, job.file_format):
+            stop = offset + len(chunk)
+            yield chunk, {key: values[offset:stop] for key, values in predictions.items()}
+            offset = stop
+
+    def export_result(self, job_id: str, sink: Any, file_format: Optional[str] = None,
+                      columns: Optional[List[str]] = None) -> int:
+        """Escribe la entrada y las predicciones de un trabajo completado (CSV, Parquet o Arrow)"""
+        return export_predictions(self.iter_results(job_id), sink, file_format, columns)
+
+    def delete(self, job_id: str) -> None:
+        """Elimina un trabajo terminado con sus puntos de control y su copia de la entrada"""
+        job = self.poll(job_id)
+        if not job.is_finished:
+            raise ValueError(f"El trabajo {job_id} sigue activo; cancélelo antes de eliminarlo")
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM checkpoints WHERE job_id = ?", (job_id,))
+            conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+
+def run_job(queue: JobQueue, predictor: StudentDropoutPredictor, job: Job) -> str:
+    """
+    Ejecuta (o reanuda) un trabajo ya tomado con JobQueue.claim
+
+    Returns:
+        Estado final del trabajo
+    """
+    start_row = job.rows_done
+    # Un trabajo reanudado con otro modelo se repite entero para no mezclar versiones
+    if start_row and job.model_version != predictor.model_version:
+        logger.warning("El modelo cambió desde que empezó el trabajo %s; se reinicia", job.job_id)
+        queue.reset_checkpoints(job.job_id)
+        start_row = 0
+    queue.set_model_version(job.job_id, predictor.model_version)
+
+    try:
+        for chunk in iter_data_chunks(job.source, job.chunksize, job.file_format, skip_rows=start_row):
+            predictions = predictor.predict_batch(chunk)
+            if queue.checkpoint(job.job_id, start_row, predictions):
+                queue.finish(job.job_id, STATUS_CANCELLED)
+                return STATUS_CANCELLED
+            start_row += len(chunk)
+    except Exception as e:
+        logger.exception("El trabajo %s falló", job.job_id)
+        queue.finish(job.job_id, STATUS_FAILED, error=str(e))
+        return STATUS_FAILED
+
+    queue.finish(job.job_id, STATUS_COMPLETED)
+    return STATUS_COMPLETED
+
+
+def run_worker(jobs_dir: str = DEFAULT_JOBS_DIR, once: bool = False, poll_interval: float = POLL_INTERVAL,
+               model_path: Optional[str] = None, columns_path: Optional[str] = None) -> int:
+    """
+    Bucle de un proceso trabajador: carga el modelo una vez y ejecuta trabajos de la cola
+
+    Args:
+        jobs_dir: Carpeta de la cola
+        once: Terminar cuando no queden trabajos pendientes en lugar de esperar nuevos
+        poll_interval: Espera entre consultas sin trabajos (segundos)
+
+    Returns:
+        Número de trabajos ejecutados
+    """
+    queue = JobQueue(jobs_dir)
+    # Sin rutas explícitas se sigue la versión activa del registro de modelos
+    handle = ModelHandle.load(model_path=model_path, columns_path=columns_path)
+
+    executed = 0
+    try:
+        while True:
+            job = queue.claim(os.getpid())
+            if job is None:
+                if once:
+                    break
+                time.sleep(poll_interval)
+                handle.refresh()
+                continue
+            # Un cambio de versión se aplica entre trabajos, nunca a mitad de uno
+            handle.refresh()
+            predictor = handle.current
+            status = run_job(queue, predictor, job)
+            logger.info("Trabajo %s: %s", job.job_id, status)
+            executed += 1
+    except KeyboardInterrupt:
+        pass
+    return executed
+
+
+def start_workers(n_workers: int = 1, jobs_dir: str = DEFAULT_JOBS_DIR,
+                  model_path: Optional[str] = None, columns_path: Optional[str] = None) -> List[Any]:
+    """
+    Lanza procesos trabajadores en segundo plano
+
+    Se usa 'spawn' para no heredar el estado del proceso padre (p. ej. los hilos
+    de Streamlit). Los procesos son daemon: terminan con el proceso que los lanzó
+    y sus trabajos en curso se reanudan cuando otro trabajador los toma.
+    """
+    context = multiprocessing.get_context('spawn')
+    workers = []
+    for _ in range(n_workers):
+        process = context.Process(target=run_worker, args=(jobs_dir, False, POLL_INTERVAL, model_path, columns_path),
+                                  daemon=True)
+        process.start()
+        workers.append(process)
+    return workers
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Trabajos de puntuación en segundo plano")
+    parser.add_argument('--jobs-dir', default=DEFAULT_JOBS_DIR, help="Carpeta de la cola de trabajos")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    submit = commands.add_parser('submit', help="Registrar un archivo para puntuar")
+    submit.add_argument('source', help="Archivo CSV o Parquet")
+    submit.add_argument('--chunksize', type=int, default=DEFAULT_JOB_CHUNKSIZE)
+    submit.add_argument('--format', dest='file_format', choices=('csv', 'parquet'), default=None)
+
+    status = commands.add_parser('status', help="Estado de un trabajo")
+    status.add_argument('job_id')
+
+    listing = commands.add_parser('list', help="Trabajos recientes")
+    listing.add_argument('--limit', type=int, default=20)
+
+    cancel = commands.add_parser('cancel', help="Cancelar un trabajo")
+    cancel.add_argument('job_id')
+
+    result = commands.add_parser('result', help="Exportar las predicciones de un trabajo completado")
+    result.add_argument('job_id')
+    result.add_argument('--output', required=True, help="Archivo de salida (.csv, .parquet o .arrow)")
+    result.add_argument('--columns', nargs='+', default=None, help="Columnas de entrada a conservar")
+
+    worker = commands.add_parser('worker', help="Ejecutar trabajos de la cola")
+    worker.add_argument('--workers', type=int, default=1, help="Número de procesos trabajadores")
+    worker.add_argument('--once', action='store_true', help="Terminar al vaciar la cola")
+    worker.add_argument('--model-path', default=None, help="Ruta del pipeline (.pkl)")
+    worker.add_argument('--columns-path', default=None, help="Ruta de las columnas esperadas (.pkl)")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.command == 'worker':
+        if args.workers <= 1:
+            run_worker(args.jobs_dir, once=args.once, model_path=args.model_path, columns_path=args.columns_path)
+            return 0
+        if args.once:
+            parser.error("--once solo admite un trabajador")
+        processes = start_workers(args.workers, args.jobs_dir, args.model_path, args.columns_path)
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    queue = JobQueue(args.jobs_dir)
+    try:
+        if args.command == 'submit':
+            print(queue.submit(args.source, args.file_format, args.chunksize))
+        elif args.command == 'status':
+            print(json.dumps(queue.poll(args.job_id).to_dict(), ensure_ascii=False, indent=2))
+        elif args.command == 'list':
+            for job in queue.list_jobs(args.limit):
+                total = job.total_rows if job.total_rows is not None else '?'
+                print(f"{job.job_id}  {job.status:<10} {job.progress:>7.1%}  {job.rows_done}/{total}  {job.created_at}")
+        elif args.command == 'cancel':
+            if not queue.cancel(args.job_id):
+                print(f"El trabajo {args.job_id} ya había terminado", file=sys.stderr)
+                return 1
+        elif args.command == 'result':
+            rows = queue.export_result(args.job_id, args.output, columns=args.columns)
+            print(f"{rows} filas escritas en {args.output}")
+    except (KeyError, ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
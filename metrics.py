@@ -0,0 +1,189 @@
+import bisect
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Límites (segundos) de los histogramas de latencia
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_PREFIX = "desercion"
+
+
+class Histogram:
+    """Histograma acumulativo de latencias con límites fijos, al estilo Prometheus"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Pares (límite, observaciones <= límite), terminando en +Inf"""
+        result, running = [], 0
+        for bound, count in zip(list(self.buckets) + [float('inf')], self.counts):
+            running += count
+            result.append(('+Inf' if bound == float('inf') else repr(bound), running))
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'sum_seconds': self.total,
+            'mean_seconds': self.total / self.count if self.count else 0.0,
+            'buckets': dict(self.cumulative()),
+        }
+
+
+class _NullTimer:
+    """Temporizador vacío usado cuando la instrumentación está desactivada"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        return None
+
+    def add_rows(self, rows: int) -> None:
+        return None
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('_metrics', '_kind', '_name', '_rows', '_start')
+
+    def __init__(self, metrics: "PredictorMetrics", kind: str, name: str, rows: int):
+        self._metrics = metrics
+        self._kind = kind
+        self._name = name
+        self._rows = rows
+        self._start = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._metrics.observe(self._kind, self._name, time.perf_counter() - self._start, self._rows)
+
+    def add_rows(self, rows: int) -> None:
+        """Permite registrar el número de filas cuando solo se conoce dentro del bloque"""
+        self._rows += rows
+
+
+class PredictorMetrics:
+    """
+    Instrumentación de las rutas críticas del predictor.
+
+    Registra, por etapa (validación, preprocesamiento, modelo, niveles de riesgo,
+    exportación) y por punto de entrada (predict_single, predict_batch, ...), un
+    histograma de latencias y el total de filas procesadas. Desactivada, cada
+    medición se reduce a devolver un temporizador vacío.
+    """
+
+    def __init__(self, enabled: bool = False, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._rows: Dict[Tuple[str, str], int] = {}
+
+    def stage(self, name: str, rows: int = 0) -> Any:
+        """Mide una etapa interna: `with metrics.stage('preprocess', len(data)): ...`"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, 'stage', name, rows)
+
+    def call(self, name: str, rows: int = 0) -> Any:
+        """Mide una llamada completa a un punto de entrada público"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, 'call', name, rows)
+
+    def observe(self, kind: str, name: str, seconds: float, rows: int = 0) -> None:
+        key = (kind, name)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            self._rows[key] = self._rows.get(key, 0) + rows
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._rows.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Copia de las métricas en forma de diccionario (para get_model_info o JSON)"""
+        with self._lock:
+            result: Dict[str, Any] = {'enabled': self.enabled, 'stages': {}, 'calls': {}}
+            for (kind, name), histogram in sorted(self._histograms.items()):
+                entry = histogram.snapshot()
+                entry['rows'] = self._rows.get((kind, name), 0)
+                result['stages' if kind == 'stage' else 'calls'][name] = entry
+            return result
+
+    def to_prometheus(self, extra: Optional[Dict[str, float]] = None, prefix: str = METRIC_PREFIX) -> str:
+        """
+        Instantánea en el formato de texto de Prometheus
+
+        Args:
+            extra: Valores adicionales (p. ej. contadores de caché) exportados como gauges
+            prefix: Prefijo de los nombres de métrica
+
+        Returns:
+            Texto listo para servir en un endpoint /metrics
+        """
+        lines: List[str] = []
+        with self._lock:
+            items = sorted(self._histograms.items())
+            rows = dict(self._rows)
+
+        for kind, label, description in (('stage', 'stage', 'etapa'), ('call', 'call', 'llamada')):
+            metric = f"{prefix}_{kind}_duration_seconds"
+            selected = [(name, hist) for (k, name), hist in items if k == kind]
+            lines.append(f"# HELP {metric} Latencia por {description} en segundos")
+            lines.append(f"# TYPE {metric} histogram")
+            for name, histogram in selected:
+                labels = f'{label}="{_escape(name)}"'
+                for bound, count in histogram.cumulative():
+                    lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f"{metric}_sum{{{labels}}} {histogram.total!r}")
+                lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+
+            rows_metric = f"{prefix}_{kind}_rows_total"
+            lines.append(f"# HELP {rows_metric} Filas procesadas por {description}")
+            lines.append(f"# TYPE {rows_metric} counter")
+            for name, _ in selected:
+                lines.append(f'{rows_metric}{{{label}="{_escape(name)}"}} {rows.get((kind, name), 0)}')
+
+        for name, value in _flatten(extra or {}):
+            metric = f"{prefix}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {float(value)!r}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _flatten(values: Dict[str, Any], parent: str = "") -> Iterable[Tuple[str, float]]:
+    for key, value in values.items():
+        name = f"{parent}_{key}" if parent else key
+        if isinstance(value, dict):
+            yield from _flatten(value, name)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, value
@@ -0,0 +1,239 @@
+import io
+import mmap
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from risk_policy import course_labels
+
+# Por debajo de este número de filas por fragmento no compensa repartir el trabajo
+MIN_SHARD_ROWS = 2_000
+
+# Bytes leídos del inicio de un CSV para estimar cuántas filas tiene
+CSV_SAMPLE_BYTES = 1 << 16
+
+# Predictor del proceso trabajador. Con 'fork' se hereda del proceso padre
+# (copy-on-write); con 'spawn' se carga una vez en el inicializador.
+_WORKER_PREDICTOR = None
+
+# Fragmento de trabajo: ('frame', filas crudas) o ('csv', ruta, encabezado, byte inicial, byte final)
+Shard = Union[Tuple[str, pd.DataFrame], Tuple[str, str, bytes, int, int]]
+
+
+def set_model_threads(model: Any, n_threads: int) -> None:
+    """Fija el número de hilos de los estimadores del pipeline que lo admiten (p. ej. XGBoost)"""
+    estimators = [model] + [step for _, step in getattr(model, 'steps', [])]
+    for estimator in estimators:
+        if hasattr(estimator, 'get_params') and 'n_jobs' in estimator.get_params(deep=False):
+            estimator.set_params(n_jobs=n_threads)
+
+
+def _init_worker(threads_per_worker: int, artifact_paths: Tuple[str, str, Optional[str]]) -> None:
+    """Inicializa un proceso trabajador: carga el modelo si no fue heredado y limita sus hilos"""
+    global _WORKER_PREDICTOR
+    if _WORKER_PREDICTOR is None:
+        from predictor import StudentDropoutPredictor
+        model_path, columns_path, cache_dir = artifact_paths
+        predictor = StudentDropoutPredictor(model_path=model_path, columns_path=columns_path,
+                                            cache_dir=cache_dir)
+        predictor.load_model(warmup=False, fast_path=False)
+        _WORKER_PREDICTOR = predictor
+
+    # Las variables OMP_NUM_THREADS/BLAS ya no surten efecto una vez cargadas las
+    # bibliotecas: los hilos se fijan en el propio estimador
+    set_model_threads(_WORKER_PREDICTOR.model, threads_per_worker)
+
+
+def _worker_pid(_: int) -> int:
+    return os.getpid()
+
+
+def _read_shard(shard: Shard) -> pd.DataFrame:
+    """Filas crudas de un fragmento: el DataFrame recibido o el tramo de bytes del CSV"""
+    if shard[0] == 'frame':
+        return shard[1]
+    _, path, header, start, stop = shard
+    with open(path, 'rb') as f:
+        f.seek(start)
+        body = f.read(stop - start)
+    return pd.read_csv(io.BytesIO(header + body))
+
+
+def _score_shard(task: Tuple[Shard, Any, int, int]) -> Dict[str, Any]:
+    """
+    Lee, preprocesa, puntúa y clasifica un fragmento en el trabajador
+
+    Solo el modelo y la política se usan aquí: métricas, deriva y sombra se
+    actualizan en el proceso padre, donde las copias de los trabajadores no las
+    perderían. Para ellas se devuelven las filas muestreadas con paso
+    `drift_step` (0 = ninguna) y las primeras `head_rows` filas preprocesadas.
+    """
+    shard, risk_policy, drift_step, head_rows = task
+    predictor = _WORKER_PREDICTOR
+    plan = predictor.preprocessing_plan
+    matrix, missing = plan.transform(_read_shard(shard), return_missing=True)
+    probabilities = predictor.model.predict_proba(plan.to_frame(matrix))[:, 1]
+    courses = course_labels(matrix, plan.columns) if risk_policy.course_thresholds else None
+    return {
+        'rows': len(matrix),
+        'probabilities': probabilities,
+        'risk_levels': risk_policy.assign(probabilities, courses),
+        'drift_matrix': matrix[::drift_step] if drift_step else None,
+        'drift_missing': missing[::drift_step] if drift_step else None,
+        'head': matrix[:head_rows],
+    }
+
+
+def csv_byte_ranges(path: str, n_shards: int) -> Tuple[bytes, List[Tuple[int, int]]]:
+    """
+    Encabezado de un CSV y tramos de bytes de similar tamaño que empiezan y terminan en un salto de línea
+
+    Solo sirve si ningún campo contiene saltos de línea entre comillas; el
+    llamador lo comprueba con csv_is_line_delimited.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.readline()
+        data_start = f.tell()
+        cuts = [data_start]
+        for target in np.linspace(data_start, size, n_shards + 1)[1:-1]:
+            f.seek(max(int(target), cuts[-1]))
+            f.readline()  # avanzar hasta el inicio de la siguiente fila
+            cuts.append(min(f.tell(), size))
+        cuts.append(size)
+    ranges = [(start, stop) for start, stop in zip(cuts[:-1], cuts[1:]) if stop > start]
+    return header, ranges
+
+
+def csv_is_line_delimited(path: str) -> bool:
+    """True si el CSV no tiene comillas, de modo que cada línea es exactamente una fila"""
+    if os.path.getsize(path) == 0:
+        return True
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return data.find(b'"') == -1
+
+
+def estimate_csv_rows(path: str) -> int:
+    """Filas aproximadas de un CSV a partir del largo medio de las líneas iniciales"""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        sample = f.read(CSV_SAMPLE_BYTES)
+    lines = sample.count(b'\n')
+    if lines <= 1:
+        return lines
+    return int(size / (len(sample) / lines)) - 1
+
+
+class ParallelScorer:
+    """
+    Pool de procesos para puntuar lotes grandes en varios núcleos.
+
+    Cada trabajador mantiene una única copia de solo lectura del modelo: heredada
+    del proceso padre tras 'fork' o cargada una vez por trabajador con 'spawn'.
+    Los trabajadores reciben filas crudas (un tramo del DataFrame o un tramo de
+    bytes del CSV, que leen ellos mismos) y hacen la lectura, el preprocesamiento,
+    la puntuación y la asignación de niveles; el resto del estado del predictor
+    (métricas, deriva, sombra) se actualiza en el proceso padre. Los hilos de
+    XGBoost por trabajador se limitan con `threads_per_worker` para no
+    sobrecargar la CPU (trabajadores x hilos <= núcleos).
+    """
+
+    def __init__(self, predictor: Any, n_workers: Optional[int] = None, threads_per_worker: int = 1,
+                 start_method: Optional[str] = None):
+        if not predictor.is_loaded:
+            raise ValueError("El modelo no ha sido cargado")
+        if threads_per_worker < 1:
+            raise ValueError("threads_per_worker debe ser al menos 1")
+
+        cpu_count = os.cpu_count() or 1
+        self.predictor = predictor
+        # Configuración pedida, para decidir si un pool existente sirve para otra llamada
+        self.options = (n_workers, threads_per_worker)
+        self.threads_per_worker = threads_per_worker
+        self.n_workers = n_workers or max(1, cpu_count // threads_per_worker)
+        if start_method is None:
+            start_method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "ParallelScorer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def start(self) -> None:
+        """Crea el pool de procesos si aún no existe"""
+        global _WORKER_PREDICTOR
+        if self._executor is not None:
+            return
+
+        context = multiprocessing.get_context(self.start_method)
+        if self.start_method == 'fork':
+            # Los hijos heredan el modelo ya cargado y comparten sus páginas hasta que se escriban
+            _WORKER_PREDICTOR = self.predictor
+        try:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.n_workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.threads_per_worker,
+                          (self.predictor.model_path, self.predictor.columns_path, self.predictor.cache_dir)),
+            )
+            # Forzar el arranque de los trabajadores mientras el predictor global está asignado
+            list(self._executor.map(_worker_pid, range(self.n_workers)))
+        finally:
+            _WORKER_PREDICTOR = None
+
+    def close(self) -> None:
+        """Detiene los procesos trabajadores"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def n_shards(self, n_rows: int) -> int:
+        """Número de fragmentos en que se divide un lote de `n_rows` filas"""
+        return min(self.n_workers * 4, max(1, n_rows // MIN_SHARD_ROWS))
+
+    def shards(self, source: Union[pd.DataFrame, str], n_rows: int) -> List[Shard]:
+        """Divide la fuente en fragmentos contiguos de filas crudas de tamaño similar"""
+        n_shards = self.n_shards(n_rows)
+        if isinstance(source, pd.DataFrame):
+            bounds = np.linspace(0, len(source), n_shards + 1, dtype=np.int64)
+            return [('frame', source.iloc[start:stop]) for start, stop in zip(bounds[:-1], bounds[1:])]
+        header, ranges = csv_byte_ranges(source, n_shards)
+        return [('csv', source, header, start, stop) for start, stop in ranges]
+
+    def score(self, source: Union[pd.DataFrame, str], n_rows: int, drift_step: int = 0,
+              head_rows: int = 0) -> Dict[str, Any]:
+        """
+        Puntúa una fuente repartida entre los trabajadores y reensambla los resultados en orden
+
+        Args:
+            source: DataFrame o ruta de un CSV sin comillas (ver csv_is_line_delimited)
+            n_rows: Filas (o filas estimadas del CSV), para decidir el número de fragmentos
+            drift_step: Paso del submuestreo para la deriva; 0 si no se monitorea
+            head_rows: Filas preprocesadas que se devuelven del inicio, para la sombra
+
+        Returns:
+            Diccionario con rows, probabilities, risk_levels, drift_matrix,
+            drift_missing (None sin deriva) y head
+        """
+        self.start()
+        shards = self.shards(source, n_rows)
+        policy = self.predictor.risk_policy
+        tasks = [(shard, policy, drift_step, head_rows if i == 0 else 0) for i, shard in enumerate(shards)]
+        parts = list(self._executor.map(_score_shard, tasks))
+        return {
+            'rows': sum(part['rows'] for part in parts),
+            'probabilities': np.concatenate([part['probabilities'] for part in parts]),
+            'risk_levels': np.concatenate([part['risk_levels'] for part in parts]),
+            'drift_matrix': np.concatenate([part['drift_matrix'] for part in parts]) if drift_step else None,
+            'drift_missing': np.concatenate([part['drift_missing'] for part in parts]) if drift_step else None,
+            'head': parts[0]['head'],
+        }
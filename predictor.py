@@ -1,181 +1,938 @@
+import logging
 import pickle
 import pandas as pd
 import numpy as np
 import os
-from typing import Dict, List, Any, Tuple
-import streamlit as st
+import threading
+import time
+from typing import Dict, List, Any, Tuple, Iterable, Iterator, Optional, Union, Callable, Sequence
+from artifacts import (ArtifactCache, COLUMNS_FILENAME, DEFAULT_CACHE_DIR, MODEL_FILENAME,
+                       load_pickle_artifact, resolve_artifact_path, resolve_cache_dir)
+from cache import PredictionCache, feature_vector_key
+from compact import CompactBatch
+from drift import DriftMonitor, DriftReference, load_drift_reference
+from explain import APPROX_METHOD, EXACT_METHOD, ContributionExplainer, ExplanationError, Explanations
+from metrics import PredictorMetrics
+from fastpath import CompiledPipeline, FastPathCompilationError, parity_sample, verify_parity
+from preprocessing import FormEncoder, PreprocessingPlan
+from topk import top_k_scored_chunks
+from risk_policy import COURSE_GROUP, DEFAULT_RISK_POLICY, RiskPolicy, course_labels, load_risk_policy
+from validation import ValidationReport, ValidationSchema
+from whatif import DEFAULT_SWEEPS, WhatIfResult, build_whatif_grid, default_threshold, summarize_grid
+
+logger = logging.getLogger(__name__)
+
+# Manejador de eventos: recibe el nivel ('success', 'warning' o 'error') y el mensaje
+EventHandler = Callable[[str, str], None]
+
+_LOG_LEVELS = {'success': logging.INFO, 'warning': logging.WARNING, 'error': logging.ERROR}
+
+def log_event_handler(level: str, message: str) -> None:
+    """Manejador de eventos por defecto: envía los mensajes al módulo logging"""
+    logger.log(_LOG_LEVELS.get(level, logging.INFO), message)
+
+# Niveles de riesgo de la política por defecto, de menor a mayor, y los cortes que los separan
+# (la política activa de cada predictor está en StudentDropoutPredictor.risk_policy)
+RISK_LEVELS = DEFAULT_RISK_POLICY.levels
+RISK_THRESHOLDS = DEFAULT_RISK_POLICY.thresholds
+
+# Umbral que usa XGBClassifier.predict para clasificación binaria (probabilidad > 0.5)
+DEFAULT_DECISION_THRESHOLD = 0.5
+
+# Tamaño de bloque por defecto para el procesamiento por partes
+DEFAULT_CHUNKSIZE = 50_000
+
+# Hasta este número de filas se usa la ruta rápida compilada en lugar del pipeline completo
+FAST_PATH_MAX_ROWS = 256
+
+# Hasta este número de filas las explicaciones usan TreeSHAP exacto; por encima, la aproximación
+EXACT_EXPLAIN_MAX_ROWS = 1000
+
+DataSource = Union[str, os.PathLike, pd.DataFrame, Iterable[pd.DataFrame], Any]
+
+def iter_data_chunks(source: DataSource, chunksize: int = DEFAULT_CHUNKSIZE,
+                     file_format: Optional[str] = None, skip_rows: int = 0) -> Iterator[pd.DataFrame]:
+    """
+    Lee una fuente de datos por bloques de como máximo `chunksize` filas
+    
+    Args:
+        source: Ruta o archivo CSV/Parquet, DataFrame o iterable de DataFrames
+        chunksize: Número máximo de filas por bloque
+        file_format: 'csv' o 'parquet'; si no se indica se deduce de la extensión
+        skip_rows: Filas de datos iniciales a omitir (p. ej. al reanudar un trabajo)
+    
+    Returns:
+        Iterador de DataFrames
+    """
+    if chunksize <= 0:
+        raise ValueError("chunksize debe ser mayor que 0")
+    
+    if isinstance(source, pd.DataFrame):
+        for start in range(skip_rows, len(source), chunksize):
+            yield source.iloc[start:start + chunksize]
+        return
+    
+    if file_format is None and isinstance(source, (str, os.PathLike)):
+        suffix = os.path.splitext(os.fspath(source))[1].lower()
+        file_format = 'parquet' if suffix in ('.parquet', '.pq') else 'csv'
+    
+    if file_format == 'parquet':
+        # pyarrow es opcional: solo se necesita para leer Parquet
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(source)
+        batches = (batch.to_pandas() for batch in parquet_file.iter_batches(batch_size=chunksize))
+        yield from _skip_leading_rows(batches, skip_rows)
+    elif file_format == 'csv' or isinstance(source, (str, os.PathLike)) or hasattr(source, 'read'):
+        # En CSV las filas omitidas ni siquiera se convierten (se conserva el encabezado)
+        skiprows = range(1, skip_rows + 1) if skip_rows else None
+        with pd.read_csv(source, chunksize=chunksize, skiprows=skiprows) as reader:
+            for chunk in reader:
+                yield chunk
+    else:
+        # Iterable de DataFrames ya particionados
+        chunks = (chunk.iloc[start:start + chunksize]
+                  for chunk in source for start in range(0, len(chunk), chunksize))
+        yield from _skip_leading_rows(chunks, skip_rows)
+
+def _skip_leading_rows(chunks: Iterable[pd.DataFrame], skip_rows: int) -> Iterator[pd.DataFrame]:
+    """Omite las primeras `skip_rows` filas de una secuencia de bloques, cortando el bloque donde caen"""
+    for chunk in chunks:
+        if skip_rows >= len(chunk):
+            skip_rows -= len(chunk)
+            continue
+        if skip_rows:
+            chunk = chunk.iloc[skip_rows:]
+            skip_rows = 0
+        yield chunk
 
 class StudentDropoutPredictor:
     """Clase para manejar las predicciones de deserción estudiantil"""
     
-    def __init__(self):
+    def __init__(self, event_handler: Optional[EventHandler] = None, model_path: Optional[str] = None,
+                 columns_path: Optional[str] = None, cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 prediction_cache_size: int = 1024, prediction_cache_ttl: Optional[float] = None,
+                 metrics_enabled: bool = False, risk_policy: Optional[RiskPolicy] = None):
+        self.event_handler = event_handler or log_event_handler
+        self.model_path = model_path or resolve_artifact_path(MODEL_FILENAME)
+        self.columns_path = columns_path or resolve_artifact_path(COLUMNS_FILENAME)
+        self.cache_dir = cache_dir
+        self.model_version = None
         self.model = None
         self.expected_columns = None
+        self.preprocessing_plan = None
+        self.validation_schema = None
+        self.decision_threshold = DEFAULT_DECISION_THRESHOLD
+        self.fast_path = None
+        self.fast_path_parity = None
+        self.explainer = None
+        # Comparación en sombra con un modelo candidato (ver registry.ShadowScorer)
+        self.shadow = None
+        # Monitoreo de deriva de las entradas; se activa si existe un perfil de referencia
+        self.drift = None
+        # Pool de procesos de predict_batch_parallel, reutilizado entre llamadas
+        self._parallel_scorer = None
+        self._parallel_lock = threading.Lock()
+        self.risk_policy = risk_policy or load_risk_policy()
+        self.prediction_cache = PredictionCache(prediction_cache_size, prediction_cache_ttl)
+        self.metrics = PredictorMetrics(enabled=metrics_enabled)
         self.is_loaded = False
     
-    def load_model(self):
-        """Carga el modelo y las columnas esperadas desde los archivos pickle"""
+    def load_model(self, warmup: bool = True, fast_path: bool = True):
+        """Carga el modelo y las columnas esperadas, usando la caché de artefactos si está activa"""
         try:
-            # Cargar el modelo con diferentes protocolos de pickle
-            model_path = "attached_assets/pipeline_final_desercion.pkl"
-            if os.path.exists(model_path):
-                try:
-                    # Intentar cargar con protocolo actual
-                    with open(model_path, 'rb') as f:
-                        self.model = pickle.load(f)
-                except (pickle.UnpicklingError, TypeError, AttributeError) as e:
-                    # Si falla, intentar con encoding latin-1 para compatibilidad con versiones anteriores
-                    try:
-                        with open(model_path, 'rb') as f:
-                            self.model = pickle.load(f, encoding='latin-1')
-                    except Exception as e2:
-                        # Como último recurso, usar joblib si está disponible
-                        try:
-                            import joblib
-                            self.model = joblib.load(model_path)
-                        except Exception as e3:
-                            raise Exception(f"No se pudo cargar el modelo con ningún método: pickle error: {e}, latin-1 error: {e2}, joblib error: {e3}")
-                
-                st.success("✅ Modelo cargado exitosamente")
-            else:
+            model_path = self.model_path
+            columns_path = self.columns_path
+            if not os.path.exists(model_path):
                 raise FileNotFoundError(f"No se encontró el archivo del modelo: {model_path}")
+            if not os.path.exists(columns_path):
+                raise FileNotFoundError(f"No se encontró el archivo de columnas: {columns_path}")
+            
+            model, columns, version = None, None, None
+            if self.cache_dir is not None:
+                try:
+                    cache = ArtifactCache(resolve_cache_dir(self.cache_dir, model_path))
+                    model, columns, version = cache.load(model_path, columns_path)
+                except OSError as e:
+                    # Sin permisos de escritura u otro problema de disco: cargar los originales
+                    logger.warning("No se pudo usar la caché de artefactos (%s); cargando los archivos originales", e)
             
-            # Cargar las columnas esperadas
-            columns_path = "attached_assets/columnas_esperadas.pkl"
-            if os.path.exists(columns_path):
+            if model is None:
+                # Cargar el modelo con diferentes protocolos de pickle
+                model = load_pickle_artifact(model_path)
                 with open(columns_path, 'rb') as f:
-                    self.expected_columns = pickle.load(f)
-                st.success("✅ Columnas esperadas cargadas exitosamente")
-            else:
-                raise FileNotFoundError(f"No se encontró el archivo de columnas: {columns_path}")
+                    columns = pickle.load(f)
+                version = ArtifactCache.source_version(model_path, columns_path)
             
+            # Los trabajadores del pool conservan el modelo anterior
+            self.close_parallel()
+            self.model = model
+            self.decision_threshold = self._get_decision_threshold(self.model)
+            self._emit('success', "✅ Modelo cargado exitosamente")
+            
+            self.expected_columns = list(columns)
+            self.preprocessing_plan = PreprocessingPlan(self.expected_columns)
+            self.validation_schema = ValidationSchema(self.expected_columns, plan=self.preprocessing_plan)
+            self._emit('success', "✅ Columnas esperadas cargadas exitosamente")
+            
+            self.model_version = version
+            # Las predicciones en caché solo son válidas para la versión del modelo que las generó
+            self.prediction_cache.bind_version(version)
             self.is_loaded = True
             
+            self.fast_path = None
+            self.explainer = None
+            if self.drift is not None:
+                self.drift.close()
+            self.drift = None
+            if fast_path:
+                self.compile_fast_path()
+            
+            if warmup:
+                # Una predicción de calentamiento evita el pico de latencia de la primera petición
+                self._predict_frame(self.create_default_student_data())
+            
+            # Después del calentamiento, para que solo se monitoreen lotes reales
+            self.drift = self._load_drift_monitor()
+            
         except Exception as e:
-            st.error(f"Error al cargar el modelo: {str(e)}")
+            self._emit('error', f"Error al cargar el modelo: {str(e)}")
             raise e
     
+    def _emit(self, level: str, message: str) -> None:
+        """Notifica un evento al manejador configurado (logging, widgets de Streamlit, ...)"""
+        self.event_handler(level, message)
+    
     def validate_input_data(self, data: pd.DataFrame) -> Tuple[bool, List[str]]:
         """Valida que los datos de entrada tengan las columnas correctas"""
         if self.expected_columns is None:
             return False, ["Columnas esperadas no cargadas"]
         
-        missing_columns = []
-        for col in self.expected_columns:
-            if col not in data.columns:
-                missing_columns.append(col)
+        if self.validation_schema is not None:
+            missing_columns = self.validation_schema.missing_columns(data.columns)
+        else:
+            missing_columns = [col for col in self.expected_columns if col not in data.columns]
         
         return len(missing_columns) == 0, missing_columns
     
+    def validate_data(self, data: pd.DataFrame, matrix: Optional[np.ndarray] = None,
+                      missing: Optional[np.ndarray] = None) -> ValidationReport:
+        """
+        Valida columnas, rangos, binarios y grupos one-hot de un lote en una sola pasada
+        
+        Args:
+            data: DataFrame de entrada
+            matrix: Matriz ya alineada de `data`; sin rellenar, o rellenada junto con `missing`
+            missing: Máscara de valores ausentes de una matriz rellenada (predict_batch con
+                return_matrix=True); esas celdas se ignoran como en la matriz sin rellenar
+        """
+        if self.validation_schema is None:
+            raise ValueError("Columnas esperadas no cargadas")
+        with self.metrics.stage('validation', len(data)):
+            if matrix is not None and missing is not None:
+                matrix = np.where(missing, np.nan, matrix)
+            return self.validation_schema.validate(data, matrix)
+    
+    def preprocess_matrix(self, data: pd.DataFrame) -> np.ndarray:
+        """Convierte los datos en una matriz float64 contigua alineada con las columnas esperadas"""
+        if self.preprocessing_plan is None:
+            raise ValueError("Columnas esperadas no cargadas")
+        return self.preprocessing_plan.transform(data)
+    
+    def _preprocess_observed(self, data: pd.DataFrame) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Matriz alineada y, con el monitoreo de deriva activo, la máscara de valores
+        ausentes antes del relleno (la deriva los cuenta aparte en lugar de verlos como 0)
+        """
+        if self.drift is None:
+            return self.preprocess_matrix(data), None
+        return self.preprocessing_plan.transform(data, return_missing=True)
+    
     def preprocess_data(self, data: pd.DataFrame) -> pd.DataFrame:
         """Preprocesa los datos para que coincidan con el formato esperado por el modelo"""
-        processed_data = data.copy()
+        # Las columnas ausentes se rellenan con 0, se reordenan según el orden esperado,
+        # se convierten a numérico y los valores NaN se rellenan con 0 en una sola pasada
+        matrix = self.preprocess_matrix(data)
+        return self.preprocessing_plan.to_frame(matrix, index=data.index)
+    
+    def predict_single(self, student_data: Union[pd.DataFrame, np.ndarray]) -> Dict[str, Any]:
+        """Realiza una predicción para un solo estudiante (DataFrame o vector ya alineado, p. ej. de FormEncoder)"""
+        if not self.is_loaded:
+            raise ValueError("El modelo no ha sido cargado")
+        
+        with self.metrics.call('predict_single', 1):
+            if isinstance(student_data, np.ndarray):
+                # Vector alineado: no hay encabezado que validar ni conversión que hacer
+                matrix = self._aligned_row(student_data)
+            else:
+                # Validar datos
+                with self.metrics.stage('validation', len(student_data)):
+                    is_valid, missing_cols = self.validate_input_data(student_data)
+                if not is_valid:
+                    self._emit('warning', f"Algunas columnas están ausentes: {missing_cols}. Usando valores por defecto.")
+                
+                # Preprocesar datos (solo se puntúa la primera fila)
+                with self.metrics.stage('preprocess', 1):
+                    matrix = self.preprocess_matrix(student_data)[:1]
+            
+            # Consultar la caché con el hash canónico del vector alineado
+            cache_key = None
+            if self.prediction_cache.enabled:
+                with self.metrics.stage('cache_lookup', 1):
+                    cache_key = (self.model_version, feature_vector_key(matrix))
+                    cached = self.prediction_cache.get(cache_key)
+                if cached is not None:
+                    return dict(cached)
+            
+            # Realizar predicción
+            try:
+                predictions, probabilities = self._score(matrix)
+                probability = probabilities[0]  # Probabilidad de la clase positiva (deserción)
+                
+                # Determinar nivel de riesgo
+                with self.metrics.stage('risk_bucketing', 1):
+                    risk_level = self._get_risk_level(probability, matrix)
+                
+                result = {
+                    'prediction': int(predictions[0]),
+                    'probability': float(probability),
+                    'risk_level': risk_level
+                }
+            except Exception as e:
+                raise ValueError(f"Error en la predicción: {str(e)}")
+            
+            if cache_key is not None:
+                self.prediction_cache.put(cache_key, result)
+            return dict(result)
+    
+    def predict_batch(self, data: pd.DataFrame, explain: bool = False, return_matrix: bool = False,
+                      check_columns: bool = True) -> Dict[str, Any]:
+        """
+        Realiza predicciones para múltiples estudiantes
         
-        # Asegurar que todas las columnas esperadas estén presentes
-        for col in self.expected_columns:
-            if col not in processed_data.columns:
-                processed_data[col] = 0  # Valor por defecto
+        Args:
+            data: DataFrame con los estudiantes
+            explain: Si es True, añade 'explanations' (Explanations) calculadas sobre la misma matriz
+            return_matrix: Si es True, añade 'matrix' (la matriz preprocesada) y 'missing' (su
+                máscara de valores ausentes antes del relleno), para compactar o validar el lote
+                sin volver a convertirlo
+            check_columns: Avisar de las columnas ausentes; False si el llamador ya validó el
+                encabezado (p. ej. en cada bloque de un mismo archivo)
+        """
+        if not self.is_loaded:
+            raise ValueError("El modelo no ha sido cargado")
+        
+        with self.metrics.call('predict_batch', len(data)):
+            # Validar datos
+            if check_columns:
+                with self.metrics.stage('validation', len(data)):
+                    is_valid, missing_cols = self.validate_input_data(data)
+                if not is_valid:
+                    self._emit('warning', f"Algunas columnas están ausentes: {missing_cols}. Usando valores por defecto.")
+            
+            if not explain and not return_matrix:
+                return self._predict_frame(data)
+            
+            with self.metrics.stage('preprocess', len(data)):
+                if return_matrix:
+                    # La máscara se devuelve aunque el monitoreo de deriva esté desactivado
+                    matrix, missing = self.preprocessing_plan.transform(data, return_missing=True)
+                else:
+                    matrix, missing = self._preprocess_observed(data)
+            results: Dict[str, Any] = self._predict_matrix(matrix, missing=missing)
+            if explain:
+                results['explanations'] = self._explain_matrix(matrix)
+            if return_matrix:
+                results['matrix'] = matrix
+                results['missing'] = missing
+            return results
+    
+    def explain_batch(self, data: pd.DataFrame, method: Optional[str] = None) -> Explanations:
+        """
+        Contribuciones de cada campo a la predicción de cada estudiante, en una sola pasada
         
-        # Reordenar columnas según el orden esperado
-        processed_data = processed_data[self.expected_columns]
+        Usa las contribuciones nativas del modelo de árboles (TreeSHAP) sobre el lote
+        completo y las agrega por columna simple y por grupo one-hot.
         
-        # Convertir a tipos numéricos
-        for col in processed_data.columns:
-            processed_data[col] = pd.to_numeric(processed_data[col], errors='coerce')
+        Args:
+            data: DataFrame con los estudiantes
+            method: 'exact' o 'approx'; por defecto exacto hasta EXACT_EXPLAIN_MAX_ROWS filas
         
-        # Rellenar valores NaN con 0
-        processed_data = processed_data.fillna(0)
+        Returns:
+            Explanations en escala log-odds; bias + suma de contribuciones = margen del modelo
+        """
+        if not self.is_loaded:
+            raise ValueError("El modelo no ha sido cargado")
         
-        return processed_data
+        with self.metrics.call('explain_batch', len(data)):
+            with self.metrics.stage('preprocess', len(data)):
+                matrix = self.preprocess_matrix(data)
+            return self._explain_matrix(matrix, method)
     
-    def predict_single(self, student_data: pd.DataFrame) -> Dict[str, Any]:
-        """Realiza una predicción para un solo estudiante"""
+    def explain_single(self, student: Union[pd.DataFrame, Dict[str, Any], np.ndarray]) -> Explanations:
+        """Explicación de un estudiante, guardada en la caché de predicciones junto a su predicción"""
         if not self.is_loaded:
             raise ValueError("El modelo no ha sido cargado")
         
-        # Validar datos
-        is_valid, missing_cols = self.validate_input_data(student_data)
-        if not is_valid:
-            st.warning(f"Algunas columnas están ausentes: {missing_cols}. Usando valores por defecto.")
+        matrix = self._student_row(student)
+        cache_key = None
+        if self.prediction_cache.enabled:
+            # Misma clave que la predicción, con un marcador para no mezclar ambos resultados
+            cache_key = (self.model_version, 'explain', feature_vector_key(matrix))
+            cached = self.prediction_cache.get(cache_key)
+            if cached is not None:
+                return cached
         
-        # Preprocesar datos
-        processed_data = self.preprocess_data(student_data)
+        with self.metrics.call('explain_single', 1):
+            explanations = self._explain_matrix(matrix)
+        if cache_key is not None:
+            self.prediction_cache.put(cache_key, explanations)
+        return explanations
+    
+    def _explain_matrix(self, matrix: np.ndarray, method: Optional[str] = None) -> Explanations:
+        """Calcula las explicaciones de una matriz ya alineada, compilando el explicador la primera vez"""
+        if self.explainer is None:
+            try:
+                self.explainer = ContributionExplainer(self.model, self.expected_columns)
+            except ExplanationError as e:
+                raise ValueError(f"El modelo no admite explicaciones: {e}")
+        if method is None:
+            method = EXACT_METHOD if len(matrix) <= EXACT_EXPLAIN_MAX_ROWS else APPROX_METHOD
+        with self.metrics.stage('explain', len(matrix)):
+            return self.explainer.explain_matrix(matrix, self.preprocessing_plan.to_frame(matrix), method)
+    
+    def predict_batch_parallel(self, data: Union[pd.DataFrame, str, os.PathLike], n_workers: Optional[int] = None,
+                               threads_per_worker: int = 1) -> Dict[str, np.ndarray]:
+        """
+        Realiza predicciones para múltiples estudiantes repartiendo el lote entre varios procesos
         
-        # Realizar predicción
-        try:
-            prediction = self.model.predict(processed_data)[0]
-            probability = self.model.predict_proba(processed_data)[0][1]  # Probabilidad de la clase positiva (deserción)
+        Los trabajadores reciben filas crudas (tramos del DataFrame o tramos de bytes
+        del CSV) y se encargan de leerlas, preprocesarlas, puntuarlas y asignar el
+        nivel de riesgo; el proceso principal solo valida el encabezado, reensambla
+        los resultados y actualiza métricas, deriva y sombra. El pool de procesos se
+        crea en la primera llamada y se reutiliza mientras no cambien n_workers ni
+        threads_per_worker (close_parallel lo detiene).
+        
+        Args:
+            data: DataFrame con los estudiantes o ruta de un CSV; un CSV con comillas
+                (que podría tener saltos de línea dentro de un campo) se lee aquí y se
+                reparte como DataFrame
+            n_workers: Número de procesos; por defecto núcleos disponibles / threads_per_worker
+            threads_per_worker: Hilos de XGBoost por proceso
+        
+        Returns:
+            Diccionario con predicciones, probabilidades y niveles de riesgo en el orden original
+        """
+        from parallel import csv_is_line_delimited, estimate_csv_rows
+        
+        if not self.is_loaded:
+            raise ValueError("El modelo no ha sido cargado")
+        
+        scorer = self._get_parallel_scorer(n_workers, threads_per_worker)
+        if not isinstance(data, pd.DataFrame):
+            path = os.fspath(data)
+            if csv_is_line_delimited(path):
+                data, n_rows = path, estimate_csv_rows(path)
+            else:
+                data = pd.read_csv(path)
+        if isinstance(data, pd.DataFrame):
+            n_rows = len(data)
+        if scorer.n_shards(n_rows) <= 1:
+            # Un solo fragmento: no compensa enviarlo a otro proceso
+            return self.predict_batch(data if isinstance(data, pd.DataFrame) else pd.read_csv(data))
+        
+        with self.metrics.call('predict_batch_parallel') as call:
+            # Validar el encabezado una sola vez en el proceso principal
+            header = data if isinstance(data, pd.DataFrame) else pd.read_csv(data, nrows=0)
+            with self.metrics.stage('validation', len(header)):
+                is_valid, missing_cols = self.validate_input_data(header)
+            if not is_valid:
+                self._emit('warning', f"Algunas columnas están ausentes: {missing_cols}. Usando valores por defecto.")
             
-            # Determinar nivel de riesgo
-            risk_level = self._get_risk_level(probability)
+            drift, shadow = self.drift, self.shadow
+            start = time.perf_counter()
+            with self.metrics.stage('score_parallel') as stage:
+                result = scorer.score(data, n_rows, drift_step=drift.sample_step(n_rows) if drift else 0,
+                                      head_rows=shadow.max_rows if shadow else 0)
+                stage.add_rows(result['rows'])
+            call.add_rows(result['rows'])
+            probabilities = result['probabilities']
+            predictions = (probabilities > self.decision_threshold).astype(np.int64)
+            
+            # Riesgo y probabilidades vienen de los trabajadores; métricas, deriva y
+            # sombra se actualizan aquí, en el único estado que sobrevive a la llamada
+            if shadow is not None:
+                head = result['head']
+                shadow.observe(self, head, predictions[:len(head)], probabilities[:len(head)],
+                               time.perf_counter() - start)
+            if drift is not None:
+                with self.metrics.stage('drift', len(result['drift_matrix'])):
+                    drift.update(result['drift_matrix'], result['drift_missing'], rows=result['rows'])
             
             return {
-                'prediction': int(prediction),
-                'probability': float(probability),
-                'risk_level': risk_level
+                'predictions': predictions,
+                'probabilities': probabilities,
+                'risk_levels': result['risk_levels']
             }
-        except Exception as e:
-            raise ValueError(f"Error en la predicción: {str(e)}")
     
-    def predict_batch(self, data: pd.DataFrame) -> Dict[str, List]:
-        """Realiza predicciones para múltiples estudiantes"""
+    def _get_parallel_scorer(self, n_workers: Optional[int], threads_per_worker: int) -> Any:
+        """Pool de procesos con la configuración pedida; se crea una vez y se reutiliza"""
+        from parallel import ParallelScorer
+        
+        with self._parallel_lock:
+            scorer = self._parallel_scorer
+            if scorer is not None and scorer.options == (n_workers, threads_per_worker):
+                return scorer
+            if scorer is not None:
+                scorer.close()
+            scorer = ParallelScorer(self, n_workers=n_workers, threads_per_worker=threads_per_worker)
+            self._parallel_scorer = scorer
+            return scorer
+    
+    def close_parallel(self) -> None:
+        """Detiene los procesos trabajadores de predict_batch_parallel, si existen"""
+        with self._parallel_lock:
+            scorer, self._parallel_scorer = self._parallel_scorer, None
+        if scorer is not None:
+            scorer.close()
+    
+    def predict_stream(self, source: DataSource, chunksize: int = DEFAULT_CHUNKSIZE,
+                       file_format: Optional[str] = None) -> Iterator[Tuple[pd.DataFrame, Dict[str, np.ndarray]]]:
+        """
+        Realiza predicciones bloque a bloque sobre una fuente arbitrariamente grande
+        
+        Solo un bloque de `chunksize` filas está en memoria a la vez, de modo que el
+        consumo máximo de memoria depende del tamaño del bloque y no del archivo.
+        
+        Args:
+            source: Ruta o archivo CSV/Parquet, DataFrame o iterable de DataFrames
+            chunksize: Número máximo de filas por bloque
+            file_format: 'csv' o 'parquet'; si no se indica se deduce de la extensión
+        
+        Returns:
+            Iterador de tuplas (bloque, predicciones del bloque)
+        """
+        if not self.is_loaded:
+            raise ValueError("El modelo no ha sido cargado")
+        
+        header_checked = False
+        for chunk in iter_data_chunks(source, chunksize, file_format):
+            # Todos los bloques comparten encabezado: basta con validarlo una vez
+            if not header_checked:
+                is_valid, missing_cols = self.validate_input_data(chunk)
+                if not is_valid:
+                    self._emit('warning', f"Algunas columnas están ausentes: {missing_cols}. Usando valores por defecto.")
+                header_checked = True
+            with self.metrics.call('predict_stream_chunk', len(chunk)):
+                predictions = self._predict_frame(chunk)
+            yield chunk, predictions
+    
+    def top_k(self, source: DataSource, k: int = 500, group_by: Optional[str] = None,
+              columns: Optional[Sequence[Any]] = None, chunksize: int = DEFAULT_CHUNKSIZE,
+              file_format: Optional[str] = None) -> pd.DataFrame:
+        """
+        Los K estudiantes con mayor probabilidad de deserción, global o por grupo
+        
+        Puntúa la fuente bloque a bloque y conserva solo un heap de K estudiantes
+        por grupo (ver topk.TopKAccumulator): la memoria depende de K y del bloque,
+        no del tamaño de la cohorte.
+        
+        Args:
+            source: Ruta o archivo CSV/Parquet, DataFrame o iterable de DataFrames
+            k: Estudiantes por grupo
+            group_by: Grupo one-hot ('Course', 'Application mode', ...); None = ranking global
+            columns: Columnas de entrada a devolver (p. ej. identificadores); None = todas
+            chunksize: Número máximo de filas por bloque
+            file_format: 'csv' o 'parquet'; si no se indica se deduce de la extensión
+        
+        Returns:
+            DataFrame con el ranking (ver TopKAccumulator.result)
+        """
+        with self.metrics.call('top_k'):
+            return top_k_scored_chunks(self.predict_stream(source, chunksize, file_format), k, group_by, columns)
+    
+    def compact_batch(self, data: pd.DataFrame, matrix: Optional[np.ndarray] = None) -> CompactBatch:
+        """
+        Preprocesa un lote y lo guarda en formato compacto (bits, int16 y float64)
+        
+        Args:
+            data: DataFrame con los estudiantes
+            matrix: Matriz ya preprocesada de `data` (p. ej. la de predict_batch con return_matrix=True)
+        """
+        if self.preprocessing_plan is None:
+            raise ValueError("Columnas esperadas no cargadas")
+        with self.metrics.stage('compact', len(data)):
+            return CompactBatch.from_frame(data, self.preprocessing_plan, matrix)
+    
+    def predict_compact(self, batch: CompactBatch, chunksize: int = DEFAULT_CHUNKSIZE) -> Dict[str, np.ndarray]:
+        """
+        Puntúa un lote compacto reconstruyendo la matriz bloque a bloque
+        
+        Args:
+            batch: Lote de compact_batch (o CompactBatch.concat de varios)
+            chunksize: Filas reconstruidas en float64 a la vez
+        
+        Returns:
+            Diccionario con predicciones, probabilidades y niveles de riesgo
+        """
+        if not self.is_loaded:
+            raise ValueError("El modelo no ha sido cargado")
+        
+        parts = []
+        with self.metrics.call('predict_compact', len(batch)):
+            for matrix in batch.iter_dense(chunksize):
+                parts.append(self._predict_matrix(matrix))
+        if not parts:
+            return self._predict_matrix(np.empty((0, len(self.expected_columns)), dtype=np.float64))
+        return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+    
+    def explain_compact(self, batch: CompactBatch, method: Optional[str] = None,
+                        chunksize: int = DEFAULT_CHUNKSIZE) -> Explanations:
+        """
+        Explicaciones de un lote compacto, reconstruyendo la matriz bloque a bloque
+        
+        Args:
+            batch: Lote de compact_batch (o CompactBatch.concat de varios)
+            method: 'exact' o 'approx'; por defecto exacto si el lote completo tiene
+                hasta EXACT_EXPLAIN_MAX_ROWS filas
+            chunksize: Filas reconstruidas en float64 a la vez
+        """
         if not self.is_loaded:
             raise ValueError("El modelo no ha sido cargado")
+        if len(batch) == 0:
+            raise ValueError("El lote no contiene estudiantes")
+        
+        # El método se decide por el tamaño del lote, no del bloque
+        if method is None:
+            method = EXACT_METHOD if len(batch) <= EXACT_EXPLAIN_MAX_ROWS else APPROX_METHOD
+        with self.metrics.call('explain_compact', len(batch)):
+            return Explanations.concat([self._explain_matrix(matrix, method) for matrix in batch.iter_dense(chunksize)])
+    
+    def predict_matrix(self, matrix: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Puntúa una matriz ya alineada con las columnas esperadas (p. ej. la de preprocess_matrix)
+        
+        Args:
+            matrix: Matriz con una fila por estudiante y las columnas esperadas en orden
         
-        # Validar datos
-        is_valid, missing_cols = self.validate_input_data(data)
-        if not is_valid:
-            st.warning(f"Algunas columnas están ausentes: {missing_cols}. Usando valores por defecto.")
+        Returns:
+            Diccionario con predicciones, probabilidades y niveles de riesgo
+        """
+        if not self.is_loaded:
+            raise ValueError("El modelo no ha sido cargado")
+        if matrix.ndim != 2 or matrix.shape[1] != len(self.expected_columns):
+            raise ValueError(f"La matriz debe tener {len(self.expected_columns)} columnas; tiene forma {matrix.shape}")
         
+        with self.metrics.call('predict_matrix', len(matrix)):
+            return self._predict_matrix(matrix)
+    
+    def _predict_frame(self, data: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Preprocesa y puntúa un DataFrame ya validado"""
         # Preprocesar datos
-        processed_data = self.preprocess_data(data)
+        with self.metrics.stage('preprocess', len(data)):
+            matrix, missing = self._preprocess_observed(data)
+        return self._predict_matrix(matrix, missing=missing)
+    
+    def _predict_matrix(self, matrix: np.ndarray, missing: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Puntúa una matriz ya alineada con las columnas esperadas
         
+        Args:
+            matrix: Matriz alineada, con los valores ausentes ya rellenados
+            missing: Máscara de valores ausentes antes del relleno, para el monitoreo de deriva
+        """
         # Realizar predicciones
         try:
-            predictions = self.model.predict(processed_data)
-            probabilities = self.model.predict_proba(processed_data)[:, 1]  # Probabilidad de deserción
+            predictions, probabilities = self._score(matrix)
+            
+            with self.metrics.stage('risk_bucketing', len(matrix)):
+                risk_levels = self._get_risk_levels(probabilities, matrix)
             
-            # Determinar niveles de riesgo
-            risk_levels = [self._get_risk_level(prob) for prob in probabilities]
+            if self.drift is not None:
+                with self.metrics.stage('drift', len(matrix)):
+                    self.drift.update(matrix, missing)
             
             return {
-                'predictions': predictions.tolist(),
-                'probabilities': probabilities.tolist(),
+                'predictions': predictions,
+                'probabilities': probabilities,
                 'risk_levels': risk_levels
             }
         except Exception as e:
             raise ValueError(f"Error en las predicciones: {str(e)}")
     
-    def _get_risk_level(self, probability: float) -> str:
-        """Determina el nivel de riesgo basado en la probabilidad"""
-        if probability >= 0.7:
-            return "Alto"
-        elif probability >= 0.3:
-            return "Medio"
+    def _score(self, matrix: np.ndarray, observe: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Evalúa el modelo una sola vez y deriva las clases desde las probabilidades
+        
+        Args:
+            matrix: Matriz alineada con las columnas esperadas
+            observe: Enviar el lote a la comparación en sombra, si está activa
+                (False para matrices sintéticas como las variantes de what_if)
+        """
+        start = time.perf_counter()
+        if self.fast_path is not None and len(matrix) <= FAST_PATH_MAX_ROWS:
+            with self.metrics.stage('predict_proba_fast', len(matrix)):
+                probabilities = self.fast_path.predict_proba(matrix)
         else:
-            return "Bajo"
+            with self.metrics.stage('predict_proba', len(matrix)):
+                processed_data = self.preprocessing_plan.to_frame(matrix)
+                probabilities = self.model.predict_proba(processed_data)[:, 1]  # Probabilidad de deserción
+        predictions = (probabilities > self.decision_threshold).astype(np.int64)
+        shadow = self.shadow
+        if observe and shadow is not None:
+            shadow.observe(self, matrix, predictions, probabilities, time.perf_counter() - start)
+        return predictions, probabilities
     
-    def create_default_student_data(self) -> pd.DataFrame:
-        """Crea un DataFrame con valores por defecto para todos los campos requeridos"""
+    def compile_fast_path(self, parity_rows: int = 500) -> bool:
+        """
+        Compila el pipeline en la ruta rápida de NumPy y comprueba su paridad bit a bit
+        
+        Args:
+            parity_rows: Filas sintéticas usadas para comparar con predict_proba del pipeline
+        
+        Returns:
+            True si la ruta rápida quedó activa
+        """
+        try:
+            compiled = CompiledPipeline.from_pipeline(self.model, self.expected_columns)
+        except (FastPathCompilationError, AttributeError, KeyError, ImportError) as e:
+            logger.info("Ruta rápida no disponible para este modelo: %s", e)
+            self.fast_path = None
+            return False
+        
+        sample = parity_sample(self.expected_columns, parity_rows)
+        self.fast_path_parity = verify_parity(self.model, compiled, sample, self.expected_columns)
+        if not self.fast_path_parity['bitwise_equal']:
+            logger.warning("La ruta rápida no coincide con el pipeline (%s); se desactiva",
+                           self.fast_path_parity)
+            self.fast_path = None
+            return False
+        
+        self.fast_path = compiled
+        return True
+    
+    def predict_fast(self, row: Union[Dict[str, Any], np.ndarray, Sequence[float]]) -> Dict[str, Any]:
+        """
+        Predicción de baja latencia para un estudiante sin pasar por pandas
+        
+        Args:
+            row: Diccionario columna -> valor (las columnas ausentes toman el valor por defecto)
+                 o vector ya alineado con las columnas esperadas
+        
+        Returns:
+            Diccionario con predicción, probabilidad y nivel de riesgo
+        """
+        if not self.is_loaded:
+            raise ValueError("El modelo no ha sido cargado")
+        
+        matrix = self._student_row(row)
+        
+        with self.metrics.call('predict_fast', 1):
+            predictions, probabilities = self._score(matrix)
+        probability = float(probabilities[0])
+        return {
+            'prediction': int(predictions[0]),
+            'probability': probability,
+            'risk_level': self._get_risk_level(probability, matrix)
+        }
+    
+    def what_if(self, student: Union[pd.DataFrame, Dict[str, Any], np.ndarray],
+                sweeps: Optional[Dict[str, Optional[Sequence[Any]]]] = None,
+                threshold: Optional[float] = None) -> WhatIfResult:
+        """
+        Análisis qué-pasaría-si de un estudiante
+        
+        Construye variantes del estudiante (barridos de columnas numéricas y cambios
+        de categoría en grupos one-hot), las puntúa en una sola llamada al modelo y
+        busca en cada barrido el cambio mínimo que cruza el umbral de riesgo.
+        
+        Args:
+            student: DataFrame (se usa la primera fila), diccionario columna -> valor o vector alineado
+            sweeps: Columna o grupo -> valores a probar; por defecto whatif.DEFAULT_SWEEPS
+            threshold: Probabilidad a cruzar; por defecto el límite inferior del nivel de riesgo actual
+        
+        Returns:
+            WhatIfResult con las curvas de probabilidad y los cambios mínimos
+        """
+        if not self.is_loaded:
+            raise ValueError("El modelo no ha sido cargado")
+        
+        base = self._student_row(student)[0]
+        grid = build_whatif_grid(base, self.preprocessing_plan, sweeps if sweeps is not None else DEFAULT_SWEEPS)
+        
+        # El estudiante original va en la misma llamada que sus variantes
+        variants = np.vstack([base[None, :], grid.matrix])
+        with self.metrics.call('what_if', len(variants)):
+            _, probabilities = self._score(variants, observe=False)
+        # Cada variante se clasifica con los cortes de su propia carrera
+        risk_levels = self._get_risk_levels(probabilities, variants)
+        
+        base_probability = float(probabilities[0])
+        if threshold is None:
+            courses = course_labels(variants[:1], self.expected_columns)
+            thresholds = self.risk_policy.thresholds_for(courses[0] if courses is not None else None)
+            threshold = default_threshold(base_probability, thresholds)
+        return summarize_grid(grid, probabilities[1:], risk_levels[1:], base_probability, risk_levels[0], threshold)
+    
+    def what_if_surface(self, student: Union[pd.DataFrame, Dict[str, Any], np.ndarray],
+                        x_feature: str, x_values: Sequence[float],
+                        y_feature: str, y_values: Sequence[float]) -> pd.DataFrame:
+        """
+        Superficie de probabilidad al variar dos columnas numéricas a la vez
+        
+        Returns:
+            DataFrame con los valores de `y_feature` como índice y los de `x_feature` como columnas
+        """
+        if not self.is_loaded:
+            raise ValueError("El modelo no ha sido cargado")
+        
+        plan = self.preprocessing_plan
+        base = self._student_row(student)[0]
+        xs = np.asarray(x_values, dtype=plan.dtype)
+        ys = np.asarray(y_values, dtype=plan.dtype)
+        grid = np.repeat(base[None, :], len(xs) * len(ys), axis=0)
+        grid[:, plan.column_index[x_feature]] = np.tile(xs, len(ys))
+        grid[:, plan.column_index[y_feature]] = np.repeat(ys, len(xs))
+        
+        with self.metrics.call('what_if_surface', len(grid)):
+            _, probabilities = self._score(grid, observe=False)
+        return pd.DataFrame(probabilities.reshape(len(ys), len(xs)),
+                            index=pd.Index(y_values, name=y_feature), columns=pd.Index(x_values, name=x_feature))
+    
+    def _student_row(self, student: Union[pd.DataFrame, Dict[str, Any], np.ndarray, Sequence[float]]) -> np.ndarray:
+        """Matriz de una fila alineada a partir de un DataFrame, un diccionario o un vector"""
+        plan = self.preprocessing_plan
+        if isinstance(student, pd.DataFrame):
+            return self.preprocess_matrix(student)[:1]
+        if isinstance(student, dict):
+            vector = plan.fill_values.copy()
+            for col, value in student.items():
+                idx = plan.column_index.get(col)
+                if idx is not None:
+                    vector[idx] = value
+            student = vector
+        return self._aligned_row(student)
+    
+    def _aligned_row(self, row: Union[np.ndarray, Sequence[float]]) -> np.ndarray:
+        """Convierte un vector alineado en una matriz de una fila, rellenando los valores ausentes"""
+        plan = self.preprocessing_plan
+        vector = np.array(row, dtype=plan.dtype).reshape(-1)
+        if vector.shape[0] != plan.num_features:
+            raise ValueError(f"Se esperaban {plan.num_features} valores, se recibieron {vector.shape[0]}")
+        missing = np.isnan(vector)
+        if missing.any():
+            vector[missing] = plan.fill_values[missing]
+        return vector.reshape(1, -1)
+    
+    @staticmethod
+    def _get_decision_threshold(model: Any) -> float:
+        """Obtiene el umbral de decisión del modelo (p. ej. TunedThresholdClassifierCV) o 0.5 por defecto"""
+        estimators = [model]
+        if hasattr(model, 'steps'):
+            estimators.append(model.steps[-1][1])
+        for estimator in estimators:
+            for attr in ('best_threshold_', 'threshold_', 'threshold'):
+                value = getattr(estimator, attr, None)
+                if isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+                    return float(value)
+        return DEFAULT_DECISION_THRESHOLD
+    
+    def _get_risk_level(self, probability: float, matrix: Optional[np.ndarray] = None) -> str:
+        """Determina el nivel de riesgo basado en la probabilidad"""
+        return self._get_risk_levels(np.asarray([probability]), matrix)[0]
+    
+    def _get_risk_levels(self, probabilities: np.ndarray, matrix: Optional[np.ndarray] = None) -> np.ndarray:
+        """Determina los niveles de riesgo de un arreglo de probabilidades en una sola operación"""
+        courses = None
+        if matrix is not None and self.risk_policy.course_thresholds:
+            courses = course_labels(matrix, self.expected_columns)
+        return self.risk_policy.assign(probabilities, courses)
+    
+    def _load_drift_monitor(self) -> Optional[DriftMonitor]:
+        """Monitor de deriva del perfil de referencia por defecto, si existe y coincide con las columnas"""
+        try:
+            reference = load_drift_reference()
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("No se pudo cargar el perfil de deriva: %s", e)
+            return None
+        if reference is None:
+            return None
+        if reference.columns != self.expected_columns:
+            logger.warning("El perfil de deriva no corresponde a las columnas del modelo; monitoreo desactivado")
+            return None
+        return DriftMonitor(reference, background=True)
+    
+    def set_drift_reference(self, reference: Optional[DriftReference]) -> None:
+        """Empieza a monitorear la deriva respecto de un perfil (None lo desactiva)"""
+        if reference is not None and reference.columns != self.expected_columns:
+            raise ValueError("El perfil de deriva no corresponde a las columnas del modelo")
+        if self.drift is not None:
+            self.drift.close()
+        self.drift = DriftMonitor(reference, background=True) if reference is not None else None
+    
+    def set_risk_policy(self, policy: RiskPolicy) -> None:
+        """Cambia la política de riesgo; las predicciones en caché llevan el nivel antiguo y se descartan"""
+        self.risk_policy = policy
+        self.prediction_cache.clear()
+    
+    def rebucket(self, predictions: Dict[str, Any], data: Optional[Union[pd.DataFrame, CompactBatch]] = None,
+                 policy: Optional[RiskPolicy] = None) -> Dict[str, Any]:
+        """
+        Recalcula los niveles de riesgo a partir de probabilidades ya calculadas, sin ejecutar el modelo
+        
+        Args:
+            predictions: Predicciones de predict_batch o de un almacén (se necesitan las probabilidades)
+            data: Datos de los estudiantes (DataFrame o CompactBatch), para los cortes por carrera de la política
+            policy: Política a aplicar; por defecto la activa del predictor
+        
+        Returns:
+            Copia de las predicciones con 'risk_levels' recalculado
+        """
+        policy = policy or self.risk_policy
+        probabilities = np.asarray(predictions['probabilities'])
+        with self.metrics.stage('risk_bucketing', len(probabilities)):
+            if data is None:
+                risk_levels = policy.assign(probabilities)
+            elif isinstance(data, CompactBatch):
+                courses = None
+                if policy.course_thresholds:
+                    columns = data.group_columns([COURSE_GROUP])
+                    courses = course_labels(data.select(columns), columns)
+                risk_levels = policy.assign(probabilities, courses)
+            else:
+                risk_levels = policy.assign_frame(probabilities, data)
+        return {**predictions, 'risk_levels': risk_levels}
+    
+    def default_feature_vector(self) -> np.ndarray:
+        """
+        Vector float64 con los valores por defecto de todos los campos requeridos
+        
+        Las columnas one-hot valen siempre 0. En la versión original,
+        create_default_student_data asignaba 20 a 'Course_Business & Management'
+        porque 'management' contiene 'age'. El formulario fija todas las columnas
+        de Course, así que sus predicciones no cambian; solo cambian las filas por
+        defecto sin curso (create_default_student_data, FormEncoder.encode sin "Course").
+        """
         if self.expected_columns is None:
             raise ValueError("Columnas esperadas no cargadas")
         
-        # Crear DataFrame con valores por defecto
-        default_values = {}
-        for col in self.expected_columns:
-            # Asignar valores por defecto basados en el nombre de la columna
-            if 'grade' in col.lower() or 'qualification' in col.lower():
-                default_values[col] = 0.0
-            elif 'age' in col.lower():
-                default_values[col] = 20
+        # Asignar valores por defecto basados en el nombre de la columna
+        vector = np.zeros(len(self.expected_columns), dtype=np.float64)
+        for i, col in enumerate(self.expected_columns):
+            if '_' in col or 'grade' in col.lower() or 'qualification' in col.lower():
+                continue
+            if 'age' in col.lower():
+                vector[i] = 20
             elif 'order' in col.lower():
-                default_values[col] = 1
-            elif any(keyword in col.lower() for keyword in ['units', 'sem', 'curricular']):
-                default_values[col] = 0
-            else:
-                default_values[col] = 0
-        
-        return pd.DataFrame([default_values])
+                vector[i] = 1
+        return vector
+    
+    def create_default_student_data(self) -> pd.DataFrame:
+        """Crea un DataFrame con valores por defecto para todos los campos requeridos"""
+        return pd.DataFrame([self.default_feature_vector()], columns=self.expected_columns)
+    
+    def create_form_encoder(self) -> FormEncoder:
+        """Codificador de formularios con la plantilla de valores por defecto del modelo"""
+        return FormEncoder(self.expected_columns, self.default_feature_vector())
     
     def get_model_info(self) -> Dict[str, Any]:
         """Retorna información sobre el modelo cargado"""
@@ -189,8 +946,31 @@ class StudentDropoutPredictor:
             return {
                 "loaded": True,
                 "model_type": model_type,
+                "model_version": self.model_version,
+                "model_path": self.model_path,
+                "prediction_cache": self.prediction_cache.stats(),
+                "fast_path": self.fast_path is not None,
+                "fast_path_parity": self.fast_path_parity,
+                "risk_policy": self.risk_policy.key,
+                "shadow": self.shadow.report() if self.shadow is not None else None,
+                "drift": self.drift.summary() if self.drift is not None else None,
+                "metrics": self.metrics.snapshot(),
                 "num_features": num_features,
                 "expected_columns": self.expected_columns
             }
         except Exception as e:
             return {"loaded": True, "error": str(e)}
+    
+    def metrics_text(self) -> str:
+        """Instantánea de las métricas del predictor en formato de texto de Prometheus"""
+        cache_stats = self.prediction_cache.stats()
+        extra = {
+            'model_loaded': int(self.is_loaded),
+            'prediction_cache': {key: cache_stats[key] for key in ('size', 'hits', 'misses', 'evictions')},
+        }
+        if self.shadow is not None:
+            extra['shadow'] = self.shadow.report()
+        text = self.metrics.to_prometheus(extra=extra)
+        if self.drift is not None:
+            text += self.drift.to_prometheus()
+        return text
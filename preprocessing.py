@@ -0,0 +1,219 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+class HeaderAlignment:
+    """Correspondencia precalculada entre un encabezado de entrada y las columnas esperadas"""
+
+    __slots__ = ("source_positions", "target_positions", "missing_positions", "missing_columns", "identity")
+
+    def __init__(self, source_positions: np.ndarray, target_positions: np.ndarray,
+                 missing_positions: np.ndarray, missing_columns: List[str]):
+        self.source_positions = source_positions
+        self.target_positions = target_positions
+        self.missing_positions = missing_positions
+        self.missing_columns = missing_columns
+        # El encabezado coincide exactamente con las columnas esperadas, en el mismo orden
+        self.identity = False
+
+
+class PreprocessingPlan:
+    """
+    Plan de preprocesamiento compilado una sola vez a partir de las columnas esperadas.
+
+    Guarda el mapa de índices de columnas, el tipo de dato destino y los valores de
+    relleno, y convierte cualquier DataFrame de entrada en una matriz NumPy contigua
+    en una sola pasada. La alineación de columnas se guarda por huella del encabezado,
+    de modo que los lotes siguientes con el mismo encabezado no la recalculan. El
+    tipo por defecto es float64, el mismo que producía pd.to_numeric y con que se
+    ajustó el pipeline, para que las probabilidades no cambien.
+    """
+
+    def __init__(self, expected_columns: Sequence[str], dtype: Any = np.float64,
+                 fill_values: Optional[Dict[str, float]] = None, max_cached_headers: int = 32):
+        self.columns = list(expected_columns)
+        self.column_index = {col: i for i, col in enumerate(self.columns)}
+        self.dtype = np.dtype(dtype)
+        self.fill_values = np.zeros(len(self.columns), dtype=self.dtype)
+        for col, value in (fill_values or {}).items():
+            self.fill_values[self.column_index[col]] = value
+        self.max_cached_headers = max_cached_headers
+        self._alignments: "OrderedDict[Tuple[Any, ...], HeaderAlignment]" = OrderedDict()
+
+    @property
+    def num_features(self) -> int:
+        return len(self.columns)
+
+    def align(self, header: Sequence[Any]) -> HeaderAlignment:
+        """Retorna la alineación de un encabezado, calculándola solo la primera vez"""
+        fingerprint = tuple(header)
+        alignment = self._alignments.get(fingerprint)
+        if alignment is not None:
+            self._alignments.move_to_end(fingerprint)
+            return alignment
+
+        # Ante nombres duplicados se usa la primera aparición, igual que al seleccionar con pandas
+        positions: Dict[Any, int] = {}
+        for pos, col in enumerate(fingerprint):
+            positions.setdefault(col, pos)
+
+        source, target, missing = [], [], []
+        for i, col in enumerate(self.columns):
+            pos = positions.get(col)
+            if pos is None:
+                missing.append(i)
+            else:
+                source.append(pos)
+                target.append(i)
+
+        alignment = HeaderAlignment(
+            np.asarray(source, dtype=np.intp),
+            np.asarray(target, dtype=np.intp),
+            np.asarray(missing, dtype=np.intp),
+            [self.columns[i] for i in missing],
+        )
+        alignment.identity = fingerprint == tuple(self.columns)
+        self._alignments[fingerprint] = alignment
+        if len(self._alignments) > self.max_cached_headers:
+            self._alignments.popitem(last=False)
+        return alignment
+
+    def transform(self, data: pd.DataFrame, fill_missing: bool = True,
+                  return_missing: bool = False) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Convierte un DataFrame en una matriz contigua alineada con las columnas esperadas
+
+        Args:
+            data: DataFrame de entrada
+            fill_missing: Rellenar los valores ausentes o no numéricos; con False quedan como NaN
+                (las columnas ausentes del encabezado se rellenan siempre)
+            return_missing: Retornar también la máscara de valores ausentes antes del relleno
+                (valores NaN o no numéricos y columnas ausentes del encabezado)
+
+        Returns:
+            La matriz, o la tupla (matriz, máscara) si return_missing es True
+        """
+        alignment = self.align(data.columns)
+        out = np.empty((len(data), self.num_features), dtype=self.dtype)
+
+        if len(alignment.missing_positions):
+            out[:, alignment.missing_positions] = self.fill_values[alignment.missing_positions]
+
+        dtypes = data.dtypes.to_numpy()
+        if all(isinstance(dt, np.dtype) and dt.kind in 'fiub' for dt in dtypes):
+            # Todas las columnas numéricas de NumPy: con un solo bloque to_numpy() es una vista,
+            # sin copia (una sola columna de texto, como un ID, lo convertiría en objeto)
+            values = data.to_numpy()
+            if alignment.identity:
+                np.copyto(out, values, casting='unsafe')
+            else:
+                for src, dst in zip(alignment.source_positions, alignment.target_positions):
+                    np.copyto(out[:, dst], values[:, src], casting='unsafe')
+        else:
+            columns = [column for _, column in data.items()]
+            for src, dst in zip(alignment.source_positions, alignment.target_positions):
+                np.copyto(out[:, dst], self._column_values(columns[src]), casting='unsafe')
+
+        if not fill_missing and not return_missing:
+            return out
+
+        missing_mask = np.isnan(out)
+        if fill_missing and missing_mask.any():
+            # Rellenar valores no numéricos o ausentes con el valor por defecto de cada columna
+            np.copyto(out, np.broadcast_to(self.fill_values, out.shape), where=missing_mask)
+
+        if return_missing:
+            missing_mask[:, alignment.missing_positions] = True
+            return out, missing_mask
+        return out
+
+    def to_frame(self, matrix: np.ndarray, index: Optional[pd.Index] = None) -> pd.DataFrame:
+        """
+        Envuelve una matriz alineada en un DataFrame float64 para el pipeline
+
+        El MinMaxScaler se ajustó con datos float64: una matriz float32 escalaría en
+        float32 y cambiaría las probabilidades. Una matriz float64 no se copia.
+        """
+        return pd.DataFrame(matrix.astype(np.float64, copy=False), columns=self.columns, index=index, copy=False)
+
+    def _column_values(self, column: pd.Series) -> np.ndarray:
+        kind = column.dtype.kind
+        if kind in 'fiub' and isinstance(column.dtype, np.dtype):
+            return column.to_numpy(copy=False)
+        if kind in 'fiub':
+            # Tipos extendidos de pandas (Int64, boolean, ...) con posibles NA
+            return column.to_numpy(dtype=self.dtype, na_value=np.nan)
+        return pd.to_numeric(column, errors='coerce').to_numpy(dtype=self.dtype, na_value=np.nan)
+
+
+def one_hot_groups(columns: Sequence[str]) -> "OrderedDict[str, List[int]]":
+    """
+    Agrupa las columnas one-hot por su prefijo ('Course_...', 'Nacionality_...')
+
+    Returns:
+        Diccionario ordenado grupo -> posiciones de sus columnas
+    """
+    groups: "OrderedDict[str, List[int]]" = OrderedDict()
+    for i, col in enumerate(columns):
+        if '_' in col:
+            groups.setdefault(col.split('_', 1)[0], []).append(i)
+    return groups
+
+
+class FormEncoder:
+    """
+    Codificador de formularios a vectores alineados con las columnas esperadas.
+
+    Se construye una sola vez a partir de las columnas esperadas y una fila
+    plantilla con los valores por defecto. Guarda la posición de cada campo y de
+    cada categoría one-hot, de modo que codificar un formulario se reduce a copiar
+    la plantilla y escribir directamente en el arreglo.
+    """
+
+    def __init__(self, expected_columns: Sequence[str], template: np.ndarray):
+        self.columns = list(expected_columns)
+        self.template = np.asarray(template, dtype=np.float64).reshape(-1).copy()
+        if self.template.shape[0] != len(self.columns):
+            raise ValueError(f"La plantilla tiene {self.template.shape[0]} valores; se esperaban {len(self.columns)}")
+        self.template.setflags(write=False)
+
+        self.field_positions = {col: i for i, col in enumerate(self.columns)}
+        self.group_positions: Dict[str, np.ndarray] = {}
+        self.category_positions: Dict[str, Dict[str, int]] = {}
+        for group, positions in one_hot_groups(self.columns).items():
+            self.group_positions[group] = np.asarray(positions, dtype=np.intp)
+            self.category_positions[group] = {self.columns[i].split('_', 1)[1]: i for i in positions}
+
+    def categories(self, group: str) -> List[str]:
+        """Categorías de un grupo one-hot, en el orden de las columnas"""
+        return list(self.category_positions[group])
+
+    def encode(self, form_data: Dict[str, Any]) -> np.ndarray:
+        """
+        Convierte los valores de un formulario en un vector alineado
+
+        Args:
+            form_data: Campo -> valor. Las claves pueden ser columnas esperadas o
+                       nombres de grupo one-hot ('Course', 'Marital status', ...) con
+                       la categoría elegida; una categoría sin columna propia (la de
+                       referencia u 'Other') deja el grupo en cero.
+
+        Returns:
+            Vector float64 de una fila listo para predict_single o predict_fast
+        """
+        vector = self.template.copy()
+        for key, value in form_data.items():
+            categories = self.category_positions.get(key)
+            if categories is not None:
+                vector[self.group_positions[key]] = 0.0
+                position = categories.get(value)
+                if position is not None:
+                    vector[position] = 1.0
+                continue
+            position = self.field_positions.get(key)
+            if position is not None:
+                vector[position] = value
+        return vector
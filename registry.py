@@ -0,0 +1,548 @@
+"""
+Registro local de versiones del modelo.
+
+Cada versión es una carpeta con el pipeline, las columnas esperadas y sus
+metadatos; la versión activa (y la candidata en modo sombra) se indica en un
+puntero que se reemplaza de forma atómica. La app, el servicio HTTP y los
+trabajadores de la cola vigilan el puntero y cambian de modelo sin reiniciarse.
+
+    python registry.py register pipeline_final_desercion.pkl columnas_esperadas.pkl --description "Reentrenado 2026-2"
+    python registry.py list
+    python registry.py shadow <versión> --sample-rate 0.2
+    python registry.py activate <versión>
+    python registry.py rollback
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import random
+import shutil
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from artifacts import COLUMNS_FILENAME, MODEL_FILENAME, ArtifactCache
+from metrics import Histogram
+from predictor import StudentDropoutPredictor
+from risk_policy import course_labels
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGISTRY_DIR = os.environ.get("DESERCION_MODEL_REGISTRY", "model_registry")
+
+VERSIONS_DIR = "versions"
+ACTIVE_FILE = "active.json"
+METADATA_FILE = "metadata.json"
+
+# Cada cuántos segundos se revisa el puntero de la versión activa
+DEFAULT_WATCH_INTERVAL = 5.0
+
+# Fracción de los lotes puntuados que se envían al modelo candidato
+DEFAULT_SHADOW_SAMPLE_RATE = 0.1
+
+# Lotes pendientes de comparar; si la cola está llena el lote se descarta (nunca se frena la ruta principal)
+DEFAULT_SHADOW_QUEUE = 8
+
+# Máximo de filas que se copian de cada lote muestreado
+DEFAULT_SHADOW_MAX_ROWS = 10_000
+
+
+class RegistryError(Exception):
+    """Versión inexistente o registro inconsistente"""
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def _write_json(path: str, payload: Dict[str, Any]) -> None:
+    """Escribe un JSON reemplazando el archivo de forma atómica"""
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    """
+    Registro de versiones del modelo en disco.
+
+    La versión es el hash de los artefactos (el mismo que StudentDropoutPredictor
+    expone como model_version), de modo que registrar dos veces los mismos
+    archivos devuelve la misma versión.
+    """
+
+    def __init__(self, root: str = DEFAULT_REGISTRY_DIR):
+        self.root = root
+        self.versions_dir = os.path.join(root, VERSIONS_DIR)
+        self.active_path = os.path.join(root, ACTIVE_FILE)
+
+    def version_dir(self, version: str) -> str:
+        return os.path.join(self.versions_dir, version)
+
+    def artifact_paths(self, version: str) -> Tuple[str, str]:
+        """Rutas (modelo, columnas) de una versión registrada"""
+        if not self.has_version(version):
+            raise RegistryError(f"Versión no registrada: {version}")
+        directory = self.version_dir(version)
+        return os.path.join(directory, MODEL_FILENAME), os.path.join(directory, COLUMNS_FILENAME)
+
+    def has_version(self, version: str) -> bool:
+        return os.path.exists(os.path.join(self.version_dir(version), METADATA_FILE))
+
+    def register(self, model_path: str, columns_path: str, description: str = "",
+                 metadata: Optional[Dict[str, Any]] = None, activate: bool = False) -> str:
+        """
+        Copia los artefactos de un modelo al registro
+
+        Args:
+            model_path: Pipeline (.pkl)
+            columns_path: Columnas esperadas (.pkl)
+            description: Texto libre (datos de entrenamiento, métricas, ...)
+            metadata: Metadatos adicionales guardados junto a la versión
+            activate: Activar la versión al registrarla
+
+        Returns:
+            Versión registrada
+        """
+        version = ArtifactCache.source_version(model_path, columns_path)
+        if not self.has_version(version):
+            os.makedirs(self.versions_dir, exist_ok=True)
+            # Se copia en una carpeta temporal y se publica con un solo rename
+            tmp_dir = os.path.join(self.versions_dir, f".{version}.{uuid.uuid4().hex[:8]}.tmp")
+            os.makedirs(tmp_dir)
+            try:
+                shutil.copy2(model_path, os.path.join(tmp_dir, MODEL_FILENAME))
+                shutil.copy2(columns_path, os.path.join(tmp_dir, COLUMNS_FILENAME))
+                _write_json(os.path.join(tmp_dir, METADATA_FILE), {
+                    'version': version,
+                    'created_at': _now(),
+                    'description': description,
+                    'source_model_path': os.path.abspath(model_path),
+                    **(metadata or {}),
+                })
+                os.replace(tmp_dir, self.version_dir(version))
+            except OSError:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                if not self.has_version(version):
+                    raise
+        if activate:
+            self.activate(version)
+        return version
+
+    def metadata(self, version: str) -> Dict[str, Any]:
+        if not self.has_version(version):
+            raise RegistryError(f"Versión no registrada: {version}")
+        with open(os.path.join(self.version_dir(version), METADATA_FILE), encoding='utf-8') as f:
+            return json.load(f)
+
+    def list_versions(self) -> List[Dict[str, Any]]:
+        """Metadatos de todas las versiones, de la más antigua a la más reciente"""
+        if not os.path.isdir(self.versions_dir):
+            return []
+        versions = [self.metadata(name) for name in os.listdir(self.versions_dir)
+                    if not name.startswith('.') and self.has_version(name)]
+        return sorted(versions, key=lambda meta: meta.get('created_at', ''))
+
+    def pointer(self) -> Dict[str, Any]:
+        """Contenido del puntero: versión activa, anterior y candidata en sombra"""
+        if not os.path.exists(self.active_path):
+            return {}
+        with open(self.active_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def active_version(self) -> Optional[str]:
+        return self.pointer().get('version')
+
+    def activate(self, version: str) -> None:
+        """Cambia la versión activa (los procesos que vigilan el registro la cargan sin reiniciarse)"""
+        if not self.has_version(version):
+            raise RegistryError(f"Versión no registrada: {version}")
+        pointer = self.pointer()
+        if pointer.get('version') != version:
+            pointer['previous'] = pointer.get('version')
+        pointer.update({'version': version, 'activated_at': _now()})
+        # Una candidata promovida deja de ejecutarse en sombra
+        if (pointer.get('shadow') or {}).get('version') == version:
+            pointer['shadow'] = None
+        os.makedirs(self.root, exist_ok=True)
+        _write_json(self.active_path, pointer)
+
+    def rollback(self) -> str:
+        """Reactiva la versión anterior"""
+        previous = self.pointer().get('previous')
+        if not previous:
+            raise RegistryError("No hay una versión anterior a la que volver")
+        self.activate(previous)
+        return previous
+
+    def set_shadow(self, version: Optional[str], sample_rate: float = DEFAULT_SHADOW_SAMPLE_RATE) -> None:
+        """Ejecuta una versión candidata en sombra (None la desactiva)"""
+        if version is not None and not self.has_version(version):
+            raise RegistryError(f"Versión no registrada: {version}")
+        if not 0 < sample_rate <= 1:
+            raise ValueError("sample_rate debe estar en (0, 1]")
+        pointer = self.pointer()
+        pointer['shadow'] = {'version': version, 'sample_rate': sample_rate} if version else None
+        os.makedirs(self.root, exist_ok=True)
+        _write_json(self.active_path, pointer)
+
+    def load_predictor(self, version: Optional[str] = None, **predictor_kwargs: Any) -> StudentDropoutPredictor:
+        """Carga una versión (por defecto la activa) en un StudentDropoutPredictor nuevo"""
+        version = version or self.active_version()
+        if version is None:
+            raise RegistryError("El registro no tiene una versión activa")
+        model_path, columns_path = self.artifact_paths(version)
+        predictor = StudentDropoutPredictor(model_path=model_path, columns_path=columns_path, **predictor_kwargs)
+        predictor.load_model()
+        return predictor
+
+
+class ShadowScorer:
+    """
+    Puntúa en segundo plano una muestra del tráfico con un modelo candidato.
+
+    El predictor principal entrega cada lote puntuado con `observe`; una fracción
+    `sample_rate` se encola (sin bloquear: si la cola está llena el lote se
+    descarta) y un hilo lo puntúa con el candidato, acumulando las diferencias
+    de probabilidad, decisión y nivel de riesgo y la latencia de ambos modelos.
+    La latencia del candidato se mide mientras comparte CPU con el principal,
+    así que refleja el costo bajo carga real, no en aislamiento.
+    """
+
+    def __init__(self, candidate: StudentDropoutPredictor, sample_rate: float = DEFAULT_SHADOW_SAMPLE_RATE,
+                 max_pending: int = DEFAULT_SHADOW_QUEUE, max_rows: int = DEFAULT_SHADOW_MAX_ROWS,
+                 seed: Optional[int] = None):
+        self.candidate = candidate
+        self.sample_rate = sample_rate
+        self.max_rows = max_rows
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_pending)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._reset_stats()
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.candidate.model_version
+
+    def _reset_stats(self) -> None:
+        self.batches = self.rows = self.dropped = self.errors = 0
+        self.primary_version = None
+        self.sum_delta = self.sum_abs_delta = self.max_abs_delta = 0.0
+        self.decision_flips = self.risk_changes = 0
+        self.primary_latency = Histogram()
+        self.candidate_latency = Histogram()
+
+    def observe(self, primary: StudentDropoutPredictor, matrix: np.ndarray, predictions: np.ndarray,
+                probabilities: np.ndarray, seconds: float) -> None:
+        """Registra un lote puntuado por el modelo principal (llamado desde la ruta de predicción)"""
+        if self._stop.is_set() or len(matrix) == 0 or self._rng.random() >= self.sample_rate:
+            return
+        rows = slice(0, self.max_rows)
+        item = (primary.expected_columns, primary.model_version, primary.risk_policy,
+                np.array(matrix[rows]), np.array(predictions[rows]), np.array(probabilities[rows]),
+                seconds * min(len(matrix), self.max_rows) / len(matrix))
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                item = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self._compare(*item)
+            except Exception:
+                logger.exception("Error al puntuar en sombra con la versión %s", self.version)
+                with self._lock:
+                    self.errors += 1
+            finally:
+                self._queue.task_done()
+
+    def _compare(self, columns: List[str], primary_version: str, policy: Any, matrix: np.ndarray,
+                 predictions: np.ndarray, probabilities: np.ndarray, seconds: float) -> None:
+        candidate = self.candidate
+        if candidate.expected_columns != list(columns):
+            matrix = candidate.preprocess_matrix(pd.DataFrame(matrix, columns=columns))
+            columns = candidate.expected_columns
+        start = time.perf_counter()
+        candidate_predictions, candidate_probabilities = candidate._score(matrix, observe=False)
+        candidate_seconds = time.perf_counter() - start
+
+        # Ambos modelos se comparan con la política del principal
+        courses = course_labels(matrix, columns) if policy.course_thresholds else None
+        risk_changes = np.count_nonzero(policy.assign(probabilities, courses)
+                                        != policy.assign(candidate_probabilities, courses))
+        delta = np.asarray(candidate_probabilities, dtype=np.float64) - probabilities
+        with self._lock:
+            self.primary_version = primary_version
+            self.batches += 1
+            self.rows += len(delta)
+            self.sum_delta += float(delta.sum())
+            self.sum_abs_delta += float(np.abs(delta).sum())
+            self.max_abs_delta = max(self.max_abs_delta, float(np.abs(delta).max()))
+            self.decision_flips += int(np.count_nonzero(candidate_predictions != predictions))
+            self.risk_changes += int(risk_changes)
+            self.primary_latency.observe(seconds)
+            self.candidate_latency.observe(candidate_seconds)
+
+    def report(self) -> Dict[str, Any]:
+        """Resumen de la comparación: diferencias de puntuación y de latencia"""
+        with self._lock:
+            rows = max(self.rows, 1)
+            primary_mean = self.primary_latency.total / max(self.primary_latency.count, 1)
+            candidate_mean = self.candidate_latency.total / max(self.candidate_latency.count, 1)
+            return {
+                'candidate_version': self.version,
+                'primary_version': self.primary_version,
+                'sample_rate': self.sample_rate,
+                'batches': self.batches,
+                'rows': self.rows,
+                'dropped_batches': self.dropped,
+                'errors': self.errors,
+                'mean_delta': self.sum_delta / rows,
+                'mean_abs_delta': self.sum_abs_delta / rows,
+                'max_abs_delta': self.max_abs_delta,
+                'decision_flip_rate': self.decision_flips / rows,
+                'risk_change_rate': self.risk_changes / rows,
+                'primary_mean_seconds': primary_mean,
+                'candidate_mean_seconds': candidate_mean,
+                'latency_ratio': candidate_mean / primary_mean if primary_mean else 0.0,
+            }
+
+    def drain(self, timeout: float = 10.0) -> None:
+        """Espera a que se comparen los lotes pendientes"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=5.0)
+
+
+class ModelHandle:
+    """
+    Referencia intercambiable al predictor en uso.
+
+    Cada petición toma `handle.current` al empezar y lo usa hasta terminar; un
+    cambio de versión carga el predictor nuevo por completo (calentamiento y
+    ruta rápida incluidos) y solo entonces reemplaza la referencia, de modo que
+    las peticiones en curso terminan con el modelo con que empezaron. Con un
+    registro asociado, `refresh` (o el hilo de `watch`) sigue el puntero de la
+    versión activa y de la candidata en sombra.
+    """
+
+    def __init__(self, predictor: StudentDropoutPredictor, registry: Optional[ModelRegistry] = None,
+                 predictor_kwargs: Optional[Dict[str, Any]] = None):
+        self._predictor = predictor
+        self.registry = registry
+        # Opciones con que se construyen los predictores de las versiones siguientes
+        self.predictor_kwargs = dict(predictor_kwargs or {})
+        self.predictor_kwargs.pop('event_handler', None)
+        self.shadow: Optional[ShadowScorer] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    @classmethod
+    def load(cls, registry: Optional[ModelRegistry] = None, model_path: Optional[str] = None,
+             columns_path: Optional[str] = None, **predictor_kwargs: Any) -> "ModelHandle":
+        """
+        Carga el predictor inicial
+
+        Con rutas explícitas se usa ese modelo y no se sigue el registro; si no,
+        se carga la versión activa del registro o, si aún no tiene ninguna, los
+        artefactos por defecto (y se cambia de modelo en cuanto se active una).
+        """
+        if model_path or columns_path:
+            predictor = StudentDropoutPredictor(model_path=model_path, columns_path=columns_path, **predictor_kwargs)
+            predictor.load_model()
+            return cls(predictor)
+
+        registry = registry or ModelRegistry()
+        if registry.active_version():
+            predictor = registry.load_predictor(**predictor_kwargs)
+        else:
+            predictor = StudentDropoutPredictor(**predictor_kwargs)
+            predictor.load_model()
+        handle = cls(predictor, registry, predictor_kwargs)
+        handle.refresh()
+        return handle
+
+    @property
+    def current(self) -> StudentDropoutPredictor:
+        return self._predictor
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._predictor.model_version
+
+    def swap(self, predictor: StudentDropoutPredictor) -> StudentDropoutPredictor:
+        """
+        Pone en uso un predictor ya cargado y retorna el anterior
+
+        El nuevo hereda la política de riesgo, las métricas, el manejador de
+        eventos, el monitoreo de deriva y la comparación en sombra del anterior.
+        """
+        with self._lock:
+            previous = self._predictor
+            predictor.event_handler = previous.event_handler
+            predictor.risk_policy = previous.risk_policy
+            predictor.metrics = previous.metrics
+            # La deriva describe las entradas, no el modelo: se conservan los conteos si las columnas no cambian
+            if previous.drift is not None and predictor.expected_columns == previous.expected_columns:
+                predictor.drift = previous.drift
+            predictor.shadow = self.shadow if self.shadow and self.shadow.version != predictor.model_version else None
+            self._predictor = predictor
+            previous.shadow = None
+        # Los trabajadores de predict_batch_parallel tienen una copia del modelo anterior
+        previous.close_parallel()
+        logger.info("Modelo activo: %s (antes %s)", predictor.model_version, previous.model_version)
+        return previous
+
+    def refresh(self) -> bool:
+        """
+        Sincroniza el modelo activo y el de sombra con el puntero del registro
+
+        Returns:
+            True si cambió el modelo activo
+        """
+        if self.registry is None:
+            return False
+        pointer = self.registry.pointer()
+        changed = False
+        version = pointer.get('version')
+        if version and version != self.version:
+            self.swap(self.registry.load_predictor(version, **self.predictor_kwargs))
+            changed = True
+
+        shadow = pointer.get('shadow') or {}
+        shadow_version = shadow.get('version')
+        if shadow_version == self.version:
+            shadow_version = None
+        if shadow_version is None:
+            self.stop_shadow()
+        elif self.shadow is None or self.shadow.version != shadow_version:
+            self.start_shadow(shadow_version, shadow.get('sample_rate', DEFAULT_SHADOW_SAMPLE_RATE))
+        elif self.shadow.sample_rate != shadow.get('sample_rate', self.shadow.sample_rate):
+            self.shadow.sample_rate = shadow['sample_rate']
+        return changed
+
+    def start_shadow(self, version: str, sample_rate: float = DEFAULT_SHADOW_SAMPLE_RATE) -> ShadowScorer:
+        """Compara una versión candidata con el tráfico del modelo activo"""
+        if self.registry is None:
+            raise RegistryError("La comparación en sombra requiere un registro de modelos")
+        candidate = self.registry.load_predictor(version, **{**self.predictor_kwargs, 'metrics_enabled': False})
+        scorer = ShadowScorer(candidate, sample_rate)
+        with self._lock:
+            previous, self.shadow = self.shadow, scorer
+            self._predictor.shadow = scorer
+        if previous is not None:
+            previous.close()
+        return scorer
+
+    def stop_shadow(self) -> None:
+        with self._lock:
+            scorer, self.shadow = self.shadow, None
+            self._predictor.shadow = None
+        if scorer is not None:
+            scorer.close()
+
+    def shadow_report(self) -> Optional[Dict[str, Any]]:
+        return self.shadow.report() if self.shadow is not None else None
+
+    def watch(self, interval: float = DEFAULT_WATCH_INTERVAL) -> None:
+        """Revisa el registro cada `interval` segundos en un hilo en segundo plano"""
+        if self.registry is None or self._watcher is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception:
+                    # Un artefacto dañado no debe tumbar el modelo que ya está sirviendo
+                    logger.exception("No se pudo actualizar el modelo desde el registro")
+
+        self._watcher = threading.Thread(target=loop, name="model-registry-watch", daemon=True)
+        self._watcher.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5.0)
+            self._watcher = None
+        self.stop_shadow()
+
+
+def as_handle(predictor: Union[StudentDropoutPredictor, ModelHandle]) -> ModelHandle:
+    """Envuelve un predictor fijo para usarlo donde se espera un ModelHandle"""
+    return predictor if isinstance(predictor, ModelHandle) else ModelHandle(predictor)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Registro de versiones del modelo")
+    parser.add_argument('--registry', default=DEFAULT_REGISTRY_DIR, help="Carpeta del registro")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    register = commands.add_parser('register', help="Registrar un modelo")
+    register.add_argument('model_path')
+    register.add_argument('columns_path')
+    register.add_argument('--description', default="")
+    register.add_argument('--activate', action='store_true', help="Activar la versión al registrarla")
+
+    commands.add_parser('list', help="Versiones registradas")
+
+    activate = commands.add_parser('activate', help="Cambiar la versión activa")
+    activate.add_argument('version')
+
+    commands.add_parser('rollback', help="Volver a la versión anterior")
+
+    shadow = commands.add_parser('shadow', help="Ejecutar una versión candidata en sombra")
+    shadow.add_argument('version', nargs='?', default=None)
+    shadow.add_argument('--sample-rate', type=float, default=DEFAULT_SHADOW_SAMPLE_RATE)
+    shadow.add_argument('--off', action='store_true', help="Desactivar la comparación en sombra")
+
+    args = parser.parse_args(argv)
+    registry = ModelRegistry(args.registry)
+    try:
+        if args.command == 'register':
+            print(registry.register(args.model_path, args.columns_path, args.description, activate=args.activate))
+        elif args.command == 'list':
+            pointer = registry.pointer()
+            shadow_version = (pointer.get('shadow') or {}).get('version')
+            for meta in registry.list_versions():
+                mark = '*' if meta['version'] == pointer.get('version') else ('s' if meta['version'] == shadow_version else ' ')
+                print(f"{mark} {meta['version']}  {meta.get('created_at', '')}  {meta.get('description', '')}")
+        elif args.command == 'activate':
+            registry.activate(args.version)
+        elif args.command == 'rollback':
+            print(registry.rollback())
+        elif args.command == 'shadow':
+            if not args.off and args.version is None:
+                parser.error("indique una versión o --off")
+            registry.set_shadow(None if args.off else args.version, args.sample_rate)
+    except (RegistryError, ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
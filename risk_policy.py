@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from preprocessing import one_hot_groups
+
+# Archivo JSON con la política de riesgo activa; si no existe se usa la política por defecto
+DEFAULT_RISK_POLICY_PATH = os.environ.get("DESERCION_RISK_POLICY", "risk_policy.json")
+
+# Grupo one-hot cuyas categorías pueden tener cortes propios
+COURSE_GROUP = 'Course'
+
+
+class RiskBand:
+    """Nivel de riesgo de una política: nombre, presentación y recomendaciones"""
+
+    __slots__ = ('name', 'color', 'icon', 'alert', 'description', 'advice', 'recommendations')
+
+    def __init__(self, name: str, color: str = "#808080", icon: str = "⚪", alert: str = 'info',
+                 description: str = "", advice: str = "", recommendations: str = ""):
+        self.name = name
+        self.color = color
+        self.icon = icon
+        self.description = description
+        # Tipo de aviso de Streamlit con que se muestra ('success', 'info', 'warning', 'error')
+        self.alert = alert
+        # Recomendaciones breves (formulario) y detalladas (informes)
+        self.advice = advice
+        self.recommendations = recommendations
+
+    def to_dict(self) -> Dict[str, str]:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"RiskBand({self.name!r})"
+
+
+class RiskPolicy:
+    """
+    Política versionada de niveles de riesgo.
+
+    Los niveles van de menor a mayor riesgo y se separan con cortes de
+    probabilidad (un corte menos que niveles; una probabilidad igual a un corte
+    pertenece al nivel superior). Cada carrera puede tener sus propios cortes.
+    Asignar niveles es un corte vectorizado sobre probabilidades ya calculadas,
+    de modo que cambiar de política no requiere volver a ejecutar el modelo.
+    """
+
+    def __init__(self, bands: Sequence[RiskBand], thresholds: Sequence[float], name: str = 'default',
+                 version: str = '1', course_thresholds: Optional[Dict[str, Sequence[float]]] = None):
+        self.bands = list(bands)
+        self.name = name
+        self.version = str(version)
+        self.levels = np.array([band.name for band in self.bands], dtype=object)
+        self.thresholds = self._check_thresholds(thresholds, 'general')
+        self.course_thresholds = {course: self._check_thresholds(cuts, course)
+                                  for course, cuts in (course_thresholds or {}).items()}
+        self._band_index = {band.name: band for band in self.bands}
+
+        # Tabla de cortes: fila 0 = cortes generales, una fila más por carrera con cortes propios
+        self._courses = pd.Index(list(self.course_thresholds), dtype=object)
+        self._threshold_table = np.vstack([self.thresholds] + list(self.course_thresholds.values()))
+
+    def _check_thresholds(self, thresholds: Sequence[float], scope: str) -> np.ndarray:
+        cuts = np.asarray(thresholds, dtype=np.float64).reshape(-1)
+        if len(cuts) != len(self.bands) - 1:
+            raise ValueError(f"Política '{self.name}' ({scope}): se esperaban {len(self.bands) - 1} cortes "
+                             f"para {len(self.bands)} niveles, se recibieron {len(cuts)}")
+        if np.any(np.diff(cuts) <= 0) or np.any((cuts <= 0) | (cuts >= 1)):
+            raise ValueError(f"Política '{self.name}' ({scope}): los cortes deben ser crecientes y estar en (0, 1)")
+        return cuts
+
+    @property
+    def key(self) -> str:
+        """Identificador 'nombre@versión' de la política"""
+        return f"{self.name}@{self.version}"
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash del contenido: distingue dos definiciones distintas publicadas con la misma versión"""
+        return hashlib.sha256(json.dumps(self.to_dict(), sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+    @property
+    def report_order(self) -> List[str]:
+        """Niveles de mayor a menor riesgo, el orden en que se reportan"""
+        return list(self.levels[::-1])
+
+    def band(self, level: str) -> Optional[RiskBand]:
+        """Definición de un nivel, o None si no pertenece a la política"""
+        return self._band_index.get(level)
+
+    def thresholds_for(self, course: Optional[str] = None) -> np.ndarray:
+        """Cortes que aplican a una carrera (los generales si no tiene cortes propios)"""
+        return self.course_thresholds.get(course, self.thresholds)
+
+    def assign(self, probabilities: Union[np.ndarray, Sequence[float]],
+               courses: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Asigna el nivel de riesgo de cada probabilidad
+
+        Args:
+            probabilities: Probabilidades de deserción
+            courses: Carrera de cada estudiante (ver course_labels); None aplica los cortes generales
+
+        Returns:
+            Arreglo de nombres de nivel
+        """
+        probabilities = np.asarray(probabilities)
+        if courses is None or not self.course_thresholds:
+            return self.levels[np.searchsorted(self.thresholds, probabilities, side='right')]
+        # Las carreras sin cortes propios (índice -1) caen en la fila 0, la de los cortes generales
+        rows = self._courses.get_indexer(np.asarray(courses, dtype=object)) + 1
+        cuts = self._threshold_table[rows]
+        return self.levels[np.count_nonzero(probabilities[:, None] >= cuts, axis=1)]
+
+    def assign_frame(self, probabilities: Union[np.ndarray, Sequence[float]], data: pd.DataFrame) -> np.ndarray:
+        """Como assign, tomando la carrera de las columnas one-hot de `data` si la política la usa"""
+        courses = course_labels(data) if self.course_thresholds else None
+        return self.assign(probabilities, courses)
+
+    def describe(self, course: Optional[str] = None) -> pd.DataFrame:
+        """Tabla de niveles con su intervalo de probabilidad [desde, hasta)"""
+        cuts = self.thresholds_for(course)
+        return pd.DataFrame({
+            'level': self.levels,
+            'from': np.concatenate([[0.0], cuts]),
+            'to': np.concatenate([cuts, [1.0]]),
+            'icon': [band.icon for band in self.bands],
+        })
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'version': self.version,
+            'bands': [band.to_dict() for band in self.bands],
+            'thresholds': self.thresholds.tolist(),
+            'course_thresholds': {course: cuts.tolist() for course, cuts in self.course_thresholds.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, definition: Dict[str, Any]) -> "RiskPolicy":
+        bands = [RiskBand(**band) if isinstance(band, dict) else RiskBand(band) for band in definition['bands']]
+        return cls(bands, definition['thresholds'], name=definition.get('name', 'custom'),
+                   version=definition.get('version', '1'),
+                   course_thresholds=definition.get('course_thresholds'))
+
+    def __repr__(self) -> str:
+        return f"RiskPolicy({self.key!r}, levels={list(self.levels)}, thresholds={self.thresholds.tolist()})"
+
+
+def course_labels(data: Union[pd.DataFrame, np.ndarray], columns: Optional[Sequence[str]] = None,
+                  group: str = COURSE_GROUP) -> Optional[np.ndarray]:
+    """
+    Categoría activa de un grupo one-hot en cada fila
+
+    Args:
+        data: DataFrame o matriz alineada con `columns`
+        columns: Columnas de la matriz (se toman del DataFrame si no se indican)
+        group: Prefijo del grupo one-hot
+
+    Returns:
+        Arreglo de categorías (None en las filas de la categoría de referencia),
+        o None si los datos no tienen columnas del grupo
+    """
+    if columns is None:
+        columns = list(data.columns)
+    names = [col if isinstance(col, str) else '' for col in columns]
+    positions = one_hot_groups(names).get(group)
+    if not positions:
+        return None
+    if isinstance(data, pd.DataFrame):
+        block = data.iloc[:, positions].apply(pd.to_numeric, errors='coerce').to_numpy()
+    else:
+        block = data[:, positions]
+    active = block == 1
+    categories = np.asarray([names[i].split('_', 1)[1] for i in positions], dtype=object)
+    return np.where(active.any(axis=1), categories[np.argmax(active, axis=1)], None)
+
+
+DEFAULT_RISK_POLICY = RiskPolicy(
+    bands=[
+        RiskBand(
+            "Bajo", color="#00cc00", icon="🟢", alert='success', description="Seguimiento regular",
+            advice="""
+            **✅ Estudiante con Bajo Riesgo:**
+            - Continuar con el seguimiento regular
+            - Mantener canales de comunicación abiertos
+            - Reconocer el buen desempeño académico
+            """,
+            recommendations="""
+        **✅ MANTENIMIENTO Y PREVENCIÓN:**
+
+        • **Seguimiento estándar**: Reuniones mensuales de rutina
+        • **Reconocimiento**: Destacar y celebrar el buen desempeño
+        • **Desarrollo integral**: Ofrecer oportunidades de crecimiento académico
+        • **Comunicación abierta**: Mantener canales disponibles para consultas
+        • **Prevención**: Estar atento a cambios en el comportamiento académico
+        • **Mentorías**: Considerar al estudiante como mentor para otros
+        """),
+        RiskBand(
+            "Medio", color="#ffa500", icon="🟡", alert='info', description="Necesita monitoreo cercano",
+            advice="""
+            **💡 Recomendaciones para Riesgo Medio:**
+            - Monitoreo regular del rendimiento académico
+            - Facilitar acceso a recursos de apoyo
+            - Fomentar participación en actividades estudiantiles
+            """,
+            recommendations="""
+        **⚠️ MONITOREO Y APOYO PREVENTIVO:**
+
+        • **Seguimiento regular**: Reuniones quincenales con tutor académico
+        • **Identificación de factores**: Detectar causas específicas de riesgo
+        • **Apoyo académico**: Facilitar acceso a tutorías y recursos de estudio
+        • **Motivación**: Fomentar participación en actividades estudiantiles
+        • **Comunicación familiar**: Involucrar red de apoyo cuando sea apropiado
+        • **Alerta temprana**: Monitorear indicadores clave de rendimiento
+        """),
+        RiskBand(
+            "Alto", color="#ff4b4b", icon="🔴", alert='warning', description="Requiere intervención inmediata",
+            advice="""
+            **⚠️ Recomendaciones para Riesgo Alto:**
+            - Implementar seguimiento académico personalizado
+            - Considerar apoyo psicopedagógico
+            - Revisar situación financiera del estudiante
+            - Establecer tutorías académicas
+            """,
+            recommendations="""
+        **🚨 ACCIONES INMEDIATAS REQUERIDAS:**
+
+        • **Contacto urgente**: Reunión con el estudiante en máximo 48 horas
+        • **Evaluación integral**: Revisar situación académica, financiera y personal
+        • **Plan de intervención**: Crear estrategia personalizada de apoyo
+        • **Seguimiento intensivo**: Reuniones semanales hasta estabilizar la situación
+        • **Recursos especializados**: Derivar a servicios de apoyo psicopedagógico
+        • **Flexibilización académica**: Considerar opciones de cronograma modificado
+        """),
+    ],
+    thresholds=[0.3, 0.7],
+)
+
+
+def load_risk_policy(path: Optional[str] = None) -> RiskPolicy:
+    """
+    Carga una política desde un archivo JSON (ver RiskPolicy.to_dict)
+
+    Args:
+        path: Ruta del archivo; por defecto DEFAULT_RISK_POLICY_PATH
+
+    Returns:
+        La política del archivo, o DEFAULT_RISK_POLICY si no se indicó ruta y el archivo no existe
+    """
+    explicit = path is not None
+    path = path or DEFAULT_RISK_POLICY_PATH
+    if not os.path.exists(path):
+        if explicit:
+            raise FileNotFoundError(f"No se encontró la política de riesgo: {path}")
+        return DEFAULT_RISK_POLICY
+    with open(path, encoding='utf-8') as f:
+        return RiskPolicy.from_dict(json.load(f))
+
+
+def save_risk_policy(policy: RiskPolicy, path: str) -> None:
+    """Guarda una política en JSON, reemplazando el archivo de forma atómica"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(policy.to_dict(), f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,378 @@
+import io
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from cache import feature_row_hashes
+from risk_policy import RiskPolicy, course_labels
+
+DEFAULT_SCORE_STORE = os.environ.get("DESERCION_SCORE_STORE", "scores.sqlite3")
+
+# La tabla se carga en memoria cuando el lote tiene al menos 1/_TABLE_LOAD_FRACTION de sus filas
+_TABLE_LOAD_FRACTION = 4
+
+# Motivos por los que una fila se envía al modelo
+REASON_NEW = 'new'
+REASON_CHANGED = 'changed'
+REASON_MODEL = 'model_version'
+# Motivo de un cambio de nivel sin repuntuar: la política de riesgo cambió
+REASON_POLICY = 'risk_policy'
+
+_LOOKUP_COLUMNS = (('student_id', object), ('feature_hash', np.int64), ('model_version', object),
+                   ('probability', np.float64), ('prediction', np.int64), ('risk_level', object))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    student_id TEXT PRIMARY KEY,
+    feature_hash INTEGER NOT NULL,
+    model_version TEXT NOT NULL,
+    probability REAL NOT NULL,
+    prediction INTEGER NOT NULL,
+    risk_level TEXT NOT NULL,
+    scored_at TEXT NOT NULL,
+    course TEXT
+)
+"""
+
+# Generación del almacén, incrementada en cada escritura, y copia columnar de la
+# tabla de puntuaciones (npz) con la generación a la que corresponde
+_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS store_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    generation INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS score_index (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    generation INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+INSERT OR IGNORE INTO store_meta (id, generation) VALUES (0, 0);
+"""
+
+
+class RescoreResult:
+    """Resultado de una puntuación incremental, en el orden del lote de entrada"""
+
+    def __init__(self, student_ids: np.ndarray, predictions: Dict[str, np.ndarray], rescored: np.ndarray,
+                 reasons: np.ndarray, changes: pd.DataFrame):
+        self.student_ids = student_ids
+        self.predictions = predictions
+        # Máscara de filas enviadas al modelo y motivo ('' para las servidas desde el almacén)
+        self.rescored = rescored
+        self.reasons = reasons
+        # Estudiantes ya conocidos cuyo nivel de riesgo cambió
+        self.changes = changes
+
+    def counts(self) -> Dict[str, int]:
+        """Número de filas por motivo de repuntuación, más las servidas desde el almacén"""
+        return {
+            'total': int(len(self.student_ids)),
+            'new': int(np.count_nonzero(self.reasons == REASON_NEW)),
+            'changed': int(np.count_nonzero(self.reasons == REASON_CHANGED)),
+            'model_version': int(np.count_nonzero(self.reasons == REASON_MODEL)),
+            'unchanged': int(np.count_nonzero(~self.rescored)),
+            'risk_level_changes': int(len(self.changes)),
+        }
+
+
+class ScoreStore:
+    """
+    Almacén persistente (SQLite) de puntuaciones por estudiante.
+
+    Cada estudiante se guarda con el hash de su vector de características alineado
+    y la versión del modelo que lo puntuó. Al puntuar un lote nuevo solo se envían
+    al modelo los estudiantes nuevos, los que cambiaron de datos y los puntuados
+    con otra versión del modelo; el resto se sirve desde el almacén.
+
+    Para que un lote sin cambios cueste menos que repuntuarlo, los lotes grandes
+    no consultan SQLite fila a fila: la tabla se carga una vez en memoria (desde
+    una copia columnar guardada en el mismo archivo, `score_index`, o recorriendo
+    la tabla si la copia quedó desactualizada) y se mantiene al día con cada
+    escritura propia.
+    """
+
+    def __init__(self, path: str = DEFAULT_SCORE_STORE):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        # Los almacenes creados antes de las políticas por carrera no tienen la columna 'course'
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(scores)")}
+        if 'course' not in columns:
+            self._conn.execute("ALTER TABLE scores ADD COLUMN course TEXT")
+        self._conn.commit()
+        self._conn.executescript(_INDEX_SCHEMA)
+        # Copia en memoria de la tabla y PRAGMA data_version con que se leyó
+        # (cambia cuando otra conexión escribe en el archivo)
+        self._table: Optional[pd.DataFrame] = None
+        self._table_version = None
+
+    def __enter__(self) -> "ScoreStore":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def lookup(self, student_ids: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Puntuaciones guardadas de los estudiantes indicados (los ausentes no aparecen)
+
+        Returns:
+            Diccionario columna -> arreglo (student_id, feature_hash, model_version,
+            probability, prediction, risk_level)
+        """
+        return self._lookup_positions(np.asarray(student_ids, dtype=object))[1]
+
+    def _lookup_positions(self, student_ids: np.ndarray) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Puntuaciones guardadas y la posición en `student_ids` de cada una"""
+        table = self._stored_table(len(student_ids))
+        if table is None:
+            stored = self._query(student_ids)
+            return pd.Index(student_ids).get_indexer(stored['student_id']), stored
+        rows = table.index.get_indexer(student_ids)
+        positions = np.flatnonzero(rows >= 0)
+        part = table.iloc[rows[positions]]
+        stored = {'student_id': student_ids[positions],
+                  **{name: part[name].to_numpy(dtype=dtype) for name, dtype in _LOOKUP_COLUMNS[1:]}}
+        return positions, stored
+
+    def _query(self, student_ids: np.ndarray) -> Dict[str, np.ndarray]:
+        """Consulta directa a SQLite, para lotes pequeños frente al almacén"""
+        # Los identificadores viajan como un único parámetro JSON en lugar de una consulta por estudiante
+        rows = self._conn.execute(
+            "SELECT student_id, feature_hash, model_version, probability, prediction, risk_level "
+            "FROM scores WHERE student_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(student_ids.tolist()),)).fetchall()
+        return _columns_from_rows(rows)
+
+    def _stored_table(self, batch_rows: int) -> Optional[pd.DataFrame]:
+        """
+        Copia en memoria de la tabla, indexada por identificador
+
+        Solo compensa si el lote es una parte apreciable del almacén; en otro caso
+        retorna None y el lote se consulta directamente.
+        """
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if self._table is not None and data_version == self._table_version:
+            return self._table
+        self._table = None
+        if batch_rows * _TABLE_LOAD_FRACTION < len(self):
+            return None
+        generation = self._generation()
+        snapshot = self._conn.execute("SELECT generation, data FROM score_index").fetchone()
+        if snapshot is not None and snapshot[0] == generation:
+            self._table = _table_from_snapshot(snapshot[1])
+        else:
+            rows = self._conn.execute(
+                "SELECT student_id, feature_hash, model_version, probability, prediction, risk_level "
+                "FROM scores").fetchall()
+            self._table = _table_from_columns(_columns_from_rows(rows))
+        self._table_version = data_version
+        return self._table
+
+    def _discard_stale_table(self) -> None:
+        """Descarta la copia en memoria si otra conexión escribió desde que se cargó"""
+        if self._table is not None and \
+                self._conn.execute("PRAGMA data_version").fetchone()[0] != self._table_version:
+            self._table = None
+
+    def _generation(self) -> int:
+        return self._conn.execute("SELECT generation FROM store_meta").fetchone()[0]
+
+    def score(self, predictor: Any, data: pd.DataFrame, id_column: str = 'student_id') -> RescoreResult:
+        """
+        Puntúa un lote repuntuando solo lo necesario y actualiza el almacén
+
+        Args:
+            predictor: StudentDropoutPredictor con el modelo cargado
+            data: Lote con una fila por estudiante
+            id_column: Columna con el identificador del estudiante
+
+        Returns:
+            RescoreResult con las predicciones de todo el lote y el informe de cambios
+        """
+        if id_column not in data.columns:
+            raise ValueError(f"Falta la columna de identificador: {id_column}")
+        student_ids = data[id_column].astype(str).to_numpy(dtype=object)
+        if len(pd.unique(student_ids)) != len(student_ids):
+            raise ValueError(f"La columna '{id_column}' tiene identificadores duplicados")
+
+        matrix = predictor.preprocess_matrix(data)
+        hashes = feature_row_hashes(matrix)
+        courses = course_labels(matrix, predictor.expected_columns)
+        n = len(student_ids)
+
+        # Alinear lo guardado con el orden del lote (sin pasar por float: los hashes son de 64 bits)
+        positions, stored = self._lookup_positions(student_ids)
+        known = np.zeros(n, dtype=bool)
+        known[positions] = True
+        stored_hashes = np.zeros(n, dtype=np.int64)
+        stored_hashes[positions] = stored['feature_hash']
+        stored_versions = np.full(n, None, dtype=object)
+        stored_versions[positions] = stored['model_version']
+
+        reasons = np.full(n, '', dtype=object)
+        reasons[~known] = REASON_NEW
+        reasons[known & (stored_hashes != hashes)] = REASON_CHANGED
+        reasons[known & (stored_hashes == hashes) & (stored_versions != predictor.model_version)] = REASON_MODEL
+        rescored = reasons != ''
+
+        probabilities = np.full(n, np.nan, dtype=np.float32)
+        probabilities[positions] = stored['probability']
+        labels = np.zeros(n, dtype=np.int64)
+        labels[positions] = stored['prediction']
+        risk_levels = np.full(n, None, dtype=object)
+        risk_levels[positions] = stored['risk_level']
+        previous_risk = risk_levels.copy()
+        previous_probability = probabilities.copy()
+
+        if rescored.any():
+            fresh = predictor.predict_matrix(matrix[rescored])
+            probabilities[rescored] = fresh['probabilities']
+            labels[rescored] = fresh['predictions']
+
+        # Las filas servidas desde el almacén se reclasifican con la política activa (sin ejecutar el modelo)
+        risk_levels = predictor.risk_policy.assign(probabilities, courses)
+        relabeled = ~rescored & (previous_risk != risk_levels)
+
+        if rescored.any() or relabeled.any():
+            with self._conn:
+                self._upsert(student_ids[rescored], hashes[rescored], predictor.model_version,
+                             probabilities[rescored], labels[rescored], risk_levels[rescored],
+                             courses[rescored] if courses is not None else None)
+                self._update_risk_levels(student_ids[relabeled], risk_levels[relabeled])
+                self._save_snapshot()
+
+        changed_risk = known & (previous_risk != risk_levels)
+        changes = pd.DataFrame({
+            'student_id': student_ids[changed_risk],
+            'previous_risk_level': previous_risk[changed_risk],
+            'risk_level': risk_levels[changed_risk],
+            'previous_probability': previous_probability[changed_risk],
+            'probability': probabilities[changed_risk],
+            'reason': np.where(relabeled, REASON_POLICY, reasons)[changed_risk],
+        })
+
+        predictions = {
+            'predictions': labels,
+            'probabilities': probabilities,
+            'risk_levels': risk_levels,
+        }
+        return RescoreResult(student_ids, predictions, rescored, reasons, changes)
+
+    def rebucket(self, policy: RiskPolicy) -> int:
+        """
+        Reclasifica todo el almacén con otra política a partir de las probabilidades guardadas
+
+        Args:
+            policy: Política de riesgo a aplicar (los cortes por carrera usan la carrera guardada)
+
+        Returns:
+            Número de estudiantes cuyo nivel de riesgo cambió
+        """
+        rows = self._conn.execute("SELECT student_id, probability, course, risk_level FROM scores").fetchall()
+        if not rows:
+            return 0
+        student_ids, probabilities, courses, previous = (np.array(values, dtype=object) for values in zip(*rows))
+        risk_levels = policy.assign(probabilities.astype(np.float64), courses)
+        changed = previous != risk_levels
+        if changed.any():
+            self._discard_stale_table()
+            with self._conn:
+                self._update_risk_levels(student_ids[changed], risk_levels[changed])
+                self._save_snapshot()
+        return int(np.count_nonzero(changed))
+
+    # Las escrituras se hacen dentro de la transacción del llamador, que termina con _save_snapshot.
+    # Las escrituras propias no cambian data_version: la copia en memoria se actualiza aquí mismo
+
+    def _update_risk_levels(self, student_ids: np.ndarray, risk_levels: np.ndarray) -> None:
+        if not len(student_ids):
+            return
+        self._conn.executemany("UPDATE scores SET risk_level = ? WHERE student_id = ?",
+                               zip(risk_levels.tolist(), student_ids.tolist()))
+        self._conn.execute("UPDATE store_meta SET generation = generation + 1")
+        if self._table is not None:
+            self._table.loc[student_ids, 'risk_level'] = risk_levels
+
+    def _upsert(self, student_ids: np.ndarray, hashes: np.ndarray, model_version: str,
+                probabilities: np.ndarray, labels: np.ndarray, risk_levels: np.ndarray,
+                courses: Optional[np.ndarray] = None) -> None:
+        if not len(student_ids):
+            return
+        scored_at = datetime.now().isoformat(timespec='seconds')
+        if courses is None:
+            courses = np.full(len(student_ids), None, dtype=object)
+        rows = zip(student_ids.tolist(), hashes.tolist(), [model_version] * len(student_ids),
+                   probabilities.astype(np.float64).tolist(), labels.tolist(), risk_levels.tolist(),
+                   [scored_at] * len(student_ids), courses.tolist())
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO scores (student_id, feature_hash, model_version, probability, "
+            "prediction, risk_level, scored_at, course) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self._conn.execute("UPDATE store_meta SET generation = generation + 1")
+        if self._table is not None:
+            updates = _table_from_columns({
+                'student_id': student_ids,
+                'feature_hash': hashes,
+                'model_version': np.full(len(student_ids), model_version, dtype=object),
+                'probability': probabilities,
+                'prediction': labels,
+                'risk_level': risk_levels,
+            })
+            known = updates.index.isin(self._table.index)
+            self._table.loc[updates.index[known]] = updates[known]
+            self._table = pd.concat([self._table, updates[~known]])
+
+    def _save_snapshot(self) -> None:
+        """Guarda la copia en memoria como índice columnar de la generación actual"""
+        self._discard_stale_table()
+        if self._table is None:
+            return
+        self._conn.execute("INSERT OR REPLACE INTO score_index (id, generation, data) VALUES (0, ?, ?)",
+                           (self._generation(), _table_to_snapshot(self._table)))
+
+
+def _columns_from_rows(rows: Sequence[Tuple[Any, ...]]) -> Dict[str, np.ndarray]:
+    columns = list(zip(*rows)) or [()] * len(_LOOKUP_COLUMNS)
+    return {name: np.array(values, dtype=dtype) for (name, dtype), values in zip(_LOOKUP_COLUMNS, columns)}
+
+
+def _table_from_columns(columns: Dict[str, np.ndarray]) -> pd.DataFrame:
+    return pd.DataFrame({name: np.asarray(columns[name], dtype=dtype) for name, dtype in _LOOKUP_COLUMNS[1:]},
+                        index=pd.Index(np.asarray(columns['student_id'], dtype=object), name='student_id'))
+
+
+def _table_to_snapshot(table: pd.DataFrame) -> bytes:
+    """Serializa la tabla en npz sin objetos de Python (los textos repetidos como códigos)"""
+    versions, version_values = pd.factorize(table['model_version'])
+    levels, level_values = pd.factorize(table['risk_level'])
+    buffer = io.BytesIO()
+    np.savez(buffer, student_id=table.index.to_numpy().astype(str),
+             feature_hash=table['feature_hash'].to_numpy(), probability=table['probability'].to_numpy(),
+             prediction=table['prediction'].to_numpy(),
+             model_version=versions, model_version_values=np.asarray(version_values, dtype=str),
+             risk_level=levels, risk_level_values=np.asarray(level_values, dtype=str))
+    return buffer.getvalue()
+
+
+def _table_from_snapshot(data: bytes) -> pd.DataFrame:
+    with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+        return _table_from_columns({
+            'student_id': arrays['student_id'].astype(object),
+            'feature_hash': arrays['feature_hash'],
+            'model_version': arrays['model_version_values'].astype(object)[arrays['model_version']],
+            'probability': arrays['probability'],
+            'prediction': arrays['prediction'],
+            'risk_level': arrays['risk_level_values'].astype(object)[arrays['risk_level']],
+        })
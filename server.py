@@ -0,0 +1,326 @@
+"""
+Servicio HTTP de puntuación sin interfaz gráfica.
+
+Expone el StudentDropoutPredictor sobre HTTP/1.1 usando solo asyncio:
+
+    GET  /health          Estado del servicio
+    GET  /metrics         Métricas en formato de texto de Prometheus
+    POST /predict         Un estudiante (objeto JSON columna -> valor)
+    POST /predict/batch   Varios estudiantes (lista JSON o {"students": [...]})
+
+Las peticiones individuales concurrentes se agrupan en micro-lotes que se
+puntúan con una sola llamada vectorizada al modelo. Sin --model-path se sirve la
+versión activa del registro de modelos, y un cambio de versión se aplica sin
+reiniciar el servicio.
+
+Uso:
+    python server.py --host 0.0.0.0 --port 8000 --max-batch-size 64 --max-wait-ms 5
+"""
+import argparse
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from predictor import StudentDropoutPredictor
+from registry import DEFAULT_REGISTRY_DIR, DEFAULT_WATCH_INTERVAL, ModelHandle, ModelRegistry, as_handle
+
+# Tamaño máximo aceptado para el cuerpo de una petición (bytes)
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class PlainText(str):
+    """Respuesta que se envía como texto plano en lugar de JSON"""
+
+
+class HTTPError(Exception):
+    """Error que se traduce directamente en una respuesta HTTP"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def format_predictions(predictions: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Convierte el resultado vectorizado de predict_batch en una lista de objetos JSON"""
+    return [
+        {'prediction': int(pred), 'probability': float(prob), 'risk_level': str(level)}
+        for pred, prob, level in zip(predictions['predictions'],
+                                     predictions['probabilities'],
+                                     predictions['risk_levels'])
+    ]
+
+
+class MicroBatcher:
+    """
+    Agrupa peticiones individuales concurrentes en micro-lotes.
+
+    Un lote se envía al modelo cuando alcanza `max_batch_size` estudiantes o cuando
+    han pasado `max_wait_ms` milisegundos desde que llegó su primera petición.
+    """
+
+    def __init__(self, predictor: Union[StudentDropoutPredictor, ModelHandle], max_batch_size: int = 64,
+                 max_wait_ms: float = 5.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size debe ser al menos 1")
+        self.handle = as_handle(predictor)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "asyncio.Queue[Tuple[Dict[str, Any], asyncio.Future]]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def predictor(self) -> StudentDropoutPredictor:
+        # Cada micro-lote toma el modelo activo en el momento de puntuarse
+        return self.handle.current
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Encola un estudiante y espera su predicción"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((record, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Dict[str, Any], asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            records = [record for record, _ in batch]
+            try:
+                # El modelo se ejecuta fuera del bucle de eventos para no bloquear otras conexiones
+                predictions = await loop.run_in_executor(None, score_records, self.predictor, records)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, format_predictions(predictions)):
+                if not future.done():
+                    future.set_result(result)
+
+
+def score_records(predictor: StudentDropoutPredictor, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Puntúa una lista de registros con una sola llamada vectorizada al modelo
+
+    Pasa por predict_batch, de modo que el tráfico HTTP queda en sus métricas y
+    las columnas ausentes se avisan igual que en el resto de entradas.
+    """
+    # pd.DataFrame conserva una fila por registro aunque alguno venga vacío ({}),
+    # así cada petición del micro-lote recibe su resultado
+    return predictor.predict_batch(pd.DataFrame(records))
+
+
+class ScoringServer:
+    """Servidor HTTP/1.1 mínimo con conexiones persistentes sobre asyncio"""
+
+    def __init__(self, predictor: Union[StudentDropoutPredictor, ModelHandle], host: str = "127.0.0.1",
+                 port: int = 8000, max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self.handle = as_handle(predictor)
+        self.host = host
+        self.port = port
+        self.batcher = MicroBatcher(self.handle, max_batch_size, max_wait_ms)
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    @property
+    def predictor(self) -> StudentDropoutPredictor:
+        return self.handle.current
+
+    async def start(self) -> None:
+        self.batcher.start()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.stop()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    await self._send(writer, e.status, {'error': str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                try:
+                    status, payload = 200, await self._dispatch(method, path, body)
+                except HTTPError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except Exception as e:
+                    status, payload = 500, {'error': f"Error en la predicción: {str(e)}"}
+
+                await self._send(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise HTTPError(400, "Línea de petición inválida")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length', 0) or 0)
+        except ValueError:
+            raise HTTPError(400, "Cabecera Content-Length inválida")
+        if length < 0:
+            raise HTTPError(400, "Cabecera Content-Length inválida")
+        if length > MAX_BODY_SIZE:
+            raise HTTPError(413, "El cuerpo de la petición es demasiado grande")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target.split('?', 1)[0], headers, body
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Any:
+        if path == '/health':
+            if method != 'GET':
+                raise HTTPError(405, "Método no permitido")
+            predictor = self.predictor
+            return {'status': 'ok', 'model_loaded': predictor.is_loaded, 'model_version': predictor.model_version}
+
+        if path == '/metrics':
+            if method != 'GET':
+                raise HTTPError(405, "Método no permitido")
+            return PlainText(self.predictor.metrics_text())
+
+        if path == '/predict':
+            if method != 'POST':
+                raise HTTPError(405, "Método no permitido")
+            record = self._parse_json(body)
+            if not isinstance(record, dict):
+                raise HTTPError(400, "Se esperaba un objeto JSON con los datos del estudiante")
+            return await self.batcher.submit(record)
+
+        if path == '/predict/batch':
+            if method != 'POST':
+                raise HTTPError(405, "Método no permitido")
+            payload = self._parse_json(body)
+            records = payload.get('students') if isinstance(payload, dict) else payload
+            if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+                raise HTTPError(400, "Se esperaba una lista JSON de estudiantes")
+            if not records:
+                return {'results': []}
+            loop = asyncio.get_running_loop()
+            predictions = await loop.run_in_executor(None, score_records, self.predictor, records)
+            return {'results': format_predictions(predictions)}
+
+        raise HTTPError(404, f"Ruta no encontrada: {path}")
+
+    @staticmethod
+    def _parse_json(body: bytes) -> Any:
+        try:
+            return json.loads(body or b'null')
+        except ValueError as e:
+            raise HTTPError(400, f"JSON inválido: {str(e)}")
+
+    @staticmethod
+    async def _send(writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool) -> None:
+        if isinstance(payload, PlainText):
+            body, content_type = payload.encode('utf-8'), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body, content_type = json.dumps(payload, ensure_ascii=False).encode('utf-8'), "application/json; charset=utf-8"
+        head = (
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n"
+        ).encode('latin-1')
+        writer.write(head + body)
+        await writer.drain()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Servicio HTTP de predicción de deserción estudiantil")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-batch-size', type=int, default=64,
+                        help="Máximo de estudiantes por micro-lote")
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help="Espera máxima para completar un micro-lote (ms)")
+    parser.add_argument('--no-metrics', action='store_true',
+                        help="Desactivar la instrumentación por etapa")
+    parser.add_argument('--model-path', default=None, help="Ruta del pipeline (.pkl)")
+    parser.add_argument('--columns-path', default=None, help="Ruta de las columnas esperadas (.pkl)")
+    parser.add_argument('--registry', default=DEFAULT_REGISTRY_DIR,
+                        help="Registro de modelos a seguir cuando no se indican rutas")
+    parser.add_argument('--watch-interval', type=float, default=DEFAULT_WATCH_INTERVAL,
+                        help="Cada cuántos segundos se revisa la versión activa del registro")
+    args = parser.parse_args(argv)
+
+    handle = ModelHandle.load(ModelRegistry(args.registry), model_path=args.model_path,
+                              columns_path=args.columns_path, metrics_enabled=not args.no_metrics)
+    handle.watch(args.watch_interval)
+
+    server = ScoringServer(handle, args.host, args.port, args.max_batch_size, args.max_wait_ms)
+    print(f"Servicio de predicción escuchando en http://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
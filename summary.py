@@ -0,0 +1,213 @@
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from preprocessing import PreprocessingPlan, one_hot_groups
+from risk_policy import DEFAULT_RISK_POLICY
+
+# Grupos one-hot desglosados por defecto en los resúmenes
+DEFAULT_SUMMARY_GROUPS = ('Course', 'Application mode', 'Nacionality')
+
+# Orden en que se reportan los niveles de riesgo (de mayor a menor, según la política por defecto)
+SUMMARY_RISK_LEVELS = tuple(DEFAULT_RISK_POLICY.report_order)
+
+DEFAULT_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+# Número de intervalos del histograma de probabilidades; el error de los cuantiles es <= 1 / bins
+DEFAULT_PROBABILITY_BINS = 1000
+
+
+class SummaryAccumulator:
+    """
+    Acumulador incremental y combinable de estadísticas de predicción.
+
+    Se actualiza bloque a bloque (por ejemplo, con los resultados de predict_stream)
+    y dos acumuladores construidos con los mismos grupos pueden combinarse con
+    merge(), de modo que cada worker resume su fragmento y el proceso principal
+    une los parciales. Los cuantiles de probabilidad se estiman con un histograma
+    de intervalos fijos sobre [0, 1] y el desglose por grupo one-hot se obtiene con
+    un único producto matricial por bloque.
+    """
+
+    def __init__(self, group_columns: Sequence[str] = (), risk_levels: Sequence[str] = SUMMARY_RISK_LEVELS,
+                 bins: int = DEFAULT_PROBABILITY_BINS):
+        self.group_columns = list(group_columns)
+        self.risk_levels = tuple(risk_levels)
+        self.bins = bins
+        self.groups = one_hot_groups(self.group_columns)
+
+        self.total = 0
+        self.dropouts = 0
+        self.probability_sum = 0.0
+        self.probability_min = np.inf
+        self.probability_max = -np.inf
+        self.risk_counts = np.zeros(len(self.risk_levels), dtype=np.int64)
+        self.histogram = np.zeros(bins, dtype=np.int64)
+        # Por columna one-hot: [estudiantes, deserciones, suma de probabilidades, conteo por nivel...]
+        self.group_totals = np.zeros((len(self.group_columns), 3 + len(self.risk_levels)), dtype=np.float64)
+        self._plan = PreprocessingPlan(self.group_columns, dtype=np.float64) if self.group_columns else None
+
+    @classmethod
+    def for_columns(cls, columns: Sequence[str], groups: Optional[Sequence[str]] = DEFAULT_SUMMARY_GROUPS,
+                    expected_columns: Optional[Sequence[str]] = None, **kwargs: Any) -> "SummaryAccumulator":
+        """
+        Crea un acumulador que desglosa los grupos one-hot presentes en `columns`
+
+        Los grupos se toman de las columnas esperadas por el modelo, no de cualquier
+        encabezado con '_' (un 'student_id' no es un grupo one-hot).
+
+        Args:
+            columns: Columnas de los datos
+            groups: Prefijos de los grupos a desglosar; None desglosa todos los grupos
+                de expected_columns
+            expected_columns: Columnas esperadas por el modelo; sin ellas se toma `columns`
+                como esquema, lo que exige indicar `groups`
+
+        Returns:
+            Acumulador vacío
+        """
+        if expected_columns is None:
+            if groups is None:
+                raise ValueError("Indique expected_columns para desglosar todos los grupos one-hot")
+            expected_columns = columns
+        expected_columns = list(expected_columns)
+        present = set(columns)
+        selected = [expected_columns[i] for group, positions in one_hot_groups(expected_columns).items()
+                    if groups is None or group in groups
+                    for i in positions if expected_columns[i] in present]
+        return cls(selected, **kwargs)
+
+    def update(self, data: Optional[pd.DataFrame], predictions: Dict[str, Any]) -> "SummaryAccumulator":
+        """
+        Incorpora un bloque de predicciones
+
+        Args:
+            data: Bloque de datos de entrada (necesario solo para el desglose por grupo)
+            predictions: Predicciones del bloque (predictions, probabilities, risk_levels)
+
+        Returns:
+            El propio acumulador, para encadenar llamadas
+        """
+        labels = np.asarray(predictions['predictions'])
+        probabilities = np.asarray(predictions['probabilities'], dtype=np.float64)
+        levels = np.asarray(predictions['risk_levels'])
+        n = len(labels)
+        # total_students sale de las predicciones: un bloque de datos de otro tamaño es un error del llamador
+        if data is not None and len(data) != n:
+            raise ValueError(f"El bloque tiene {len(data)} filas y {n} predicciones")
+        if n == 0:
+            return self
+
+        dropout_mask = labels == 1
+        risk_onehot = np.stack([levels == level for level in self.risk_levels], axis=1)
+
+        self.total += n
+        self.dropouts += int(np.count_nonzero(dropout_mask))
+        self.probability_sum += float(probabilities.sum())
+        self.probability_min = min(self.probability_min, float(probabilities.min()))
+        self.probability_max = max(self.probability_max, float(probabilities.max()))
+        self.risk_counts += risk_onehot.sum(axis=0)
+
+        bin_index = np.clip((probabilities * self.bins).astype(np.intp), 0, self.bins - 1)
+        self.histogram += np.bincount(bin_index, minlength=self.bins)
+
+        if self._plan is not None and data is not None:
+            indicators = self._plan.transform(data)
+            per_row = np.empty((n, self.group_totals.shape[1]), dtype=np.float64)
+            per_row[:, 0] = 1.0
+            per_row[:, 1] = dropout_mask
+            per_row[:, 2] = probabilities
+            per_row[:, 3:] = risk_onehot
+            self.group_totals += indicators.T @ per_row
+
+        return self
+
+    def merge(self, other: "SummaryAccumulator") -> "SummaryAccumulator":
+        """Combina en este acumulador los totales de otro construido con los mismos grupos"""
+        if (other.group_columns != self.group_columns or other.bins != self.bins
+                or other.risk_levels != self.risk_levels):
+            raise ValueError("Solo pueden combinarse acumuladores con los mismos grupos, niveles e intervalos")
+        self.total += other.total
+        self.dropouts += other.dropouts
+        self.probability_sum += other.probability_sum
+        self.probability_min = min(self.probability_min, other.probability_min)
+        self.probability_max = max(self.probability_max, other.probability_max)
+        self.risk_counts += other.risk_counts
+        self.histogram += other.histogram
+        self.group_totals += other.group_totals
+        return self
+
+    def quantiles(self, qs: Sequence[float] = DEFAULT_QUANTILES) -> Dict[str, float]:
+        """Cuantiles aproximados de la probabilidad (interpolación lineal dentro de cada intervalo)"""
+        if self.total == 0:
+            return {_quantile_name(q): 0.0 for q in qs}
+        cumulative = np.cumsum(self.histogram)
+        targets = np.asarray(qs, dtype=np.float64) * self.total
+        positions = np.searchsorted(cumulative, targets, side='left').clip(0, self.bins - 1)
+        before = np.where(positions > 0, cumulative[positions - 1], 0)
+        in_bin = self.histogram[positions]
+        fraction = np.divide(targets - before, in_bin, out=np.zeros_like(targets), where=in_bin > 0)
+        values = (positions + fraction) / self.bins
+        values = values.clip(self.probability_min, self.probability_max)
+        return {_quantile_name(q): float(v) for q, v in zip(qs, values)}
+
+    def group_frame(self, group: str) -> pd.DataFrame:
+        """Desglose de un grupo one-hot como DataFrame (una fila por categoría)"""
+        positions = self.groups[group]
+        totals = self.group_totals[positions]
+        students = totals[:, 0]
+        frame = pd.DataFrame({
+            'categoria': [self.group_columns[i].split('_', 1)[1] for i in positions],
+            'total_students': students.astype(np.int64),
+            'predicted_dropouts': totals[:, 1].astype(np.int64),
+            'dropout_rate': np.divide(totals[:, 1], students, out=np.zeros_like(students), where=students > 0),
+            'avg_dropout_probability': np.divide(totals[:, 2], students, out=np.zeros_like(students),
+                                                 where=students > 0),
+        })
+        for j, level in enumerate(self.risk_levels):
+            frame[f'riesgo_{level}'] = totals[:, 3 + j].astype(np.int64)
+        return frame
+
+    def result(self, qs: Sequence[float] = DEFAULT_QUANTILES) -> Dict[str, Any]:
+        """
+        Resumen con el formato de get_summary_statistics más cuantiles y desglose por grupo
+
+        Returns:
+            Diccionario con estadísticas; 'groups' mapea grupo -> categoría -> estadísticas
+        """
+        total = self.total
+        return {
+            'total_students': total,
+            'predicted_dropouts': self.dropouts,
+            'predicted_continuers': total - self.dropouts,
+            'avg_dropout_probability': self.probability_sum / total if total > 0 else 0.0,
+            'risk_distribution': {level: int(count) for level, count in zip(self.risk_levels, self.risk_counts)},
+            'dropout_rate': self.dropouts / total if total > 0 else 0,
+            'probability_quantiles': self.quantiles(qs),
+            'groups': {group: self.group_frame(group).set_index('categoria').to_dict(orient='index')
+                       for group in self.groups},
+        }
+
+
+def _quantile_name(q: float) -> str:
+    return f"p{q * 100:g}"
+
+
+def summarize_stream(results: Iterable[Tuple[pd.DataFrame, Dict[str, Any]]], columns: Sequence[str],
+                     groups: Optional[Sequence[str]] = DEFAULT_SUMMARY_GROUPS) -> SummaryAccumulator:
+    """
+    Resume los resultados de predict_stream sin materializar la cohorte
+
+    Args:
+        results: Iterable de tuplas (bloque, predicciones del bloque)
+        columns: Columnas esperadas por el modelo
+        groups: Prefijos de los grupos one-hot a desglosar
+
+    Returns:
+        Acumulador con todos los bloques incorporados
+    """
+    accumulator = SummaryAccumulator.for_columns(list(columns), groups, expected_columns=columns)
+    for chunk, predictions in results:
+        accumulator.update(chunk, predictions)
+    return accumulator
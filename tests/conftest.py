@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# Los módulos del proyecto están en la raíz del repositorio
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='session')
+def predictor():
+    """Predictor con los artefactos del repositorio, sin caché en disco y con métricas"""
+    pytest.importorskip('xgboost')
+    from predictor import StudentDropoutPredictor
+    model = StudentDropoutPredictor(cache_dir=None, metrics_enabled=True)
+    model.load_model()
+    return model
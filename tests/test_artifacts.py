@@ -0,0 +1,82 @@
+import json
+import os
+import threading
+
+import pytest
+
+from artifacts import (COLUMNS_FILENAME, MANIFEST_FILE, MODEL_FILENAME, ArtifactCache,
+                       resolve_artifact_path, resolve_cache_dir)
+
+MODEL_PATH = resolve_artifact_path(MODEL_FILENAME)
+COLUMNS_PATH = resolve_artifact_path(COLUMNS_FILENAME)
+
+
+def test_relative_cache_dir_is_resolved_next_to_the_model(tmp_path):
+    model_path = str(tmp_path / 'modelo' / MODEL_FILENAME)
+    assert resolve_cache_dir('.model_cache', model_path) == str(tmp_path / 'modelo' / '.model_cache')
+    assert resolve_cache_dir(str(tmp_path / 'cache'), model_path) == str(tmp_path / 'cache')
+
+
+def test_concurrent_builds_publish_one_valid_entry(tmp_path):
+    pytest.importorskip('xgboost')
+    cache = ArtifactCache(str(tmp_path))
+    errors = []
+
+    def build():
+        try:
+            cache.build(MODEL_PATH, COLUMNS_PATH)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=build) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    version = ArtifactCache.source_version(MODEL_PATH, COLUMNS_PATH)
+    assert cache.is_valid(version)
+    # Solo queda la entrada publicada: ni carpetas de preparación ni entradas apartadas
+    assert os.listdir(str(tmp_path)) == [version]
+
+
+def test_invalid_entry_is_replaced(tmp_path):
+    pytest.importorskip('xgboost')
+    cache = ArtifactCache(str(tmp_path))
+    version = cache.build(MODEL_PATH, COLUMNS_PATH)
+    manifest_path = os.path.join(cache.entry_dir(version), MANIFEST_FILE)
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    manifest['format_version'] = -1
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    assert not cache.is_valid(version)
+
+    cache.build(MODEL_PATH, COLUMNS_PATH)
+    assert cache.is_valid(version)
+    assert os.listdir(str(tmp_path)) == [version]
+
+
+def test_cached_model_matches_the_original_pickle(tmp_path, monkeypatch):
+    pytest.importorskip('xgboost')
+    import numpy as np
+    import pandas as pd
+
+    import artifacts
+    from artifacts import load_pickle_artifact
+
+    cache = ArtifactCache(str(tmp_path))
+    model, columns, version = cache.load(MODEL_PATH, COLUMNS_PATH)
+    assert version == ArtifactCache.source_version(MODEL_PATH, COLUMNS_PATH)
+
+    original = load_pickle_artifact(MODEL_PATH)
+    frame = pd.DataFrame(np.random.default_rng(0).uniform(0, 200, (500, len(columns))), columns=columns)
+    np.testing.assert_array_equal(model.predict_proba(frame), original.predict_proba(frame))
+
+    # Con las fuentes sin cambios la siguiente carga no recalcula ningún hash
+    def fail(path, block_size=1 << 20):
+        raise AssertionError(f"hash recalculado: {path}")
+
+    monkeypatch.setattr(artifacts, 'file_sha256', fail)
+    assert cache.load(MODEL_PATH, COLUMNS_PATH)[2] == version
@@ -0,0 +1,84 @@
+import numpy as np
+
+from cache import PredictionCache, feature_vector_key
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'a' pasa a ser la más reciente
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    stats = cache.stats()
+    assert (stats['size'], stats['evictions'], stats['hits'], stats['misses']) == (2, 1, 3, 1)
+
+
+def test_entries_expire_after_the_ttl():
+    clock = _Clock()
+    cache = PredictionCache(max_size=10, ttl_seconds=10.0, clock=clock)
+    cache.put('a', 1)
+    clock.now = 10.0
+    assert cache.get('a') == 1
+    clock.now = 10.5
+    assert cache.get('a') is None
+    assert len(cache) == 0
+    # Guardarla de nuevo reinicia su caducidad
+    cache.put('a', 2)
+    clock.now = 20.0
+    assert cache.get('a') == 2
+
+
+def test_changing_the_model_version_empties_the_cache():
+    cache = PredictionCache(max_size=10)
+    cache.bind_version('v1')
+    cache.put('a', 1)
+    cache.bind_version('v1')
+    assert cache.get('a') == 1
+    cache.bind_version('v2')
+    assert len(cache) == 0 and cache.get('a') is None
+    assert cache.model_version == 'v2'
+
+
+def test_zero_size_disables_the_cache():
+    cache = PredictionCache(max_size=0)
+    cache.put('a', 1)
+    assert not cache.enabled and cache.get('a') is None and len(cache) == 0
+
+
+def test_feature_vector_key_treats_negative_zero_as_zero():
+    assert feature_vector_key(np.array([0.0, 1.0])) == feature_vector_key(np.array([-0.0, 1]))
+    assert feature_vector_key(np.array([0.0, 1.0])) != feature_vector_key(np.array([1.0, 0.0]))
+
+
+def test_predict_single_is_served_from_the_cache_until_the_version_changes(predictor):
+    cache = predictor.prediction_cache
+    assert cache.model_version == predictor.model_version
+    vector = predictor.default_feature_vector()
+    vector[0] = 7.0  # un estudiante que el calentamiento no dejó en la caché
+
+    hits = cache.hits
+    first = predictor.predict_single(vector)
+    first['risk_level'] = 'modificado'
+    second = predictor.predict_single(vector)
+    assert cache.hits == hits + 1
+    # Cada llamada recibe su propia copia del resultado
+    assert second['risk_level'] != 'modificado'
+
+    try:
+        cache.bind_version('otra-version')
+        assert len(cache) == 0
+    finally:
+        cache.bind_version(predictor.model_version)
+    assert predictor.predict_single(vector) == second
+    assert cache.hits == hits + 1
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+from drift import DRIFT_STABLE, DriftMonitor, DriftReference
+from preprocessing import PreprocessingPlan
+
+EXPECTED_COLUMNS = ['Admission grade', 'Age at enrollment', 'Course_Nursing', 'Course_Management']
+
+
+def _cohort(n, seed):
+    rng = np.random.default_rng(seed)
+    course = rng.integers(0, 3, size=n)
+    return pd.DataFrame({
+        'Admission grade': rng.uniform(100.0, 180.0, size=n),
+        'Age at enrollment': rng.integers(17, 40, size=n).astype(float),
+        'Course_Nursing': (course == 0).astype(float),
+        'Course_Management': (course == 1).astype(float),
+    })
+
+
+def test_missing_values_are_counted_apart_from_the_histograms():
+    plan = PreprocessingPlan(EXPECTED_COLUMNS)
+    reference = DriftReference.from_matrix(plan.transform(_cohort(20_000, 0)), EXPECTED_COLUMNS)
+    monitor = DriftMonitor(reference, sample_rows=None)
+
+    batch = _cohort(20_000, 1)
+    batch.loc[::2, 'Admission grade'] = np.nan
+    batch = batch.drop(columns=['Course_Management'])
+    matrix, missing = plan.transform(batch, return_missing=True)
+    # La matriz puntuada lleva el relleno con 0; la máscara conserva qué faltaba
+    assert not np.isnan(matrix).any()
+    monitor.update(matrix, missing)
+
+    report = monitor.report().set_index('feature')
+    assert report.loc['Admission grade', 'status'] == DRIFT_STABLE
+    assert report.loc['Admission grade', 'missing_rate'] == 0.5
+    assert report.loc['Admission grade', 'current_mean'] > 100.0
+    assert report.loc['Age at enrollment', 'missing_rate'] == 0.0
+    # Sin la columna Course_Management solo se conocen las filas con Course_Nursing activa
+    assert report.loc['Course', 'missing_rate'] > 0.6
+    assert monitor.summary()['missing']['Admission grade'] == 0.5
+
+
+def test_reference_profile_excludes_nan():
+    plan = PreprocessingPlan(EXPECTED_COLUMNS)
+    cohort = _cohort(1_000, 0)
+    cohort.loc[:99, 'Admission grade'] = np.nan
+    reference = DriftReference.from_matrix(plan.transform(cohort, fill_missing=False), EXPECTED_COLUMNS)
+
+    assert reference.missing['Admission grade'] == 0.1
+    assert np.isclose(reference.proportions['Admission grade'].sum(), 1.0)
+    assert reference.means['Admission grade'] > 100.0
+    assert DriftReference.from_dict(reference.to_dict()).missing == reference.missing
+
+
+def _brute_force_counts(reference, matrix, missing):
+    """Conteos columna a columna y grupo a grupo, sin submuestreo"""
+    absent = np.isnan(matrix) | missing
+    counts = {}
+    for position, name in zip(reference.numeric_positions, reference.numeric_columns):
+        values = matrix[~absent[:, position], position]
+        bins = np.searchsorted(reference.edges[name], values, side='right')
+        counts[name] = np.bincount(bins, minlength=len(reference.edges[name]) + 1).astype(float)
+    for group, positions in reference.groups.items():
+        active = matrix[:, positions] == 1
+        known = active.any(axis=1) | ~absent[:, positions].any(axis=1)
+        counts[group] = np.append(active.sum(axis=0), np.count_nonzero(known & ~active.any(axis=1))).astype(float)
+    return counts
+
+
+def test_vectorized_counts_match_a_per_column_count():
+    plan = PreprocessingPlan(EXPECTED_COLUMNS)
+    reference = DriftReference.from_matrix(plan.transform(_cohort(5_000, 0)), EXPECTED_COLUMNS)
+    batch = _cohort(3_000, 1)
+    batch.loc[::7, 'Age at enrollment'] = np.nan
+    batch.loc[::11, 'Course_Nursing'] = np.nan
+    batch.loc[5, 'Admission grade'] = reference.edges['Admission grade'][2]  # justo en un corte
+    matrix, missing = plan.transform(batch, return_missing=True)
+
+    monitor = DriftMonitor(reference, sample_rows=None)
+    monitor.update(matrix, missing)
+    expected = _brute_force_counts(reference, matrix, missing)
+    counts = monitor.counts()
+    assert counts.keys() == expected.keys()
+    for name in expected:
+        assert np.array_equal(counts[name], expected[name]), name
+
+
+def test_small_batches_are_buffered_and_counted_like_one_batch():
+    plan = PreprocessingPlan(EXPECTED_COLUMNS)
+    reference = DriftReference.from_matrix(plan.transform(_cohort(5_000, 0)), EXPECTED_COLUMNS)
+    batch = _cohort(600, 2)
+    batch.loc[::9, 'Admission grade'] = np.nan
+    matrix, missing = plan.transform(batch, return_missing=True)
+
+    together = DriftMonitor(reference, sample_rows=None)
+    together.update(matrix, missing)
+    one_by_one = DriftMonitor(reference, sample_rows=None, buffer_rows=256)
+    for i in range(len(matrix)):
+        # Las filas sin ausentes pueden llegar sin máscara
+        one_by_one.update(matrix[i:i + 1], missing[i:i + 1] if missing[i].any() else None)
+    # Parte de las filas sigue en el búfer hasta que se leen los conteos
+    assert one_by_one._pending_rows > 0
+    assert one_by_one.rows == len(matrix) and one_by_one.batches == len(matrix)
+
+    expected = together.counts()
+    for name, counts in one_by_one.counts().items():
+        assert np.array_equal(counts, expected[name]), name
+    assert one_by_one.missing_rates() == together.missing_rates()
+    pd.testing.assert_frame_equal(one_by_one.report(), together.report())
+
+
+def test_background_counts_match_the_synchronous_counts():
+    plan = PreprocessingPlan(EXPECTED_COLUMNS)
+    reference = DriftReference.from_matrix(plan.transform(_cohort(5_000, 0)), EXPECTED_COLUMNS)
+    batch = _cohort(4_000, 3)
+    batch.loc[::5, 'Age at enrollment'] = np.nan
+    matrix, missing = plan.transform(batch, return_missing=True)
+
+    synchronous = DriftMonitor(reference, sample_rows=500)
+    # Con una cola de un lote parte de los lotes se cuenta en el hilo que llama
+    background = DriftMonitor(reference, sample_rows=500, background=True, max_pending=1)
+    for start in range(0, len(matrix), 700):
+        for monitor in (synchronous, background):
+            chunk = matrix[start:start + 700].copy()
+            monitor.update(chunk, missing[start:start + 700])
+            # El hilo cuenta su propia copia: el llamador puede reutilizar la matriz
+            chunk[:] = 0
+    for i in range(10):
+        for monitor in (synchronous, background):
+            monitor.update(matrix[i:i + 1], missing[i:i + 1])
+
+    pd.testing.assert_frame_equal(background.report(), synchronous.report())
+    assert background.rows == synchronous.rows == len(matrix) + 10
+    background.close()
+    background.update(matrix[:1000], missing[:1000])
+    synchronous.update(matrix[:1000], missing[:1000])
+    pd.testing.assert_frame_equal(background.report(), synchronous.report())
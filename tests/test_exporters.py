@@ -0,0 +1,64 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from exporters import export_to_bytes, iter_scored_chunks, iter_source_scored_chunks
+
+
+def _scored_frame(rows: int = 7):
+    data = pd.DataFrame({'student_id': np.arange(rows), 'Age at enrollment': np.arange(rows) + 18.0})
+    probabilities = np.linspace(0.05, 0.95, rows)
+    predictions = {
+        'predictions': (probabilities >= 0.5).astype(int),
+        'probabilities': probabilities,
+        'risk_levels': np.where(probabilities >= 0.5, 'Alto', 'Bajo'),
+    }
+    return data, predictions
+
+
+def test_export_to_bytes_csv_round_trip():
+    data, predictions = _scored_frame()
+    content = export_to_bytes(iter_scored_chunks(data, predictions, chunksize=3), 'csv', ['student_id'])
+    assert isinstance(content, bytes)
+    exported = pd.read_csv(io.BytesIO(content))
+    assert list(exported['student_id']) == list(data['student_id'])
+    np.testing.assert_allclose(exported['Probabilidad_Desercion'], predictions['probabilities'])
+
+
+def test_export_to_bytes_is_accepted_by_download_button():
+    download_data_util = pytest.importorskip('streamlit.runtime.download_data_util')
+    data, predictions = _scored_frame()
+    content = export_to_bytes(iter_scored_chunks(data, predictions), 'csv')
+    converted, _ = download_data_util.convert_data_to_bytes_and_infer_mime(
+        content, unsupported_error=RuntimeError("tipo no soportado"))
+    assert converted == content
+
+
+def test_export_to_bytes_parquet():
+    pytest.importorskip('pyarrow')
+    data, predictions = _scored_frame()
+    content = export_to_bytes(iter_scored_chunks(data, predictions, chunksize=2), 'parquet')
+    exported = pd.read_parquet(io.BytesIO(content))
+    assert len(exported) == len(data)
+
+
+def test_source_scored_chunks_export_original_values():
+    data, predictions = _scored_frame(5)
+    data['Age at enrollment'] = ['19', '', 'abc', '21', '22']
+    source = data.to_csv(index=False).encode()
+    chunks = pd.read_csv(io.BytesIO(source), chunksize=2)
+    exported = pd.read_csv(io.BytesIO(export_to_bytes(iter_source_scored_chunks(chunks, predictions), 'csv')),
+                           dtype={'Age at enrollment': object})
+    ages = exported['Age at enrollment']
+    assert ages.isna().tolist() == [False, True, False, False, False]
+    assert ages[2] == 'abc'
+    assert pd.to_numeric(ages, errors='coerce')[[0, 3, 4]].tolist() == [19, 21, 22]
+    np.testing.assert_allclose(exported['Probabilidad_Desercion'], predictions['probabilities'])
+
+
+def test_source_scored_chunks_reject_row_mismatch():
+    data, predictions = _scored_frame(5)
+    with pytest.raises(ValueError):
+        list(iter_source_scored_chunks([data.iloc[:3]], predictions))
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fastpath import CompiledPipeline, parity_sample, verify_parity
+
+
+@pytest.fixture(scope='module')
+def compiled(predictor):
+    return CompiledPipeline.from_pipeline(predictor.model, predictor.expected_columns)
+
+
+def _reference(predictor, matrix):
+    # El pipeline original sobre datos float64, como los que producía preprocess_data
+    frame = pd.DataFrame(np.asarray(matrix, dtype=np.float64), columns=list(predictor.expected_columns))
+    assert (frame.dtypes == np.float64).all()
+    return predictor.model.predict_proba(frame)[:, 1]
+
+
+def _edge_rows(columns):
+    n = len(columns)
+    numeric = np.array(['_' not in col for col in columns])
+    rows = [np.zeros(n), np.ones(n), np.full(n, np.nan)]
+    # Un solo valor ausente por columna numérica, sobre una fila de unos
+    for j in np.flatnonzero(numeric):
+        row = np.ones(n)
+        row[j] = np.nan
+        rows.append(row)
+    # Valores fuera del rango de entrenamiento
+    for value in (-1e6, -1.0, 250.0, 1e6, 3.4e38):
+        row = np.zeros(n)
+        row[numeric] = value
+        rows.append(row)
+    return np.asarray(rows, dtype=np.float64)
+
+
+def test_parity_sample_is_bitwise_equal(predictor, compiled):
+    sample = parity_sample(predictor.expected_columns)
+    assert sample.dtype == np.float64
+    fast = compiled.predict_proba(sample)
+    assert np.array_equal(fast, _reference(predictor, sample))
+    assert verify_parity(predictor.model, compiled, sample, predictor.expected_columns)['bitwise_equal']
+
+
+def test_edge_rows_are_bitwise_equal(predictor, compiled):
+    edges = _edge_rows(predictor.expected_columns)
+    fast = compiled.predict_proba(edges)
+    assert np.array_equal(fast, _reference(predictor, edges))
+
+
+def test_single_rows_match_the_batch(predictor, compiled):
+    edges = _edge_rows(predictor.expected_columns)
+    batch = compiled.predict_proba(edges)
+    single = np.concatenate([compiled.predict_proba(row) for row in edges])
+    assert np.array_equal(single, batch)
+
+
+def test_load_time_check_keeps_the_fast_path(predictor):
+    assert predictor.fast_path is not None
+    assert predictor.fast_path_parity['bitwise_equal']
+
+
+def test_small_batches_match_the_float64_pipeline(predictor):
+    # Hasta FAST_PATH_MAX_ROWS filas, predict_batch usa la ruta compilada
+    sample = parity_sample(predictor.expected_columns, n_rows=200, seed=3)
+    result = predictor.predict_batch(pd.DataFrame(sample, columns=predictor.expected_columns))
+    assert np.array_equal(result['probabilities'], _reference(predictor, sample))
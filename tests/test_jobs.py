@@ -0,0 +1,113 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import jobs
+from benchmark import generate_synthetic_cohort
+from jobs import STATUS_CANCELLED, STATUS_COMPLETED, STATUS_RUNNING, JobQueue, run_job
+
+
+class _RecordingPredictor:
+    """Delega en el predictor real, anota el tamaño de cada bloque y puede simular un fallo del proceso"""
+
+    def __init__(self, predictor, crash_after=None, on_chunk=None):
+        self.predictor = predictor
+        self.model_version = predictor.model_version
+        self.crash_after = crash_after
+        self.on_chunk = on_chunk
+        self.chunks = []
+
+    def predict_batch(self, chunk):
+        if self.crash_after is not None and len(self.chunks) == self.crash_after:
+            # run_job solo captura Exception: el trabajo queda en ejecución, como al morir el proceso
+            raise KeyboardInterrupt
+        self.chunks.append(len(chunk))
+        if self.on_chunk is not None:
+            self.on_chunk(len(self.chunks))
+        return self.predictor.predict_batch(chunk)
+
+
+def _submit(predictor, tmp_path, n_rows=50, chunksize=7):
+    queue = JobQueue(str(tmp_path / "jobs"))
+    data = generate_synthetic_cohort(predictor.expected_columns, n_rows, seed=5)
+    data.insert(0, 'student_id', np.arange(n_rows))
+    return queue, queue.submit(data, chunksize=chunksize)
+
+
+def _assert_matches_predict_batch(predictor, queue, job_id):
+    job = queue.poll(job_id)
+    expected = predictor.predict_batch(pd.read_csv(job.source))
+    results = queue.result(job_id)
+    for key in expected:
+        assert np.array_equal(results[key], expected[key]), key
+    chunks = [chunk for chunk, _ in queue.iter_results(job_id)]
+    assert np.array_equal(np.concatenate([chunk['student_id'] for chunk in chunks]), np.arange(job.total_rows))
+
+
+def test_job_is_scored_in_order_and_matches_predict_batch(predictor, tmp_path):
+    queue, job_id = _submit(predictor, tmp_path)
+    job = queue.claim(os.getpid())
+    assert job.job_id == job_id and job.status == STATUS_RUNNING and job.total_rows == 50
+
+    scorer = _RecordingPredictor(predictor)
+    assert run_job(queue, scorer, job) == STATUS_COMPLETED
+    assert scorer.chunks == [7] * 7 + [1]
+    job = queue.poll(job_id)
+    assert (job.rows_done, job.chunks_done, job.progress) == (50, 8, 1.0)
+    assert queue.claim(os.getpid()) is None
+    _assert_matches_predict_batch(predictor, queue, job_id)
+
+
+def test_job_resumes_from_the_last_checkpoint_after_a_crash(predictor, tmp_path, monkeypatch):
+    queue, job_id = _submit(predictor, tmp_path)
+    with pytest.raises(KeyboardInterrupt):
+        run_job(queue, _RecordingPredictor(predictor, crash_after=3), queue.claim(os.getpid()))
+    job = queue.poll(job_id)
+    assert job.status == STATUS_RUNNING and job.rows_done == 21
+
+    # Sin latido reciente el trabajo se considera abandonado y otro trabajador lo retoma
+    monkeypatch.setattr(jobs, 'HEARTBEAT_TIMEOUT', -1.0)
+    job = queue.claim(os.getpid())
+    assert job.job_id == job_id and job.rows_done == 21
+    scorer = _RecordingPredictor(predictor)
+    assert run_job(queue, scorer, job) == STATUS_COMPLETED
+    # Solo se puntúan las filas que faltaban
+    assert sum(scorer.chunks) == 29
+    _assert_matches_predict_batch(predictor, queue, job_id)
+
+
+def test_cancel_stops_a_running_job_after_the_current_chunk(predictor, tmp_path):
+    queue, job_id = _submit(predictor, tmp_path)
+    job = queue.claim(os.getpid())
+
+    def cancel_on_third_chunk(chunks_seen):
+        if chunks_seen == 3:
+            assert queue.cancel(job_id)
+
+    scorer = _RecordingPredictor(predictor, on_chunk=cancel_on_third_chunk)
+    assert run_job(queue, scorer, job) == STATUS_CANCELLED
+    job = queue.poll(job_id)
+    assert job.status == STATUS_CANCELLED and job.rows_done == 21 and len(scorer.chunks) == 3
+    assert not queue.cancel(job_id)
+    with pytest.raises(ValueError):
+        queue.result(job_id)
+
+
+def test_claim_takes_over_only_jobs_with_a_stale_heartbeat(predictor, tmp_path, monkeypatch):
+    queue, job_id = _submit(predictor, tmp_path)
+    first = queue.claim(os.getpid())
+    queue.checkpoint(job_id, 0, predictor.predict_batch(pd.read_csv(first.source, nrows=7)))
+    # El trabajador sigue vivo y con latido reciente: nadie más toma el trabajo
+    assert queue.claim(os.getpid()) is None
+
+    monkeypatch.setattr(jobs, 'HEARTBEAT_TIMEOUT', -1.0)
+    taken = queue.claim(os.getpid() + 1)
+    assert taken.job_id == job_id and taken.worker_pid == os.getpid() + 1 and taken.rows_done == 7
+    assert taken.started_at == first.started_at
+
+    # Un trabajo abandonado con cancelación pendiente se cancela en lugar de reanudarse
+    assert queue.cancel(job_id)
+    assert queue.claim(os.getpid()) is None
+    assert queue.poll(job_id).status == STATUS_CANCELLED
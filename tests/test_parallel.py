@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+from drift import DriftMonitor, DriftReference
+from fastpath import parity_sample
+from parallel import csv_byte_ranges, csv_is_line_delimited
+
+
+def test_parallel_batch_reuses_pool_and_keeps_state_in_parent(predictor):
+    data = pd.DataFrame(parity_sample(predictor.expected_columns, n_rows=8_000),
+                        columns=predictor.expected_columns)
+    try:
+        first = predictor.predict_batch_parallel(data, n_workers=2)
+        scorer = predictor._parallel_scorer
+        executor = scorer._executor
+        second = predictor.predict_batch_parallel(data, n_workers=2)
+        # El mismo pool atiende ambas llamadas
+        assert predictor._parallel_scorer is scorer
+        assert scorer._executor is executor
+    finally:
+        predictor.close_parallel()
+    assert predictor._parallel_scorer is None
+
+    expected = predictor.predict_batch(data)
+    for result in (first, second):
+        assert np.array_equal(result['probabilities'], expected['probabilities'])
+        assert np.array_equal(result['risk_levels'], expected['risk_levels'])
+
+    # Las métricas se registran en el proceso padre
+    metrics = predictor.get_model_info()['metrics']
+    assert metrics['calls']['predict_batch_parallel']['rows'] >= 2 * len(data)
+    assert metrics['stages']['score_parallel']['rows'] >= 2 * len(data)
+
+
+def test_csv_byte_ranges_split_on_row_boundaries(tmp_path):
+    path = tmp_path / 'cohorte.csv'
+    pd.DataFrame({'a': np.arange(1_000), 'b': np.arange(1_000) * 0.5}).to_csv(path, index=False)
+    assert csv_is_line_delimited(str(path))
+
+    header, ranges = csv_byte_ranges(str(path), 7)
+    raw = path.read_bytes()
+    assert header == raw[:len(header)]
+    assert b''.join(raw[start:stop] for start, stop in ranges) == raw[len(header):]
+    assert all(raw[start - 1:start] == b'\n' for start, _ in ranges)
+
+
+def test_parallel_csv_is_parsed_by_workers_and_drift_counted_in_parent(predictor, tmp_path):
+    columns = predictor.expected_columns
+    data = pd.DataFrame(parity_sample(columns, n_rows=9_000, seed=3), columns=columns)
+    data.iloc[::50, 5] = np.nan
+    path = tmp_path / 'cohorte.csv'
+    data.to_csv(path, index=False)
+
+    matrix, missing = predictor.preprocessing_plan.transform(pd.read_csv(path), return_missing=True)
+    reference = DriftReference.from_matrix(matrix, columns, missing=missing)
+    previous = predictor.drift
+    try:
+        predictor.drift = DriftMonitor(reference, sample_rows=None)
+        result = predictor.predict_batch_parallel(str(path), n_workers=2)
+        parallel_counts = predictor.drift.counts()
+        parallel_missing = predictor.drift.missing_rates()
+    finally:
+        predictor.close_parallel()
+        predictor.drift = previous
+
+    expected = predictor.predict_batch(pd.read_csv(path))
+    assert np.array_equal(result['probabilities'], expected['probabilities'])
+    assert np.array_equal(result['predictions'], expected['predictions'])
+    assert np.array_equal(result['risk_levels'], expected['risk_levels'])
+
+    single = DriftMonitor(reference, sample_rows=None)
+    single.update(matrix, missing)
+    for name, counts in single.counts().items():
+        assert np.array_equal(parallel_counts[name], counts), name
+    assert parallel_missing == single.missing_rates()
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+
+def _baseline_preprocess(data, expected_columns):
+    """preprocess_data de la versión original: pandas en float64, columna a columna"""
+    processed = data.copy()
+    for col in expected_columns:
+        if col not in processed.columns:
+            processed[col] = 0
+    processed = processed[expected_columns]
+    for col in processed.columns:
+        processed[col] = pd.to_numeric(processed[col], errors='coerce')
+    return processed.fillna(0)
+
+
+def synthetic_cohort(expected_columns, n_rows, seed=0):
+    """Cohorte con decimales, ausentes, texto y valores fuera de rango"""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for col in expected_columns:
+        if '_' in col:
+            data[col] = rng.integers(0, 2, size=n_rows)
+        else:
+            data[col] = np.round(rng.uniform(-5.0, 200.0, size=n_rows), rng.integers(0, 3))
+    frame = pd.DataFrame(data)
+    numeric = [col for col in expected_columns if '_' not in col]
+    frame.loc[::17, numeric[0]] = np.nan
+    frame[numeric[1]] = frame[numeric[1]].astype(object)
+    frame.loc[::23, numeric[1]] = 'n/a'
+    return frame.drop(columns=[numeric[2]]).assign(student_id=np.arange(n_rows))
+
+
+def test_predict_batch_matches_the_float64_baseline(predictor):
+    data = synthetic_cohort(predictor.expected_columns, 20_000)
+    baseline = _baseline_preprocess(data, predictor.expected_columns)
+    expected = predictor.model.predict_proba(baseline)[:, 1]
+
+    result = predictor.predict_batch(data)
+    assert np.array_equal(result['probabilities'], expected)
+    assert np.array_equal(result['predictions'], predictor.model.predict(baseline))
+
+
+def test_explain_compact_matches_explain_batch(predictor):
+    data = synthetic_cohort(predictor.expected_columns, 300, seed=1)
+    batch = predictor.compact_batch(data)
+
+    explanations = predictor.explain_compact(batch, chunksize=128)
+    expected = predictor.explain_batch(data)
+    assert explanations.method == expected.method
+    assert np.array_equal(explanations.values, expected.values)
+    assert np.array_equal(explanations.bias, expected.bias)
+
+
+def test_batch_matrix_is_reused_for_compaction_and_validation(predictor):
+    data = synthetic_cohort(predictor.expected_columns, 500, seed=2)
+    data.iloc[::40, 3] = 250.0  # fuera de rango
+
+    result = predictor.predict_batch(data, return_matrix=True, check_columns=False)
+    matrix, missing = result.pop('matrix'), result.pop('missing')
+    expected = predictor.predict_batch(data)
+    for key in expected:
+        assert np.array_equal(result[key], expected[key])
+
+    compact = predictor.compact_batch(data, matrix)
+    assert np.array_equal(compact.to_dense(), predictor.compact_batch(data).to_dense())
+
+    report = predictor.validate_data(data, matrix, missing)
+    reference = predictor.validate_data(data)
+    assert np.array_equal(report.masks, reference.masks)
+    assert np.array_equal(report.counts, reference.counts)
+    assert report.missing_columns == reference.missing_columns
+    assert report.counts.any()
+
+
+def test_predict_stream_matches_predict_batch(predictor, tmp_path):
+    path = tmp_path / "cohorte.csv"
+    synthetic_cohort(predictor.expected_columns, 100, seed=3).to_csv(path, index=False)
+
+    chunks, predictions = zip(*predictor.predict_stream(path, chunksize=7))
+    assert [len(chunk) for chunk in chunks] == [7] * 14 + [2]
+    assert np.array_equal(np.concatenate([chunk['student_id'] for chunk in chunks]), np.arange(100))
+
+    expected = predictor.predict_batch(pd.read_csv(path))
+    for key in expected:
+        streamed = np.concatenate([chunk_predictions[key] for chunk_predictions in predictions])
+        assert np.array_equal(streamed, expected[key]), key
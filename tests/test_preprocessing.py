@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from preprocessing import FormEncoder
+
+# Un formulario de la app, con los grupos one-hot indicados por su categoría
+FORM = {
+    'Application order': 2, 'Admission grade': 131.5, 'Previous qualification (grade)': 140.0,
+    'Curricular units 2nd sem (grade)': 11.3, 'Curricular units 1st sem (evaluations)': 7,
+    'Curricular units 2nd sem (evaluations)': 5, 'Age at enrollment': 24, 'Gender': 1,
+    'Daytime/evening attendance': 1, 'Scholarship holder': 0, 'Tuition fees up to date': 1,
+    'Displaced': 0, 'Debtor': 0, 'Unemployment rate': 10.8, 'Inflation rate': 1.4, 'GDP': 1.74,
+    'Marital status': 'Divorced', "Mother's qualification": 'Postgraduate',
+    "Father's qualification": 'Other_or_Unknown', "Mother's occupation": 'Special Cases',
+    "Father's occupation": 'Professionals', 'Nacionality': 'Other', 'Application mode': 'Admisión Especial',
+    'Previous qualification': 'Other', 'Course': 'Business & Management',
+}
+
+
+def _baseline_default_student_data(expected_columns):
+    """create_default_student_data de la versión original"""
+    default_values = {}
+    for col in expected_columns:
+        if 'grade' in col.lower() or 'qualification' in col.lower():
+            default_values[col] = 0.0
+        elif 'age' in col.lower():
+            default_values[col] = 20
+        elif 'order' in col.lower():
+            default_values[col] = 1
+        else:
+            default_values[col] = 0
+    return pd.DataFrame([default_values])
+
+
+def _baseline_form_row(expected_columns, form):
+    """Ruta original del formulario: fila por defecto y cada categoría escrita como columna 0/1"""
+    groups = {col.split('_', 1)[0] for col in expected_columns if '_' in col}
+    student_data = _baseline_default_student_data(expected_columns)
+    for key, value in form.items():
+        if key in groups:
+            for col in expected_columns:
+                if col.startswith(f"{key}_"):
+                    student_data[col] = int(col == f"{key}_{value}")
+        elif key in student_data.columns:
+            student_data[key] = value
+    return student_data
+
+
+@pytest.mark.parametrize('course', ['Business & Management', 'Health Sciences'])
+def test_form_encoder_matches_the_original_form_path(predictor, course):
+    form = {**FORM, 'Course': course}
+    encoder = predictor.create_form_encoder()
+    vector = encoder.encode(form)
+    baseline = _baseline_form_row(predictor.expected_columns, form)
+
+    assert np.array_equal(vector, baseline[predictor.expected_columns].to_numpy(dtype=np.float64)[0])
+    assert predictor.predict_single(vector) == predictor.predict_single(baseline)
+    # 'Other' no tiene columna propia: el grupo queda en cero
+    assert not vector[encoder.group_positions['Nacionality']].any()
+
+
+def test_default_vector_differs_from_the_original_only_in_one_hot_columns(predictor):
+    # Antes 'Course_Business & Management' valía 20 porque 'management' contiene 'age';
+    # ahora toda columna one-hot vale 0 por defecto (el formulario siempre fija el curso)
+    baseline = _baseline_default_student_data(predictor.expected_columns)
+    baseline = baseline[predictor.expected_columns].to_numpy(dtype=np.float64)[0]
+    changed = [col for col, new, old in zip(predictor.expected_columns, predictor.default_feature_vector(), baseline)
+               if new != old]
+    assert changed == ['Course_Business & Management']
+
+
+def test_encoder_template_is_not_modified():
+    encoder = FormEncoder(['Age at enrollment', 'Course_A', 'Course_B'], np.array([20.0, 0.0, 0.0]))
+    assert np.array_equal(encoder.encode({'Course': 'B', 'Age at enrollment': 30}), [30.0, 0.0, 1.0])
+    assert np.array_equal(encoder.encode({}), [20.0, 0.0, 0.0])
+    with pytest.raises(ValueError):
+        FormEncoder(['Age at enrollment'], np.array([20.0, 0.0]))
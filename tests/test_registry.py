@@ -0,0 +1,148 @@
+import pickle
+import random
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from artifacts import COLUMNS_FILENAME, MODEL_FILENAME, resolve_artifact_path
+from benchmark import generate_synthetic_cohort
+from registry import ModelHandle, ModelRegistry, RegistryError, ShadowScorer
+
+
+@pytest.fixture
+def registry(tmp_path):
+    """Registro temporal con dos versiones: los mismos artefactos, con las columnas serializadas de otra forma"""
+    pytest.importorskip('xgboost')
+    model_path, columns_path = resolve_artifact_path(MODEL_FILENAME), resolve_artifact_path(COLUMNS_FILENAME)
+    with open(columns_path, 'rb') as f:
+        columns = pickle.load(f)
+    other_columns_path = tmp_path / "columnas_protocolo_2.pkl"
+    with open(other_columns_path, 'wb') as f:
+        pickle.dump(columns, f, protocol=2)
+
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    first = registry.register(model_path, columns_path, description="original")
+    second = registry.register(model_path, str(other_columns_path), description="copia")
+    assert first != second
+    return registry, first, second
+
+
+def _handle(registry):
+    return ModelHandle.load(registry, cache_dir=None)
+
+
+def test_swap_keeps_in_flight_requests_on_the_old_predictor(registry):
+    registry, first, second = registry
+    registry.activate(first)
+    handle = _handle(registry)
+    data = generate_synthetic_cohort(handle.current.expected_columns, 200, seed=3)
+    expected = handle.current.predict_batch(data)['probabilities']
+
+    # Una petición toma el predictor al empezar y termina con él aunque cambie la versión a mitad
+    started, swapped = threading.Event(), threading.Event()
+    results = {}
+
+    def request():
+        predictor = handle.current
+        started.set()
+        swapped.wait(timeout=30)
+        results['version'] = predictor.model_version
+        results['probabilities'] = predictor.predict_batch(data)['probabilities']
+
+    thread = threading.Thread(target=request)
+    thread.start()
+    started.wait(timeout=30)
+    previous = handle.current
+    registry.activate(second)
+    assert handle.refresh()
+    swapped.set()
+    thread.join(timeout=30)
+
+    assert handle.version == second and handle.current is not previous
+    assert results['version'] == first
+    assert np.array_equal(results['probabilities'], expected)
+    # El nuevo predictor hereda las métricas y la política del anterior
+    assert handle.current.metrics is previous.metrics
+    assert handle.current.risk_policy is previous.risk_policy
+    assert not handle.refresh()
+    handle.close()
+
+
+def test_rollback_reactivates_the_previous_version(registry):
+    registry, first, second = registry
+    with pytest.raises(RegistryError):
+        registry.rollback()
+    registry.activate(first)
+    registry.activate(second)
+    handle = _handle(registry)
+    assert handle.version == second
+
+    assert registry.rollback() == first
+    assert registry.pointer()['previous'] == second
+    assert handle.refresh() and handle.version == first
+    handle.close()
+
+
+def test_shadow_scores_a_sample_of_the_batches(registry):
+    registry, first, second = registry
+    registry.activate(first)
+    registry.set_shadow(second, sample_rate=0.5)
+    handle = _handle(registry)
+    assert handle.shadow is not None and handle.shadow.version == second
+    handle.shadow._rng = random.Random(0)
+
+    data = generate_synthetic_cohort(handle.current.expected_columns, 30, seed=4)
+    for _ in range(20):
+        handle.current.predict_batch(data)
+    handle.shadow.drain()
+
+    sampler = random.Random(0)
+    sampled = sum(sampler.random() < 0.5 for _ in range(20))
+    report = handle.shadow_report()
+    assert 0 < sampled < 20
+    assert report['batches'] == sampled and report['rows'] == 30 * sampled
+    assert report['primary_version'] == first and report['candidate_version'] == second
+    # Mismo modelo en ambas versiones: ninguna diferencia
+    assert report['max_abs_delta'] == 0.0 and report['decision_flip_rate'] == 0.0
+    assert report['dropped_batches'] == 0 and report['errors'] == 0
+
+    # Al promover la candidata deja de ejecutarse en sombra
+    registry.activate(second)
+    assert handle.refresh() and handle.shadow is None and handle.current.shadow is None
+    handle.close()
+
+
+def test_full_shadow_queue_drops_batches_without_blocking(registry):
+    registry, first, second = registry
+    primary = registry.load_predictor(first, cache_dir=None)
+    candidate = registry.load_predictor(second, cache_dir=None)
+    # El candidato se queda puntuando el primer lote hasta que el test lo libere
+    comparing, release = threading.Event(), threading.Event()
+    score = candidate._score
+
+    def slow_score(matrix, observe=True):
+        comparing.set()
+        release.wait(timeout=30)
+        return score(matrix, observe=observe)
+
+    candidate._score = slow_score
+    shadow = ShadowScorer(candidate, sample_rate=1.0, max_pending=1)
+    matrix = primary.preprocess_matrix(generate_synthetic_cohort(primary.expected_columns, 10, seed=5))
+    predictions, probabilities = primary._score(matrix, observe=False)
+
+    shadow.observe(primary, matrix, predictions, probabilities, 0.001)
+    assert comparing.wait(timeout=30)
+    start = time.perf_counter()
+    for _ in range(3):
+        shadow.observe(primary, matrix, predictions, probabilities, 0.001)
+    assert time.perf_counter() - start < 1.0
+    # Uno espera en la cola y los otros dos se descartan
+    assert shadow.report()['dropped_batches'] == 2
+
+    release.set()
+    shadow.drain()
+    report = shadow.report()
+    assert report['batches'] == 2 and report['rows'] == 20 and report['dropped_batches'] == 2
+    shadow.close()
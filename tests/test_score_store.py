@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk_policy import DEFAULT_RISK_POLICY
+from score_store import REASON_CHANGED, REASON_MODEL, REASON_NEW, ScoreStore
+
+FEATURES = ['Age at enrollment', 'Admission grade', 'Course_Nursing', 'Course_Management']
+
+
+class CountingPredictor:
+    """Predictor determinista que cuenta las filas que llegan al modelo"""
+
+    def __init__(self, model_version: str = 'v1'):
+        self.expected_columns = FEATURES
+        self.model_version = model_version
+        self.risk_policy = DEFAULT_RISK_POLICY
+        self.rows_scored = 0
+
+    def preprocess_matrix(self, data: pd.DataFrame) -> np.ndarray:
+        return data[FEATURES].to_numpy(dtype=np.float32)
+
+    def predict_matrix(self, matrix: np.ndarray) -> dict:
+        self.rows_scored += len(matrix)
+        probabilities = (matrix[:, 1] / 200).astype(np.float32)
+        return {'predictions': (probabilities > 0.5).astype(np.int64), 'probabilities': probabilities,
+                'risk_levels': self.risk_policy.assign(probabilities)}
+
+
+def _cohort(rows: int = 20) -> pd.DataFrame:
+    return pd.DataFrame({
+        'student_id': [f"S{i:03d}" for i in range(rows)],
+        'Age at enrollment': np.full(rows, 20.0),
+        'Admission grade': np.linspace(10, 190, rows),
+        'Course_Nursing': np.arange(rows) % 2,
+        'Course_Management': 1 - np.arange(rows) % 2,
+    })
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / 'scores.sqlite3')
+
+
+def test_only_new_changed_and_stale_rows_are_rescored(store_path):
+    predictor = CountingPredictor()
+    data = _cohort()
+    with ScoreStore(store_path) as store:
+        first = store.score(predictor, data)
+        assert set(first.reasons) == {REASON_NEW}
+
+        changed = data.copy()
+        changed.loc[:2, 'Admission grade'] += 1
+        predictor.rows_scored = 0
+        second = store.score(predictor, changed)
+        assert predictor.rows_scored == 3
+        assert set(second.reasons[:3]) == {REASON_CHANGED}
+        assert second.counts()['unchanged'] == len(data) - 3
+        np.testing.assert_allclose(second.predictions['probabilities'],
+                                   predictor.predict_matrix(predictor.preprocess_matrix(changed))['probabilities'])
+
+    # Un almacén reabierto carga la copia columnar y no repuntúa nada
+    predictor.rows_scored = 0
+    with ScoreStore(store_path) as store:
+        third = store.score(predictor, changed)
+    assert predictor.rows_scored == 0
+    assert third.counts()['unchanged'] == len(data)
+    assert third.reasons.tolist() == [''] * len(data)
+
+    with ScoreStore(store_path) as store:
+        fourth = store.score(CountingPredictor('v2'), changed)
+    assert set(fourth.reasons) == {REASON_MODEL}
+
+
+def test_writes_from_another_connection_are_seen(store_path):
+    predictor = CountingPredictor()
+    data = _cohort()
+    with ScoreStore(store_path) as reader, ScoreStore(store_path) as writer:
+        reader.score(predictor, data)
+        extended = pd.concat([data, _cohort(25).iloc[20:]], ignore_index=True)
+        extended.loc[0, 'Admission grade'] = 5
+        writer.score(predictor, extended)
+
+        predictor.rows_scored = 0
+        result = reader.score(predictor, extended)
+        assert predictor.rows_scored == 0
+        assert len(reader) == 25
+        assert result.predictions['probabilities'][0] == pytest.approx(5 / 200)
+
+
+def test_small_batches_query_sqlite_directly(store_path):
+    predictor = CountingPredictor()
+    data = _cohort()
+    with ScoreStore(store_path) as store:
+        store.score(predictor, data)
+    with ScoreStore(store_path) as store:
+        result = store.score(predictor, data.iloc[[3]])
+        assert store._table is None
+    assert result.counts()['unchanged'] == 1
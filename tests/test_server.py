@@ -0,0 +1,54 @@
+import asyncio
+import json
+
+import pytest
+
+from server import ScoringServer
+
+
+async def _request(port: int, head: str, body: bytes = b'') -> tuple:
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(head.encode('latin-1') + b'\r\n\r\n' + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    status_line, _, rest = response.partition(b'\r\n')
+    return int(status_line.split()[1]), rest.split(b'\r\n\r\n', 1)[1]
+
+
+def _serve(predictor, *requests):
+    async def main():
+        server = ScoringServer(predictor, port=0, max_wait_ms=1)
+        await server.start()
+        port = server._server.sockets[0].getsockname()[1]
+        try:
+            return [await _request(port, head, body) for head, body in requests]
+        finally:
+            await server.close()
+    return asyncio.run(main())
+
+
+def _post(path: str, payload) -> tuple:
+    body = json.dumps(payload).encode()
+    return f"POST {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close", body
+
+
+@pytest.mark.parametrize('length', ['abc', '-5'])
+def test_invalid_content_length_is_rejected(predictor, length):
+    [(status, body)] = _serve(predictor, (f"POST /predict HTTP/1.1\r\nContent-Length: {length}", b''))
+    assert status == 400
+    assert 'Content-Length' in json.loads(body)['error']
+
+
+def test_http_traffic_is_counted_in_predict_batch_metrics(predictor):
+    predictor.metrics.reset()
+    responses = _serve(predictor,
+                       _post('/predict', {'Age at enrollment': 20}),
+                       _post('/predict', {}),
+                       _post('/predict/batch', [{'Age at enrollment': 20}, {'Age at enrollment': 40}]),
+                       ("GET /metrics HTTP/1.1\r\nConnection: close", b''))
+    assert [status for status, _ in responses] == [200, 200, 200, 200]
+    assert len(json.loads(responses[2][1])['results']) == 2
+    calls = predictor.get_model_info()['metrics']['calls']
+    assert calls['predict_batch']['rows'] == 4
+    assert b'call="predict_batch"' in responses[3][1]
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from summary import SummaryAccumulator
+from utils import get_summary_statistics
+
+EXPECTED_COLUMNS = ['Admission grade', 'Course_Nursing', 'Course_Management',
+                    'Marital status_Single', 'Marital status_Divorced']
+
+
+def _batch():
+    data = pd.DataFrame({
+        'student_id': ['a1', 'a2', 'a3'],
+        'Admission grade': [120.0, 140.0, 160.0],
+        'Course_Nursing': [1, 0, 0],
+        'Course_Management': [0, 1, 0],
+        'Marital status_Single': [1, 1, 0],
+    })
+    predictions = {
+        'predictions': np.array([1, 0, 0]),
+        'probabilities': np.array([0.8, 0.2, 0.4]),
+        'risk_levels': np.array(['Alto', 'Bajo', 'Medio']),
+    }
+    return data, predictions
+
+
+def test_all_groups_come_from_the_expected_columns():
+    data, predictions = _batch()
+    accumulator = SummaryAccumulator.for_columns(list(data.columns), None, expected_columns=EXPECTED_COLUMNS)
+    # student_id no es un grupo; Marital status_Divorced no está en los datos
+    assert list(accumulator.groups) == ['Course', 'Marital status']
+    assert accumulator.group_columns == ['Course_Nursing', 'Course_Management', 'Marital status_Single']
+
+    summary = get_summary_statistics(data, predictions, groups=None, expected_columns=EXPECTED_COLUMNS)
+    assert set(summary['groups']) == {'Course', 'Marital status'}
+
+
+def test_all_groups_require_the_expected_columns():
+    data, _ = _batch()
+    with pytest.raises(ValueError):
+        SummaryAccumulator.for_columns(list(data.columns), None)
+    # Con prefijos explícitos basta el encabezado de los datos
+    assert list(SummaryAccumulator.for_columns(list(data.columns), ('Course',)).groups) == ['Course']
+
+
+def test_data_and_predictions_must_have_the_same_rows():
+    data, predictions = _batch()
+    with pytest.raises(ValueError):
+        get_summary_statistics(data.iloc[:2], predictions, expected_columns=EXPECTED_COLUMNS)
+    accumulator = SummaryAccumulator.for_columns(list(data.columns), (), expected_columns=EXPECTED_COLUMNS)
+    with pytest.raises(ValueError):
+        accumulator.update(data, {key: values[:0] for key, values in predictions.items()})
+    assert accumulator.update(None, predictions).result()['total_students'] == 3
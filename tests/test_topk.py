@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from topk import TopKAccumulator
+from whatif import REFERENCE_CATEGORY
+
+COURSES = ['Nursing', 'Management', 'Tourism']
+
+
+def _scored(n_rows, seed):
+    """Cohorte con pocas probabilidades distintas, para que haya muchos empates"""
+    rng = np.random.default_rng(seed)
+    course = rng.integers(0, len(COURSES) + 1, size=n_rows)  # el último valor es la categoría de referencia
+    data = pd.DataFrame({'student_id': [f"s{i:04d}" for i in range(n_rows)]})
+    for code, name in enumerate(COURSES):
+        data[f"Course_{name}"] = (course == code).astype(int)
+    probabilities = rng.choice([0.15, 0.5, 0.5, 0.72, 0.9], size=n_rows)
+    risk_levels = np.where(probabilities >= 0.7, 'Alto', np.where(probabilities >= 0.4, 'Medio', 'Bajo'))
+    labels = np.asarray(COURSES + [REFERENCE_CATEGORY], dtype=object)[course]
+    return data, probabilities, risk_levels.astype(object), labels
+
+
+def _brute_force(data, probabilities, risk_levels, labels, k):
+    """Ranking esperado: orden completo por probabilidad descendente y, a igualdad, por fila"""
+    rankings = {}
+    for group in pd.unique(labels):
+        rows = np.flatnonzero(labels == group)
+        order = rows[np.lexsort((rows, -probabilities[rows]))][:k]
+        rankings[group] = pd.DataFrame({
+            'Fila': order,
+            'student_id': data['student_id'].to_numpy()[order],
+            'Probabilidad_Desercion': probabilities[order],
+            'Nivel_Riesgo': risk_levels[order],
+        })
+    return rankings
+
+
+# Bloques menores y mayores que K por grupo: con más de K candidatas argpartition preselecciona
+@pytest.mark.parametrize('group_by', ['Course', None])
+@pytest.mark.parametrize('k, chunksize', [(5, 7), (12, 5), (1, 3), (4, 50), (10, 120), (40, 64)])
+def test_top_k_matches_a_full_sort(group_by, k, chunksize):
+    data, probabilities, risk_levels, labels = _scored(300, seed=k)
+    accumulator = TopKAccumulator(k, group_by=group_by, columns=['student_id'])
+    for start in range(0, len(data), chunksize):
+        stop = start + chunksize
+        accumulator.update(data.iloc[start:stop], {'probabilities': probabilities[start:stop],
+                                                   'risk_levels': risk_levels[start:stop]})
+    result = accumulator.result()
+
+    if group_by is None:
+        expected = _brute_force(data, probabilities, risk_levels, np.zeros(len(data)), k)
+        pairs = [(result, expected[0])]
+    else:
+        expected = _brute_force(data, probabilities, risk_levels, labels, k)
+        assert set(result['Course']) == set(expected)
+        pairs = [(result[result['Course'] == group], ranking) for group, ranking in expected.items()]
+    for actual, ranking in pairs:
+        assert actual['Ranking'].tolist() == list(range(1, len(ranking) + 1))
+        pd.testing.assert_frame_equal(actual[list(ranking.columns)].reset_index(drop=True), ranking,
+                                      check_dtype=False)
+
+
+def test_ties_across_chunk_boundaries_keep_the_earliest_rows():
+    # Todas las filas empatan: el ranking son las K primeras aunque lleguen en bloques distintos
+    n_rows, k = 23, 6
+    data = pd.DataFrame({'student_id': np.arange(n_rows)})
+    accumulator = TopKAccumulator(k, columns=['student_id'])
+    for start in range(0, n_rows, 4):
+        stop = min(start + 4, n_rows)
+        accumulator.update(data.iloc[start:stop], {'probabilities': np.full(stop - start, 0.5),
+                                                   'risk_levels': np.full(stop - start, 'Medio')})
+    result = accumulator.result()
+    assert result['Fila'].tolist() == list(range(k))
+    assert result['student_id'].tolist() == list(range(k))
+    assert accumulator.rows_seen == n_rows
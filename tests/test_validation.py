@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from utils import validate_data_ranges
+from validation import ValidationSchema
+
+EXPECTED_COLUMNS = ['Age at enrollment', 'Admission grade', 'Gender',
+                    'Course_Nursing', 'Course_Management', 'Course_Tourism']
+
+
+def _rows(**overrides):
+    data = pd.DataFrame({
+        'Age at enrollment': [19.0, 22.0, 30.0],
+        'Admission grade': [120.0, 140.0, 160.0],
+        'Gender': [0, 1, 1],
+        'Course_Nursing': [1, 0, 0],
+        'Course_Management': [0, 1, 0],
+        'Course_Tourism': [0, 0, 1],
+    })
+    for column, values in overrides.items():
+        data[column] = values
+    return data
+
+
+def test_valid_batch_has_no_violations():
+    report = ValidationSchema(EXPECTED_COLUMNS).validate(_rows())
+    assert report.is_valid
+
+
+def test_out_of_range_and_one_hot_violations():
+    data = _rows(**{'Age at enrollment': [15.0, 22.0, 30.0], 'Course_Tourism': [1, 0, 1]})
+    report = ValidationSchema(EXPECTED_COLUMNS).validate(data)
+    assert report.summary() == {'range:Age at enrollment': 1, 'one_hot:Course': 1}
+    assert report.invalid_rows().tolist() == [0]
+
+
+def test_missing_and_non_numeric_values_are_not_range_violations():
+    data = _rows(**{'Age at enrollment': [np.nan, 'abc', 30.0], 'Gender': [np.nan, 1, 1],
+                    'Course_Nursing': [np.nan, 0, 0]})
+    report = ValidationSchema(EXPECTED_COLUMNS).validate(data)
+    assert report.is_valid
+
+
+def test_missing_category_does_not_hide_other_active_categories():
+    data = _rows(**{'Course_Nursing': [np.nan, 1, 0], 'Course_Tourism': [0, 1, 1]})
+    report = ValidationSchema(EXPECTED_COLUMNS).validate(data)
+    assert report.summary() == {'one_hot:Course': 1}
+
+
+def test_groups_without_reference_category_need_exactly_one_category():
+    data = _rows(**{'Course_Tourism': [0, 0, 0]})
+    report = ValidationSchema(EXPECTED_COLUMNS).validate(data)
+    assert report.summary() == {'one_hot:Course': 1}
+    assert report.invalid_rows().tolist() == [2]
+    # Con una categoría de referencia implícita el grupo en cero es válido
+    assert ValidationSchema(EXPECTED_COLUMNS, complete_groups=frozenset()).validate(data).is_valid
+    # Si falta alguna columna del grupo la categoría activa puede ser la ausente
+    report = ValidationSchema(EXPECTED_COLUMNS).validate(data.drop(columns=['Course_Tourism']))
+    assert report.missing_columns == ['Course_Tourism'] and report.summary() == {}
+
+
+def test_identifier_columns_are_not_one_hot_groups():
+    data = _rows()
+    data.insert(0, 'student_id', [1001, 1002, 1003])
+    for result in (validate_data_ranges(data), validate_data_ranges(data, EXPECTED_COLUMNS)):
+        assert result['warnings'] == []
+        assert not any('student' in rule for rule in result['violation_counts'])
@@ -0,0 +1,23 @@
+import numpy as np
+
+from preprocessing import PreprocessingPlan
+from whatif import REFERENCE_CATEGORY, build_whatif_grid
+
+EXPECTED_COLUMNS = ['Admission grade', 'Course_Nursing', 'Course_Management',
+                    'Marital status_Single', 'Marital status_Divorced']
+
+
+def test_reference_variant_only_for_groups_with_implicit_baseline():
+    plan = PreprocessingPlan(EXPECTED_COLUMNS)
+    base = np.array([120.0, 1.0, 0.0, 1.0, 0.0])
+    grid = build_whatif_grid(base, plan, {'Course': None, 'Marital status': None})
+
+    course_rows, course_values, course_current = grid.segments['Course']
+    assert course_values == ['Nursing', 'Management']
+    assert course_current == 'Nursing'
+    # Ninguna variante de carrera deja el grupo en cero
+    assert (grid.matrix[course_rows, 1:3].sum(axis=1) == 1).all()
+
+    marital_rows, marital_values, _ = grid.segments['Marital status']
+    assert marital_values == [REFERENCE_CATEGORY, 'Single', 'Divorced']
+    assert grid.matrix[marital_rows, 3:5].sum(axis=1).tolist() == [0, 1, 1]
@@ -0,0 +1,128 @@
+import heapq
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from risk_policy import course_labels
+from whatif import REFERENCE_CATEGORY
+
+# Grupos one-hot por los que se suele pedir el ranking
+TOP_K_GROUPS = ('Course', 'Application mode')
+
+# Entrada del heap: (probabilidad, -fila, nivel de riesgo, valores de las columnas conservadas).
+# El mínimo del heap es el estudiante que sale primero: menor probabilidad y, a igualdad, la fila posterior
+_Entry = Tuple[float, int, Any, Tuple[Any, ...]]
+
+
+class TopKAccumulator:
+    """
+    Los K estudiantes con mayor probabilidad de deserción, global o por grupo one-hot.
+
+    Recibe los resultados bloque a bloque (p. ej. de predict_stream) y mantiene un
+    heap acotado a K entradas por grupo. En cada bloque, un filtro vectorizado
+    descarta las filas que no superan el mínimo actual del heap y argpartition
+    preselecciona como mucho K candidatas por grupo, de modo que solo esas pasan
+    por el heap: O(N + K log K) por bloque y O(K) memoria por grupo, sin
+    materializar nunca la tabla puntuada completa. A igual probabilidad se
+    conserva la fila que aparece antes en la fuente.
+    """
+
+    def __init__(self, k: int, group_by: Optional[str] = None, columns: Optional[Sequence[Any]] = None):
+        """
+        Args:
+            k: Estudiantes a conservar por grupo
+            group_by: Prefijo de un grupo one-hot ('Course', 'Application mode', ...); None = ranking global
+            columns: Columnas de entrada que se devuelven con cada estudiante; None = todas
+        """
+        if k <= 0:
+            raise ValueError("k debe ser mayor que 0")
+        self.k = k
+        self.group_by = group_by
+        self.columns = list(columns) if columns is not None else None
+        self.rows_seen = 0
+        self._heaps: Dict[Hashable, List[_Entry]] = {}
+
+    def update(self, chunk: pd.DataFrame, predictions: Dict[str, Any]) -> None:
+        """Incorpora un bloque puntuado; las filas se numeran en el orden en que llegan"""
+        probabilities = np.asarray(predictions['probabilities'], dtype=np.float64)
+        risk_levels = np.asarray(predictions['risk_levels'])
+        offset, self.rows_seen = self.rows_seen, self.rows_seen + len(chunk)
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+        if len(chunk) == 0:
+            return
+
+        for group, positions in self._group_positions(chunk):
+            heap = self._heaps.setdefault(group, [])
+            selected = self._candidates(probabilities[positions], heap)
+            if len(selected) == 0:
+                continue
+            positions = positions[selected]
+            values = chunk.iloc[positions][self.columns].itertuples(index=False, name=None)
+            for position, row_values in zip(positions, values):
+                entry = (float(probabilities[position]), -(offset + int(position)), risk_levels[position], row_values)
+                if len(heap) < self.k:
+                    heapq.heappush(heap, entry)
+                else:
+                    heapq.heappushpop(heap, entry)
+
+    def _group_positions(self, chunk: pd.DataFrame) -> Iterable[Tuple[Hashable, np.ndarray]]:
+        """Posiciones (crecientes) de las filas de cada grupo dentro del bloque"""
+        if self.group_by is None:
+            return [(None, np.arange(len(chunk)))]
+        labels = course_labels(chunk, group=self.group_by)
+        if labels is None:
+            raise ValueError(f"Los datos no tienen columnas del grupo '{self.group_by}'")
+        codes, categories = pd.factorize(np.where(pd.isna(labels), REFERENCE_CATEGORY, labels))
+        order = np.argsort(codes, kind='stable')
+        bounds = np.cumsum(np.bincount(codes, minlength=len(categories)))[:-1]
+        return zip(categories, np.split(order, bounds))
+
+    def _candidates(self, probabilities: np.ndarray, heap: List[_Entry]) -> np.ndarray:
+        """Índices de las filas del bloque que pueden entrar en el heap (como mucho K)"""
+        candidates = np.arange(len(probabilities))
+        if len(heap) == self.k:
+            # Solo las que superan al mínimo actual; a igualdad gana la fila anterior, que ya está en el heap
+            candidates = candidates[probabilities > heap[0][0]]
+        if len(candidates) <= self.k:
+            return candidates
+        values = probabilities[candidates]
+        kth = np.partition(values, len(values) - self.k)[len(values) - self.k]
+        above = values > kth
+        # Los empates en el corte se resuelven a favor de las filas anteriores
+        ties = np.flatnonzero(values == kth)[:self.k - int(above.sum())]
+        above[ties] = True
+        return candidates[above]
+
+    def result(self) -> pd.DataFrame:
+        """
+        Ranking final, ordenado por grupo y por probabilidad descendente
+
+        Returns:
+            DataFrame con el grupo (si se agrupa), 'Ranking' (1 = mayor riesgo), 'Fila'
+            (posición en la fuente), las columnas conservadas, 'Probabilidad_Desercion'
+            y 'Nivel_Riesgo'
+        """
+        columns = self.columns or []
+        records = []
+        for group, heap in self._heaps.items():
+            for rank, (probability, neg_row, level, values) in enumerate(sorted(heap, reverse=True), start=1):
+                records.append((group, rank, -neg_row, *values, probability, level))
+        group_column = self.group_by or '_group'
+        output = pd.DataFrame.from_records(
+            records, columns=[group_column, 'Ranking', 'Fila', *columns, 'Probabilidad_Desercion', 'Nivel_Riesgo'])
+        if self.group_by is None:
+            output = output.drop(columns=group_column)
+        else:
+            output = output.sort_values([group_column, 'Ranking'], kind='stable')
+        return output.reset_index(drop=True)
+
+
+def top_k_scored_chunks(results: Iterable[Tuple[pd.DataFrame, Dict[str, Any]]], k: int,
+                        group_by: Optional[str] = None, columns: Optional[Sequence[Any]] = None) -> pd.DataFrame:
+    """Consume resultados por bloques (predict_stream, iter_compact_scored_chunks, ...) y retorna el ranking"""
+    accumulator = TopKAccumulator(k, group_by, columns)
+    for chunk, predictions in results:
+        accumulator.update(chunk, predictions)
+    return accumulator.result()
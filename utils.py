@@ -1,6 +1,11 @@
+import io
 import pandas as pd
-import numpy as np
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Tuple, Optional, Sequence
+
+from exporters import export_predictions
+from risk_policy import DEFAULT_RISK_POLICY, RiskBand, RiskPolicy
+from summary import DEFAULT_SUMMARY_GROUPS, SummaryAccumulator
+from validation import compile_schema, validated_columns
 
 def validate_csv_columns(df: pd.DataFrame, expected_columns: List[str]) -> Dict[str, Any]:
     """
@@ -13,11 +18,7 @@ def validate_csv_columns(df: pd.DataFrame, expected_columns: List[str]) -> Dict[
     Returns:
         Diccionario con información de validación
     """
-    df_columns = set(df.columns)
-    expected_set = set(expected_columns)
-    
-    missing_columns = list(expected_set - df_columns)
-    extra_columns = list(df_columns - expected_set)
+    missing_columns, extra_columns = compile_schema(tuple(expected_columns)).check_header(df.columns)
     
     is_valid = len(missing_columns) == 0
     
@@ -29,34 +30,25 @@ def validate_csv_columns(df: pd.DataFrame, expected_columns: List[str]) -> Dict[
         "total_expected_columns": len(expected_columns)
     }
 
-def format_prediction_result(probability: float, prediction: int, risk_level: str) -> Tuple[str, str]:
+def format_prediction_result(probability: float, prediction: int, risk_level: str,
+                             policy: Optional[RiskPolicy] = None) -> Tuple[str, str]:
     """
     Formatea el resultado de la predicción para mostrar al usuario
     
     Args:
         probability: Probabilidad de deserción (0-1)
         prediction: Predicción binaria (0 o 1)
-        risk_level: Nivel de riesgo (Alto, Medio, Bajo)
+        risk_level: Nivel de riesgo de la política (por defecto Alto, Medio, Bajo)
+        policy: Política de riesgo con la presentación de cada nivel; por defecto DEFAULT_RISK_POLICY
     
     Returns:
         Tupla con (texto_resultado, color)
     """
     percentage = probability * 100
+    band = (policy or DEFAULT_RISK_POLICY).band(risk_level) or RiskBand(str(risk_level))
     
-    if risk_level == "Alto":
-        color = "#ff4b4b"  # Rojo
-        icon = "🔴"
-        text = f"{icon} **RIESGO ALTO DE DESERCIÓN** ({percentage:.1f}%)"
-    elif risk_level == "Medio":
-        color = "#ffa500"  # Naranja
-        icon = "🟡"
-        text = f"{icon} **RIESGO MEDIO DE DESERCIÓN** ({percentage:.1f}%)"
-    else:
-        color = "#00cc00"  # Verde
-        icon = "🟢"
-        text = f"{icon} **RIESGO BAJO DE DESERCIÓN** ({percentage:.1f}%)"
-    
-    return text, color
+    text = f"{band.icon} **RIESGO {band.name.upper()} DE DESERCIÓN** ({percentage:.1f}%)"
+    return text, band.color
 
 def clean_numeric_data(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -81,132 +73,86 @@ def clean_numeric_data(df: pd.DataFrame) -> pd.DataFrame:
     
     return cleaned_df
 
-def get_summary_statistics(df: pd.DataFrame, predictions: Dict[str, List]) -> Dict[str, Any]:
+def get_summary_statistics(df: pd.DataFrame, predictions: Dict[str, List],
+                           groups: Optional[Sequence[str]] = DEFAULT_SUMMARY_GROUPS,
+                           policy: Optional[RiskPolicy] = None,
+                           expected_columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
     """
     Calcula estadísticas resumidas de las predicciones
     
     Args:
         df: DataFrame original
         predictions: Diccionario con predicciones
+        groups: Grupos one-hot a desglosar ('Course', 'Application mode', ...); () para omitir el desglose;
+                None para todos los grupos de expected_columns
+        policy: Política de riesgo cuyos niveles se reportan; por defecto DEFAULT_RISK_POLICY
+        expected_columns: Columnas esperadas por el modelo, de las que salen los grupos one-hot
     
     Returns:
-        Diccionario con estadísticas
+        Diccionario con estadísticas, cuantiles de probabilidad y desglose por grupo
     """
-    total_students = len(df)
-    predicted_dropouts = sum(predictions['predictions'])
-    avg_probability = np.mean(predictions['probabilities'])
-    
-    risk_counts = {}
-    for level in ['Alto', 'Medio', 'Bajo']:
-        risk_counts[level] = predictions['risk_levels'].count(level)
-    
-    return {
-        'total_students': total_students,
-        'predicted_dropouts': predicted_dropouts,
-        'predicted_continuers': total_students - predicted_dropouts,
-        'avg_dropout_probability': avg_probability,
-        'risk_distribution': risk_counts,
-        'dropout_rate': predicted_dropouts / total_students if total_students > 0 else 0
-    }
+    risk_levels = (policy or DEFAULT_RISK_POLICY).report_order
+    accumulator = SummaryAccumulator.for_columns(list(df.columns), groups, expected_columns,
+                                                 risk_levels=risk_levels)
+    return accumulator.update(df, predictions).result()
 
-def create_risk_recommendations(risk_level: str) -> str:
+def create_risk_recommendations(risk_level: str, policy: Optional[RiskPolicy] = None) -> str:
     """
     Genera recomendaciones basadas en el nivel de riesgo
     
     Args:
-        risk_level: Nivel de riesgo (Alto, Medio, Bajo)
+        risk_level: Nivel de riesgo de la política (por defecto Alto, Medio, Bajo)
+        policy: Política de riesgo con las recomendaciones de cada nivel; por defecto DEFAULT_RISK_POLICY
     
     Returns:
         String con recomendaciones
     """
-    recommendations = {
-        "Alto": """
-        **🚨 ACCIONES INMEDIATAS REQUERIDAS:**
-        
-        • **Contacto urgente**: Reunión con el estudiante en máximo 48 horas
-        • **Evaluación integral**: Revisar situación académica, financiera y personal
-        • **Plan de intervención**: Crear estrategia personalizada de apoyo
-        • **Seguimiento intensivo**: Reuniones semanales hasta estabilizar la situación
-        • **Recursos especializados**: Derivar a servicios de apoyo psicopedagógico
-        • **Flexibilización académica**: Considerar opciones de cronograma modificado
-        """,
-        
-        "Medio": """
-        **⚠️ MONITOREO Y APOYO PREVENTIVO:**
-        
-        • **Seguimiento regular**: Reuniones quincenales con tutor académico
-        • **Identificación de factores**: Detectar causas específicas de riesgo
-        • **Apoyo académico**: Facilitar acceso a tutorías y recursos de estudio
-        • **Motivación**: Fomentar participación en actividades estudiantiles
-        • **Comunicación familiar**: Involucrar red de apoyo cuando sea apropiado
-        • **Alerta temprana**: Monitorear indicadores clave de rendimiento
-        """,
-        
-        "Bajo": """
-        **✅ MANTENIMIENTO Y PREVENCIÓN:**
-        
-        • **Seguimiento estándar**: Reuniones mensuales de rutina
-        • **Reconocimiento**: Destacar y celebrar el buen desempeño
-        • **Desarrollo integral**: Ofrecer oportunidades de crecimiento académico
-        • **Comunicación abierta**: Mantener canales disponibles para consultas
-        • **Prevención**: Estar atento a cambios en el comportamiento académico
-        • **Mentorías**: Considerar al estudiante como mentor para otros
-        """
-    }
-    
-    return recommendations.get(risk_level, "No hay recomendaciones disponibles para este nivel de riesgo.")
+    band = (policy or DEFAULT_RISK_POLICY).band(risk_level)
+    if band is None or not band.recommendations:
+        return "No hay recomendaciones disponibles para este nivel de riesgo."
+    return band.recommendations
 
-def export_predictions_to_csv(df: pd.DataFrame, predictions: Dict[str, List]) -> str:
+def export_predictions_to_csv(df: pd.DataFrame, predictions: Dict[str, List], metrics: Any = None,
+                              columns: Optional[List[str]] = None, policy: Optional[RiskPolicy] = None) -> str:
     """
     Prepara los datos para exportar a CSV
     
+    Para cohortes grandes conviene exporters.export_to_bytes (el CSV se escribe
+    primero en disco) o exporters.export_predictions hacia un archivo, que no
+    materializan el CSV completo como string.
+    
     Args:
         df: DataFrame original
         predictions: Diccionario con predicciones
+        metrics: PredictorMetrics opcional donde registrar la etapa 'export'
+        columns: Columnas de entrada a conservar (p. ej. identificadores); None conserva todas
+        policy: Política con la que recalcular los niveles de riesgo; None conserva los recibidos
     
     Returns:
         String CSV para descarga
     """
-    export_df = df.copy()
-    
-    # Agregar columnas de predicción
-    export_df['Probabilidad_Desercion'] = predictions['probabilities']
-    export_df['Prediccion_Desercion'] = predictions['predictions']
-    export_df['Clasificacion'] = ['Deserción' if pred == 1 else 'No Deserción' 
-                                  for pred in predictions['predictions']]
-    export_df['Nivel_Riesgo'] = predictions['risk_levels']
-    
-    # Agregar timestamp
-    from datetime import datetime
-    export_df['Fecha_Prediccion'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    return export_df.to_csv(index=False)
+    buffer = io.StringIO()
+    export_predictions([(df, predictions)], buffer, 'csv', columns, metrics, policy)
+    return buffer.getvalue()
 
-def validate_data_ranges(df: pd.DataFrame) -> Dict[str, List[str]]:
+def validate_data_ranges(df: pd.DataFrame, expected_columns: Optional[List[str]] = None) -> Dict[str, Any]:
     """
     Valida que los datos estén en rangos razonables
     
     Args:
         df: DataFrame a validar
+        expected_columns: Columnas esperadas del modelo, de las que salen las reglas
+            binarias y de grupos one-hot; sin ellas solo se aplican los rangos conocidos
     
     Returns:
-        Diccionario con advertencias de validación
+        Diccionario con advertencias de validación, conteos por regla y filas con violaciones
     """
-    warnings = []
-    
-    # Validaciones específicas por tipo de campo
-    validations = {
-        'age': {'min': 16, 'max': 70, 'columns': ['Age at enrollment']},
-        'grade': {'min': 0, 'max': 20, 'columns': [col for col in df.columns if 'grade' in col.lower()]},
-        'qualification': {'min': 0, 'max': 200, 'columns': [col for col in df.columns if 'qualification' in col.lower()]},
-        'binary': {'min': 0, 'max': 1, 'columns': ['Gender', 'Scholarship holder', 'Debtor']}
-    }
-    
-    for validation_type, rules in validations.items():
-        for col in rules['columns']:
-            if col in df.columns:
-                out_of_range = df[(df[col] < rules['min']) | (df[col] > rules['max'])]
-                if len(out_of_range) > 0:
-                    warnings.append(f"Columna '{col}': {len(out_of_range)} valores fuera del rango esperado ({rules['min']}-{rules['max']})")
+    columns = expected_columns if expected_columns is not None else validated_columns(df.columns)
+    schema = compile_schema(tuple(columns))
+    report = schema.validate(df)
     
-    return {'warnings': warnings}
+    return {
+        'warnings': report.warnings(),
+        'violation_counts': report.summary(),
+        'invalid_rows': report.invalid_rows().tolist(),
+    }
@@ -0,0 +1,286 @@
+from functools import lru_cache
+from typing import AbstractSet, Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from preprocessing import PreprocessingPlan, one_hot_groups
+from whatif import COMPLETE_ONE_HOT_GROUPS
+
+# Columnas binarias (0/1) que no forman parte de un grupo one-hot
+BINARY_COLUMNS = ('Daytime/evening attendance', 'Displaced', 'Debtor', 'Tuition fees up to date',
+                  'Gender', 'Scholarship holder')
+
+# Rangos (mín, máx) por nombre exacto de columna; los campos del formulario de la app usan los mismos límites
+RANGE_RULES = {
+    'Age at enrollment': (16, 70),
+    # 0 = primera opción, 9 = última
+    'Application order': (0, 9),
+    # Notas de acceso en escala 0-200
+    'Admission grade': (0, 200),
+    'Previous qualification (grade)': (0, 200),
+}
+
+# Rangos por patrón: las notas de unidades curriculares están en escala 0-20
+# y los conteos de unidades curriculares no pueden ser negativos
+CURRICULAR_GRADE_RANGE = (0, 20)
+CURRICULAR_COUNT_RANGE = (0, np.inf)
+
+
+class ValidationRule:
+    """Regla individual del esquema; su posición en `ValidationSchema.rules` es su bit en la máscara"""
+
+    __slots__ = ('name', 'kind', 'target', 'message')
+
+    def __init__(self, name: str, kind: str, target: str, message: str):
+        self.name = name
+        self.kind = kind
+        self.target = target
+        self.message = message
+
+    def __repr__(self) -> str:
+        return f"ValidationRule({self.name!r})"
+
+
+class ValidationReport:
+    """
+    Resultado de validar un lote.
+
+    `masks` guarda, por fila, un bit por regla (np.packbits con bitorder 'little');
+    `counts` el número de filas que incumplen cada regla.
+    """
+
+    def __init__(self, rules: List[ValidationRule], masks: np.ndarray, counts: np.ndarray,
+                 missing_columns: List[str], extra_columns: List[str]):
+        self.rules = rules
+        self.masks = masks
+        self.counts = counts
+        self.missing_columns = missing_columns
+        self.extra_columns = extra_columns
+
+    @classmethod
+    def concat(cls, reports: Sequence["ValidationReport"]) -> "ValidationReport":
+        """Une los informes de varios bloques del mismo esquema (p. ej. los de un archivo leído por partes)"""
+        first = reports[0]
+        return cls(first.rules, np.concatenate([report.masks for report in reports]),
+                   np.sum([report.counts for report in reports], axis=0),
+                   first.missing_columns, first.extra_columns)
+
+    @property
+    def num_rows(self) -> int:
+        return len(self.masks)
+
+    @property
+    def is_valid(self) -> bool:
+        """Sin columnas ausentes ni filas con violaciones"""
+        return not self.missing_columns and not self.counts.any()
+
+    def violation_matrix(self) -> np.ndarray:
+        """Matriz booleana (filas x reglas) desempaquetada"""
+        return np.unpackbits(self.masks, axis=1, count=len(self.rules), bitorder='little').astype(bool)
+
+    def invalid_rows(self) -> np.ndarray:
+        """Posiciones de las filas con al menos una violación"""
+        return np.flatnonzero(self.masks.any(axis=1))
+
+    def row_violations(self, row: int) -> List[str]:
+        """Nombres de las reglas que incumple una fila"""
+        bits = np.unpackbits(self.masks[row], count=len(self.rules), bitorder='little')
+        return [self.rules[i].name for i in np.flatnonzero(bits)]
+
+    def summary(self) -> Dict[str, int]:
+        """Conteo de violaciones por regla, solo para las reglas incumplidas"""
+        return {self.rules[i].name: int(self.counts[i]) for i in np.flatnonzero(self.counts)}
+
+    def warnings(self) -> List[str]:
+        """Mensajes legibles, uno por regla incumplida"""
+        return [self.rules[i].message.format(count=int(self.counts[i])) for i in np.flatnonzero(self.counts)]
+
+
+class ValidationSchema:
+    """
+    Esquema declarativo de validación derivado de las columnas esperadas.
+
+    Reúne rangos numéricos, columnas binarias y exclusividad de los grupos one-hot
+    (como máximo una categoría activa por grupo: al faltar la categoría de
+    referencia, un grupo en cero es válido; en los grupos completos, con una
+    columna por categoría, debe haber exactamente una, salvo que alguna de sus
+    celdas falte). Se compila una vez en vectores de
+    límites por columna y valida un lote completo en una sola pasada de NumPy.
+    Los valores ausentes o no numéricos no incumplen ninguna regla: no son
+    valores fuera de rango, y el preprocesamiento los rellena después.
+    El bit i de la máscara de una fila corresponde a la columna i; los grupos
+    one-hot ocupan los bits siguientes.
+    """
+
+    def __init__(self, expected_columns: Sequence[str], plan: Optional[PreprocessingPlan] = None,
+                 complete_groups: AbstractSet[str] = COMPLETE_ONE_HOT_GROUPS):
+        self.columns = list(expected_columns)
+        # Puede compartir el plan del predictor para reutilizar sus alineaciones en caché
+        self.plan = plan if plan is not None else PreprocessingPlan(self.columns)
+        self.rules: List[ValidationRule] = []
+
+        groups = one_hot_groups(self.columns)
+        grouped = {i for positions in groups.values() for i in positions}
+        num_columns = len(self.columns)
+
+        # Una regla por columna, en el bit de su posición: rango o binaria (0/1).
+        # Las columnas sin límites conocidos tienen un rango infinito que nunca se incumple
+        self.lows = np.full(num_columns, -np.inf, dtype=self.plan.dtype)
+        self.highs = np.full(num_columns, np.inf, dtype=self.plan.dtype)
+        self.binary_mask = np.zeros(num_columns, dtype=bool)
+        for i, col in enumerate(self.columns):
+            if col in BINARY_COLUMNS or i in grouped:
+                self.lows[i], self.highs[i] = 0, 1
+                self.binary_mask[i] = True
+                self.rules.append(ValidationRule(
+                    f"binary:{col}", 'binary', col, f"Columna '{col}': {{count}} valores distintos de 0/1"))
+                continue
+            low, high = _range_for(col) or (-np.inf, np.inf)
+            self.lows[i], self.highs[i] = low, high
+            limits = f"{low:g}-{high:g}" if np.isfinite(high) else f">= {low:g}"
+            self.rules.append(ValidationRule(
+                f"range:{col}", 'range', col,
+                f"Columna '{col}': {{count}} valores fuera del rango esperado ({limits})"))
+
+        # Después, una regla por grupo one-hot: como máximo una categoría activa
+        # (exactamente una en los grupos sin categoría de referencia)
+        self.group_positions = [np.asarray(p, dtype=np.intp) for p in groups.values()]
+        self.complete_groups = np.asarray([group in complete_groups for group in groups], dtype=bool)
+        for group, complete in zip(groups, self.complete_groups):
+            problem = "sin exactamente una categoría activa" if complete else "con más de una categoría activa"
+            self.rules.append(ValidationRule(
+                f"one_hot:{group}", 'one_hot', group, f"Grupo '{group}': {{count}} filas {problem}"))
+
+        # Si cada grupo ocupa columnas consecutivas, las sumas por grupo salen de un
+        # único reduceat sobre la matriz, sin reordenar columnas
+        self.groups_contiguous = all(np.array_equal(p, np.arange(p[0], p[-1] + 1)) for p in self.group_positions)
+        if self.groups_contiguous:
+            bounds = sorted({0} | {int(p[0]) for p in self.group_positions}
+                            | {int(p[-1]) + 1 for p in self.group_positions})
+            bounds = [b for b in bounds if b < num_columns]
+            self.group_bounds = np.asarray(bounds, dtype=np.intp)
+            self.group_slots = np.asarray([bounds.index(int(p[0])) for p in self.group_positions], dtype=np.intp)
+        else:
+            order = np.concatenate(self.group_positions) if self.group_positions else np.empty(0, dtype=np.intp)
+            self.group_order = order
+            self.group_bounds = np.cumsum([0] + [len(p) for p in self.group_positions[:-1]]).astype(np.intp)
+            self.group_slots = np.arange(len(self.group_positions), dtype=np.intp)
+
+    @property
+    def num_rules(self) -> int:
+        return len(self.rules)
+
+    def missing_columns(self, header: Sequence[Any]) -> List[str]:
+        """Columnas esperadas ausentes del encabezado"""
+        return list(self.plan.align(header).missing_columns)
+
+    def check_header(self, header: Sequence[Any]) -> Tuple[List[str], List[str]]:
+        """
+        Compara un encabezado con las columnas esperadas
+
+        Returns:
+            Tupla (columnas ausentes, columnas adicionales)
+        """
+        extra = [col for col in header if col not in self.plan.column_index]
+        return self.missing_columns(header), extra
+
+    def validate(self, data: pd.DataFrame, matrix: Optional[np.ndarray] = None) -> ValidationReport:
+        """
+        Valida un lote completo
+
+        Args:
+            data: DataFrame de entrada
+            matrix: Matriz ya alineada con las columnas esperadas y sin rellenar
+                (plan.transform(data, fill_missing=False)); evita repetir la conversión
+
+        Returns:
+            ValidationReport con máscaras por fila y conteos por regla
+        """
+        missing, extra = self.check_header(data.columns)
+        if matrix is None:
+            matrix = self.plan.transform(data, fill_missing=False)
+        return self.validate_matrix(matrix, missing, extra)
+
+    def validate_matrix(self, matrix: np.ndarray, missing_columns: Sequence[str] = (),
+                        extra_columns: Sequence[str] = ()) -> ValidationReport:
+        """Valida una matriz alineada con las columnas esperadas; las celdas NaN se ignoran"""
+        n, num_columns = matrix.shape
+        violations = np.empty((n, self.num_rules), dtype=bool)
+        by_column = violations[:, :num_columns]
+
+        # Reglas por columna, sobre la matriz completa sin seleccionar columnas.
+        # Toda comparación con NaN es falsa, así que las celdas ausentes no cuentan
+        np.less(matrix, self.lows, out=by_column)
+        by_column |= matrix > self.highs
+        # Binarias: además de estar en [0, 1], no pueden tomar valores intermedios
+        fractional = (matrix > self.lows) & (matrix < self.highs)
+        fractional &= self.binary_mask
+        by_column |= fractional
+
+        if self.group_positions:
+            indicators = matrix if self.groups_contiguous else matrix[:, self.group_order]
+            unknown = None
+            if np.isnan(indicators).any():
+                # Una categoría ausente no suma, pero no oculta las demás categorías activas del grupo
+                unknown = np.logical_or.reduceat(np.isnan(indicators), self.group_bounds, axis=1)[:, self.group_slots]
+                indicators = np.nan_to_num(indicators, nan=0.0)
+            sums = np.add.reduceat(indicators, self.group_bounds, axis=1)[:, self.group_slots]
+            by_group = violations[:, num_columns:]
+            np.greater(sums, 1, out=by_group)
+            if self.complete_groups.any():
+                # Un grupo completo en cero no tiene categoría, salvo que la activa sea una celda ausente
+                empty = sums[:, self.complete_groups] == 0
+                if unknown is not None:
+                    empty &= ~unknown[:, self.complete_groups]
+                if missing_columns:
+                    # Tampoco si falta alguna columna del grupo en el archivo
+                    missing = self._missing_positions(missing_columns)
+                    partial = np.asarray([missing[positions].any() for positions in self.group_positions])
+                    empty[:, partial[self.complete_groups]] = False
+                by_group[:, self.complete_groups] |= empty
+
+        # Las columnas ausentes se informan aparte; sus reglas se desactivan
+        if missing_columns:
+            violations[:, self._inactive_rules(missing_columns)] = False
+
+        masks = np.packbits(violations, axis=1, bitorder='little')
+        # Los conteos solo recorren las filas con alguna violación, normalmente pocas
+        counts = np.count_nonzero(violations[masks.any(axis=1)], axis=0)
+        return ValidationReport(self.rules, masks, counts, list(missing_columns), list(extra_columns))
+
+    def _missing_positions(self, missing_columns: Sequence[str]) -> np.ndarray:
+        missing = np.zeros(len(self.columns), dtype=bool)
+        missing[[self.plan.column_index[col] for col in missing_columns]] = True
+        return missing
+
+    def _inactive_rules(self, missing_columns: Sequence[str]) -> np.ndarray:
+        missing = self._missing_positions(missing_columns)
+        # Un grupo one-hot solo se desactiva si faltan todas sus columnas
+        groups = [missing[positions].all() for positions in self.group_positions]
+        return np.concatenate([missing, np.asarray(groups, dtype=bool)])
+
+
+def _range_for(column: str) -> Optional[Tuple[float, float]]:
+    if column in RANGE_RULES:
+        return RANGE_RULES[column]
+    if column.startswith('Curricular units'):
+        return CURRICULAR_GRADE_RANGE if column.endswith('(grade)') else CURRICULAR_COUNT_RANGE
+    return None
+
+
+def validated_columns(columns: Sequence[Any]) -> List[str]:
+    """
+    Columnas de un encabezado con rango o binarias conocidas
+
+    Los grupos one-hot no se deducen del encabezado (un identificador como
+    'student_id' no es un grupo): sus reglas salen de las columnas esperadas.
+    """
+    return [col for col in columns if isinstance(col, str)
+            and (_range_for(col) is not None or col in BINARY_COLUMNS)]
+
+
+@lru_cache(maxsize=16)
+def compile_schema(columns: Tuple[str, ...]) -> ValidationSchema:
+    """Esquema compilado para unas columnas, reutilizado entre llamadas"""
+    return ValidationSchema(columns)
@@ -0,0 +1,182 @@
+from collections import OrderedDict
+from typing import AbstractSet, Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from preprocessing import PreprocessingPlan, one_hot_groups
+
+# Etiqueta de la categoría de referencia de un grupo one-hot (todas sus columnas en cero)
+REFERENCE_CATEGORY = '(referencia)'
+
+# Grupos one-hot con una columna para cada categoría (o una columna 'Other' que
+# recoge el resto): no tienen categoría implícita, así que el grupo en cero nunca
+# apareció en el entrenamiento y no se prueba como variante
+COMPLETE_ONE_HOT_GROUPS = frozenset({
+    'Course',
+    'Application mode',
+    'Previous qualification',
+    "Mother's qualification",
+    "Father's qualification",
+})
+
+# Barridos por defecto: columnas numéricas con sus valores y grupos one-hot (None = todas las categorías)
+DEFAULT_SWEEPS: Dict[str, Optional[Sequence[Any]]] = OrderedDict([
+    ('Curricular units 2nd sem (grade)', np.round(np.arange(0.0, 20.5, 0.5), 1)),
+    ('Curricular units 2nd sem (approved)', np.arange(0, 21)),
+    ('Curricular units 2nd sem (evaluations)', np.arange(0, 21)),
+    ('Admission grade', np.arange(95.0, 195.0, 5.0)),
+    ('Age at enrollment', np.arange(17, 51)),
+    ('Tuition fees up to date', (0, 1)),
+    ('Scholarship holder', (0, 1)),
+    ('Debtor', (0, 1)),
+    ('Course', None),
+    ('Application mode', None),
+])
+
+
+class WhatIfGrid:
+    """Rejilla de variantes de un estudiante: una fila por variante y el tramo de filas de cada barrido"""
+
+    def __init__(self, matrix: np.ndarray, segments: "OrderedDict[str, Tuple[slice, List[Any], Any]]"):
+        self.matrix = matrix
+        # Barrido -> (filas de la rejilla, valores probados, valor actual del estudiante)
+        self.segments = segments
+
+
+def build_whatif_grid(base: np.ndarray, plan: PreprocessingPlan,
+                      sweeps: Dict[str, Optional[Sequence[Any]]],
+                      complete_groups: AbstractSet[str] = COMPLETE_ONE_HOT_GROUPS) -> WhatIfGrid:
+    """
+    Construye todas las variantes de un estudiante en una sola matriz
+
+    Args:
+        base: Vector alineado del estudiante
+        plan: Plan de preprocesamiento con las columnas esperadas
+        sweeps: Columna o grupo one-hot -> valores a probar (None en un grupo = todas sus categorías,
+                más la de referencia si el grupo no está en complete_groups)
+        complete_groups: Grupos sin categoría implícita de referencia
+
+    Returns:
+        WhatIfGrid con la matriz de variantes y el tramo de cada barrido
+    """
+    base = np.asarray(base, dtype=plan.dtype).reshape(-1)
+    groups = one_hot_groups(plan.columns)
+
+    resolved = []
+    for name, values in sweeps.items():
+        if name in groups:
+            positions = np.asarray(groups[name], dtype=np.intp)
+            categories = [plan.columns[i].split('_', 1)[1] for i in positions]
+            if values is None:
+                values = categories if name in complete_groups else [REFERENCE_CATEGORY] + categories
+            active = np.flatnonzero(base[positions] == 1)
+            current = categories[active[0]] if len(active) else REFERENCE_CATEGORY
+            resolved.append((name, list(values), current, positions, categories))
+        elif name in plan.column_index:
+            if values is None:
+                raise ValueError(f"Indique los valores a probar para la columna '{name}'")
+            position = plan.column_index[name]
+            resolved.append((name, list(values), float(base[position]), position, None))
+        # Las columnas que el modelo no usa se ignoran
+
+    total = sum(len(values) for _, values, _, _, _ in resolved)
+    matrix = np.repeat(base[None, :], total, axis=0)
+    segments: "OrderedDict[str, Tuple[slice, List[Any], Any]]" = OrderedDict()
+
+    start = 0
+    for name, values, current, positions, categories in resolved:
+        rows = slice(start, start + len(values))
+        if categories is None:
+            matrix[rows, positions] = np.asarray(values, dtype=plan.dtype)
+        else:
+            block = matrix[rows]
+            block[:, positions] = 0
+            index = {category: i for i, category in enumerate(categories)}
+            chosen = np.asarray([index.get(value, -1) for value in values])
+            hit = np.flatnonzero(chosen >= 0)
+            block[hit, positions[chosen[hit]]] = 1
+        segments[name] = (rows, values, current)
+        start += len(values)
+
+    return WhatIfGrid(matrix, segments)
+
+
+class WhatIfResult:
+    """
+    Resultado de un análisis qué-pasaría-si.
+
+    `curves` contiene, por barrido, la probabilidad y el nivel de riesgo de cada
+    valor probado; `minimal_changes` el cambio más pequeño de cada barrido que
+    lleva la probabilidad al otro lado de `threshold`.
+    """
+
+    def __init__(self, base_probability: float, base_risk_level: str, threshold: float,
+                 curves: "OrderedDict[str, pd.DataFrame]", minimal_changes: pd.DataFrame):
+        self.base_probability = base_probability
+        self.base_risk_level = base_risk_level
+        self.threshold = threshold
+        self.curves = curves
+        self.minimal_changes = minimal_changes
+
+    def best_change(self) -> Optional[Dict[str, Any]]:
+        """El cambio mínimo de menor magnitud relativa, o None si ningún barrido cruza el umbral"""
+        if self.minimal_changes.empty:
+            return None
+        return self.minimal_changes.iloc[0].to_dict()
+
+
+def summarize_grid(grid: WhatIfGrid, probabilities: np.ndarray, risk_levels: np.ndarray,
+                   base_probability: float, base_risk_level: str, threshold: float) -> WhatIfResult:
+    """
+    Arma las curvas y busca, en cada barrido, el cambio mínimo que cruza el umbral
+
+    Para columnas numéricas el cambio se mide como |valor - actual| relativo al
+    rango barrido; para grupos one-hot cualquier cambio de categoría cuenta como 1.
+    """
+    below = base_probability < threshold
+    curves: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+    changes = []
+
+    for name, (rows, values, current) in grid.segments.items():
+        probs = probabilities[rows]
+        curves[name] = pd.DataFrame({'value': values, 'probability': probs, 'risk_level': risk_levels[rows]})
+
+        crosses = probs >= threshold if below else probs < threshold
+        if not crosses.any():
+            continue
+        if isinstance(current, str):
+            distance = np.where(np.asarray(values, dtype=object) == current, np.inf, 1.0)
+        else:
+            numeric = np.asarray(values, dtype=np.float64)
+            span = numeric.max() - numeric.min()
+            distance = np.abs(numeric - current) / (span if span > 0 else 1.0)
+        distance = np.where(crosses, distance, np.inf)
+        best = int(np.argmin(distance))
+        if not np.isfinite(distance[best]):
+            continue
+        changes.append({
+            'feature': name,
+            'current': current,
+            'value': values[best],
+            'delta': None if isinstance(current, str) else float(values[best]) - current,
+            'relative_change': float(distance[best]),
+            'probability': float(probs[best]),
+            'risk_level': risk_levels[rows][best],
+        })
+
+    minimal = pd.DataFrame(changes, columns=['feature', 'current', 'value', 'delta', 'relative_change',
+                                              'probability', 'risk_level'])
+    minimal = minimal.sort_values(['relative_change', 'probability'], ascending=[True, below],
+                                  kind='stable', ignore_index=True)
+    return WhatIfResult(base_probability, base_risk_level, threshold, curves, minimal)
+
+
+def default_threshold(probability: float, thresholds: Sequence[float]) -> float:
+    """
+    Umbral a cruzar por defecto: el límite inferior del nivel de riesgo actual
+    (salir de 'Alto' o de 'Medio'); en el nivel más bajo, el límite superior
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    lower = thresholds[thresholds <= probability]
+    return float(lower[-1]) if len(lower) else float(thresholds[0])